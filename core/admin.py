@@ -1,5 +1,41 @@
+from django.conf import settings
 from django.contrib import admin
-from .models import ClassRoom, Student, Attendance, Grade, FeeStructure, Payment
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from .db_utils import estimated_row_count
+from .models import ClassRoom, Student, Attendance, Grade, FeeStructure, Payment, AdminUser
+
+
+class EstimatedCountPaginator(Paginator):
+    """Use the planner's row estimate instead of COUNT(*) for unfiltered changelists of big tables."""
+
+    def __init__(self, *args, estimate=True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.estimate = estimate
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if self.estimate and not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > settings.ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    # Changelist parameters that only page or sort; anything else filters or searches.
+    unfiltered_params = {PAGE_VAR, ORDER_VAR, '_facets', '_popup', '_to_field', '_changelist_filters'}
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        # The admin can apply list_filter lookups without leaving them in
+        # query.where, so decide from the request whether the list is filtered.
+        filtered = any(key not in self.unfiltered_params for key in request.GET)
+        return self.paginator(queryset, per_page, orphans, allow_empty_first_page, estimate=not filtered)
 
 
 @admin.register(ClassRoom)
@@ -9,36 +45,58 @@ class ClassRoomAdmin(admin.ModelAdmin):
 
 
 @admin.register(Student)
-class StudentAdmin(admin.ModelAdmin):
+class StudentAdmin(LargeTableAdmin):
     list_display = ('first_name', 'last_name', 'roll_number', 'classroom')
     list_filter = ('classroom',)
+    list_select_related = ('classroom',)
     search_fields = ('first_name', 'last_name', 'roll_number')
+    autocomplete_fields = ('classroom',)
 
 
 @admin.register(Attendance)
-class AttendanceAdmin(admin.ModelAdmin):
+class AttendanceAdmin(LargeTableAdmin):
     list_display = ('student', 'date', 'status')
-    list_filter = ('status', 'date')
+    list_filter = ('status',)
+    list_select_related = ('student',)
     search_fields = ('student__first_name', 'student__last_name')
+    autocomplete_fields = ('student',)
+    date_hierarchy = 'date'
 
 
 @admin.register(Grade)
-class GradeAdmin(admin.ModelAdmin):
+class GradeAdmin(LargeTableAdmin):
     list_display = ('student', 'subject', 'term', 'score', 'max_score')
     list_filter = ('subject', 'term')
+    list_select_related = ('student',)
     search_fields = ('student__first_name', 'student__last_name', 'subject')
+    autocomplete_fields = ('student',)
+    date_hierarchy = 'recorded_at'
 
 
 @admin.register(FeeStructure)
-class FeeStructureAdmin(admin.ModelAdmin):
+class FeeStructureAdmin(LargeTableAdmin):
     list_display = ('classroom', 'fee_type', 'amount', 'frequency')
     list_filter = ('classroom', 'fee_type', 'frequency')
+    list_select_related = ('classroom',)
     search_fields = ('classroom__name', 'description')
+    autocomplete_fields = ('classroom',)
 
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(LargeTableAdmin):
     list_display = ('student', 'fee_type', 'amount', 'payment_date', 'payment_method')
-    list_filter = ('fee_type', 'payment_method', 'payment_date')
+    list_filter = ('fee_type', 'payment_method')
+    list_select_related = ('student',)
     search_fields = ('student__first_name', 'student__last_name', 'receipt_number')
+    autocomplete_fields = ('student',)
+    date_hierarchy = 'payment_date'
+
 
+@admin.register(AdminUser)
+class AdminUserAdmin(LargeTableAdmin):
+    list_display = ('username', 'first_name', 'last_name', 'email', 'role', 'status', 'created_by')
+    list_filter = ('role', 'status')
+    list_select_related = ('created_by',)
+    search_fields = ('username', 'email', 'first_name', 'last_name')
+    autocomplete_fields = ('created_by', 'django_user')
+    date_hierarchy = 'date_joined'
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from . import changes, slow_queries, tasks  # noqa: F401 (registers job handlers)
+
+        connection_created.connect(slow_queries.install, dispatch_uid='core.slow_queries')
+        changes.connect()
@@ -0,0 +1,150 @@
+"""
+Move closed academic years of Attendance, Grade and Payment into the Archived* tables.
+
+Rows keep their primary keys, so API clients see the same ids whether a year is hot
+or archived. Each batch is its own short transaction: copy into the archive table,
+delete from the hot table the rows that were copied. A crash leaves both tables
+consistent and the run can simply be repeated.
+"""
+import time
+from datetime import date, datetime, time as dt_time
+
+from django.conf import settings
+from django.db import models, router, transaction
+from django.utils import timezone
+
+from .db_utils import estimated_row_count, table_size_bytes, vacuum_analyze
+from .models import (
+    Attendance, Grade, Payment, ArchivedAttendance, ArchivedGrade, ArchivedPayment, ArchiveRun,
+)
+
+
+# hot model -> (archive model, date field that decides the academic year)
+ARCHIVES = {
+    Attendance: (ArchivedAttendance, 'date'),
+    Grade: (ArchivedGrade, 'recorded_at'),
+    Payment: (ArchivedPayment, 'payment_date'),
+}
+
+
+def academic_year_of(day):
+    """The academic year (by its starting calendar year) that a date falls in."""
+    start_month = settings.ACADEMIC_YEAR_START_MONTH
+    return day.year if day.month >= start_month else day.year - 1
+
+
+def academic_year_bounds(year):
+    """[start, end) dates of an academic year."""
+    start_month = settings.ACADEMIC_YEAR_START_MONTH
+    return date(year, start_month, 1), date(year + 1, start_month, 1)
+
+
+def academic_year_label(year):
+    return f'{year}-{(year + 1) % 100:02d}'
+
+
+def is_archived(year):
+    return ArchiveRun.objects.filter(academic_year=year, status=ArchiveRun.STATUS_DONE).exists()
+
+
+def year_filter(model, field, year):
+    """Filter kwargs selecting `year` on a date or datetime field."""
+    start, end = academic_year_bounds(year)
+    if isinstance(model._meta.get_field(field), models.DateTimeField):
+        start = timezone.make_aware(datetime.combine(start, dt_time.min))
+        end = timezone.make_aware(datetime.combine(end, dt_time.min))
+    return {f'{field}__gte': start, f'{field}__lt': end}
+
+
+def _copy_fields(model, archive_model):
+    names = {f.attname for f in archive_model._meta.concrete_fields}
+    return [f.attname for f in model._meta.concrete_fields if f.attname in names]
+
+
+def archive_model_year(model, year, batch_size=2000, pause=0.0, progress=None):
+    """
+    Move one model's rows for `year` in batches; returns (rows moved, ids left in place).
+
+    A row whose id is already taken in the archive table is not copied, so it stays in
+    the hot table and its id is reported rather than deleted. Everything runs on the
+    alias the model writes to (the current tenant's database), reads included.
+    """
+    archive_model, field = ARCHIVES[model]
+    using = router.db_for_write(model)
+    hot, archived = model.objects.using(using), archive_model.objects.using(using)
+    fields = _copy_fields(model, archive_model)
+    lookup = year_filter(model, field, year)
+    moved = 0
+    skipped = []
+    last = 0
+    while True:
+        with transaction.atomic(using=using):
+            ids = list(hot.filter(pk__gt=last, **lookup).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            last = ids[-1]
+            taken = set(archived.filter(pk__in=ids).values_list('pk', flat=True))
+            rows = hot.filter(pk__in=ids).exclude(pk__in=taken).values(*fields)
+            archived.bulk_create(
+                [archive_model(academic_year=year, **row) for row in rows],
+                ignore_conflicts=True,
+            )
+            # Delete only what is now in the archive and wasn't before
+            copied = set(archived.filter(pk__in=ids).values_list('pk', flat=True)) - taken
+            hot.filter(pk__in=copied).delete()
+        moved += len(copied)
+        skipped += sorted(set(ids) - copied)
+        if progress:
+            progress(model, moved)
+        if pause:
+            # Give writers a window between batches
+            time.sleep(pause)
+    return moved, skipped
+
+
+def archive_year(year, batch_size=2000, pause=0.0, vacuum=False, progress=None):
+    """Archive a closed academic year and return a report of rows moved and hot-table sizes."""
+    start, end = academic_year_bounds(year)
+    if end > timezone.localdate():
+        raise ValueError(f'Academic year {academic_year_label(year)} has not ended yet')
+
+    run, _ = ArchiveRun.objects.get_or_create(academic_year=year)
+    run.status = ArchiveRun.STATUS_RUNNING
+    run.save(update_fields=['status'])
+    try:
+        moved, skipped = {}, {}
+        for model in ARCHIVES:
+            moved[model.__name__], left = archive_model_year(model, year, batch_size, pause, progress)
+            if left:
+                skipped[model.__name__] = left
+    except Exception:
+        run.status = ArchiveRun.STATUS_FAILED
+        run.save(update_fields=['status'])
+        raise
+
+    # The same alias the rows were moved on, so the tenant's tables are the ones measured
+    using = router.db_for_write(Attendance)
+    started = time.perf_counter()
+    vacuum_analyze(list(ARCHIVES), using=using, vacuum=vacuum)
+    maintenance_seconds = round(time.perf_counter() - started, 2)
+
+    report = {
+        'academic_year': academic_year_label(year),
+        'moved': moved,
+        'skipped': skipped,
+        'maintenance_seconds': maintenance_seconds,
+        'vacuumed': vacuum,
+        'hot_tables': {
+            model.__name__: {
+                'rows': estimated_row_count(model, using),
+                'bytes': table_size_bytes(model, using),
+            }
+            for model in ARCHIVES
+        },
+    }
+    run.status = ArchiveRun.STATUS_DONE
+    run.moved = moved
+    run.report = report
+    run.finished_at = timezone.now()
+    run.save()
+    return report
@@ -0,0 +1,141 @@
+"""
+Online backups of the SQLite databases using SQLite's backup API.
+
+The database is copied BACKUP_PAGES_PER_STEP pages at a time. Each step holds a
+read lock only while it copies its pages, and the backup sleeps BACKUP_STEP_PAUSE
+seconds between steps so that attendance and payment writes go through. A write
+from another connection makes SQLite start the copy again from the first page. If
+that happens more than MAX_RESTARTS times, the rest is copied in a single step.
+That step holds the lock for one full copy, but it is guaranteed to finish.
+
+Snapshots are written under a temporary name and checked with
+``PRAGMA integrity_check``. They are then renamed to ``<alias>-<timestamp>.sqlite3``
+in BACKUP_DIR, where only the newest BACKUP_KEEP are kept. Timestamps go down to the
+microsecond and are never reused, so two backups in the same second both survive.
+"""
+import glob
+import os
+import sqlite3
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+
+MAX_RESTARTS = 5
+
+
+class BackupError(Exception):
+    """The database can't be backed up, or the snapshot failed its integrity check."""
+
+
+class _TooBusy(Exception):
+    pass
+
+
+def sqlite_aliases():
+    """'default' and tenant aliases on SQLite; replicas are copies of default and are skipped."""
+    tenant_aliases = [tenant['alias'] for tenant in settings.TENANTS.values()]
+    return [
+        alias for alias in ['default', *tenant_aliases]
+        if settings.DATABASES[alias]['ENGINE'].endswith('sqlite3')
+    ]
+
+
+def _copy(source, target, pages, pause, stats):
+    """One backup() call, recording how long each step held the source locked."""
+    resumed = time.perf_counter()
+    seen_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal resumed, seen_remaining
+        held = time.perf_counter() - resumed
+        stats['steps'] += 1
+        stats['lock_seconds_total'] += held
+        stats['lock_seconds_max'] = max(stats['lock_seconds_max'], held)
+        stats['pages'] = total
+        if seen_remaining is not None and remaining >= seen_remaining:
+            # The source changed under us and SQLite started over
+            stats['restarts'] += 1
+            if pages > 0 and stats['restarts'] > MAX_RESTARTS:
+                raise _TooBusy
+        seen_remaining = remaining
+        if pause and remaining:
+            time.sleep(pause)
+        resumed = time.perf_counter()
+
+    source.backup(target, pages=pages, progress=progress)
+
+
+def _snapshot_path(directory, alias):
+    """A path for a new snapshot whose timestamp no existing snapshot has."""
+    moment = timezone.now()
+    while True:
+        path = os.path.join(directory, f'{alias}-{moment.strftime("%Y%m%d-%H%M%S-%f")}.sqlite3')
+        if not os.path.exists(path):
+            return path
+        moment += timedelta(microseconds=1)
+
+
+def _rotate(directory, alias, keep):
+    snapshots = sorted(glob.glob(os.path.join(directory, f'{alias}-*.sqlite3')))
+    removed = snapshots[:-keep] if keep > 0 else []
+    for path in removed:
+        os.remove(path)
+    return [os.path.basename(path) for path in removed]
+
+
+def backup(alias='default', directory=None, pages=None, pause=None, keep=None):
+    """Snapshot one SQLite database; returns a report with timings and lock hold times."""
+    config = settings.DATABASES[alias]
+    if not config['ENGINE'].endswith('sqlite3'):
+        raise BackupError(f'{alias} is not SQLite; use the database server\'s own backup tools')
+    directory = str(directory or settings.BACKUP_DIR)
+    pages = settings.BACKUP_PAGES_PER_STEP if pages is None else pages
+    pause = settings.BACKUP_STEP_PAUSE if pause is None else pause
+    keep = settings.BACKUP_KEEP if keep is None else keep
+    os.makedirs(directory, exist_ok=True)
+
+    final = _snapshot_path(directory, alias)
+    partial = final + '.partial'
+    stats = {'steps': 0, 'restarts': 0, 'pages': 0, 'lock_seconds_total': 0.0, 'lock_seconds_max': 0.0}
+    started = time.perf_counter()
+
+    source = sqlite3.connect(f'file:{config["NAME"]}?mode=ro', uri=True)
+    target = sqlite3.connect(partial)
+    try:
+        try:
+            _copy(source, target, pages, pause, stats)
+            finished_in_one_step = False
+        except _TooBusy:
+            _copy(source, target, -1, 0, stats)
+            finished_in_one_step = True
+        integrity = [row[0] for row in target.execute('PRAGMA integrity_check')]
+    except sqlite3.Error as exc:
+        target.close()
+        os.remove(partial)
+        raise BackupError(f'Backing up {alias} failed: {exc}')
+    finally:
+        source.close()
+    target.close()
+
+    if integrity != ['ok']:
+        os.remove(partial)
+        raise BackupError(f'Snapshot of {alias} failed integrity_check: {"; ".join(integrity[:5])}')
+    os.replace(partial, final)
+
+    return {
+        'database': alias,
+        'file': final,
+        'bytes': os.path.getsize(final),
+        'pages': stats['pages'],
+        'steps': stats['steps'],
+        'restarts': stats['restarts'],
+        'finished_in_one_step': finished_in_one_step,
+        'lock_seconds_total': round(stats['lock_seconds_total'], 4),
+        'lock_seconds_max': round(stats['lock_seconds_max'], 4),
+        'seconds': round(time.perf_counter() - started, 2),
+        'integrity_check': 'ok',
+        'removed': _rotate(directory, alias, keep),
+    }
@@ -0,0 +1,187 @@
+"""
+POST /api/batch/ runs an ordered list of API operations in one transaction:
+
+    {"operations": [
+        {"id": "cls", "method": "POST", "path": "classrooms/", "body": {"name": "5", "section": "B"}},
+        {"method": "POST", "path": "students/", "body": {"classroom": "$cls.id", ...}},
+        {"method": "GET", "path": "students/", "params": {"academic_year": "2024"}}
+    ]}
+
+Strings of the form ``$<id or index>.<field>`` in a later operation's path, params
+or body are replaced by that field of an earlier operation's response. Each
+operation goes through the normal viewset, with its permissions and validation. If
+any operation fails, everything is rolled back and the response is a 400 listing the
+results up to and including the failure.
+"""
+import json
+import re
+from io import BytesIO
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import router, transaction
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import throttling
+from .models import Student
+
+
+REFERENCE_RE = re.compile(r'\$(?P<ref>[\w-]+)\.(?P<path>\w+(?:\.\w+)*)')
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+COPIED_META = ('REMOTE_ADDR', 'SERVER_NAME', 'SERVER_PORT', 'HTTP_HOST', 'HTTP_AUTHORIZATION', 'wsgi.url_scheme')
+
+
+class BatchError(Exception):
+    def __init__(self, detail, results, index):
+        super().__init__(detail)
+        self.detail = detail
+        self.results = results
+        self.index = index
+
+
+def _lookup(data, dotted):
+    for part in dotted.split('.'):
+        if isinstance(data, list):
+            data = data[int(part)]
+        else:
+            data = data[part]
+    return data
+
+
+def _operation_scope(operation):
+    """The throttle scope an operation's view would charge, or None if its route doesn't resolve."""
+    if not isinstance(operation, dict):
+        return None
+    method = str(operation.get('method', 'GET')).upper()
+    # References are ids almost always; any id resolves to the same route
+    path = '/' + REFERENCE_RE.sub('0', str(operation.get('path', ''))).lstrip('/')
+    if path.startswith('/api/'):
+        path = path[len('/api'):]
+    try:
+        match = resolve(path, urlconf='core.urls')
+    except Resolver404:
+        return None
+    view = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None)
+    if view is None or view is BatchView:
+        return None
+    action = getattr(match.func, 'actions', {}).get(method.lower())
+    return throttling.scope_for(view, action, method)
+
+
+class BatchView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'bulk'
+
+    def throttle_costs(self, request):
+        """One 'bulk' token per operation, plus one from the scope each operation's own view uses."""
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+        if not isinstance(operations, list) or not operations:
+            return {'bulk': 1}
+        costs = {'bulk': len(operations)}
+        for operation in operations[:settings.BATCH_MAX_OPERATIONS]:
+            scope = _operation_scope(operation)
+            if scope:
+                costs[scope] = costs.get(scope, 0) + 1
+        return costs
+
+    def post(self, request):
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+        if not isinstance(operations, list) or not operations:
+            return Response({'detail': 'Expected a non-empty "operations" list.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(operations) > settings.BATCH_MAX_OPERATIONS:
+            return Response(
+                {'detail': f'At most {settings.BATCH_MAX_OPERATIONS} operations per batch.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            with transaction.atomic(using=router.db_for_write(Student)):
+                results = self._run(request, operations)
+        except BatchError as exc:
+            return Response(
+                {'detail': exc.detail, 'failed_index': exc.index, 'results': exc.results},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response({'results': results})
+
+    def _run(self, request, operations):
+        results, by_label = [], {}
+
+        def lookup(ref, dotted, index):
+            source = by_label.get(ref)
+            if source is None and ref.isdigit() and int(ref) < len(results):
+                source = results[int(ref)]
+            if source is None:
+                raise BatchError(f'Operation {index} refers to unknown operation {ref!r}.', results, index)
+            try:
+                return _lookup(source['body'], dotted)
+            except (KeyError, IndexError, ValueError, TypeError):
+                raise BatchError(f'Operation {index}: ${ref}.{dotted} not found in the referenced response.', results, index)
+
+        def resolve_refs(value, index):
+            if isinstance(value, str):
+                match = REFERENCE_RE.fullmatch(value)
+                if match:
+                    # A whole-value reference keeps the referenced type (ids stay integers)
+                    return lookup(match.group('ref'), match.group('path'), index)
+                return REFERENCE_RE.sub(lambda m: str(lookup(m.group('ref'), m.group('path'), index)), value)
+            if isinstance(value, dict):
+                return {k: resolve_refs(v, index) for k, v in value.items()}
+            if isinstance(value, list):
+                return [resolve_refs(v, index) for v in value]
+            return value
+
+        for index, operation in enumerate(operations):
+            if not isinstance(operation, dict):
+                raise BatchError(f'Operation {index} must be an object.', results, index)
+            method = str(operation.get('method', 'GET')).upper()
+            if method not in METHODS:
+                raise BatchError(f'Operation {index}: unsupported method {method}.', results, index)
+            path = resolve_refs(str(operation.get('path', '')), index)
+            params = resolve_refs(operation.get('params') or {}, index)
+            body = resolve_refs(operation.get('body'), index)
+
+            response = self._dispatch(request, method, path, params, body, index, results)
+            result = {'status': response.status_code, 'body': getattr(response, 'data', None)}
+            results.append(result)
+            if 'id' in operation:
+                by_label[str(operation['id'])] = result
+            if response.status_code >= 400:
+                raise BatchError(f'Operation {index} failed with status {response.status_code}.', results, index)
+        return results
+
+    def _dispatch(self, request, method, path, params, body, index, results):
+        path = '/' + path.lstrip('/')
+        if path.startswith('/api/'):
+            path = path[len('/api'):]
+        try:
+            match = resolve(path, urlconf='core.urls')
+        except Resolver404:
+            raise BatchError(f'Operation {index}: no API route for {path}.', results, index)
+        if getattr(match.func, 'view_class', None) is BatchView:
+            raise BatchError(f'Operation {index}: batches cannot be nested.', results, index)
+
+        content = b'' if body is None else json.dumps(body).encode()
+        sub = HttpRequest()
+        sub.method = method
+        sub.path = sub.path_info = f'/api{path}'
+        sub.META = {key: request.META[key] for key in COPIED_META if key in request.META}
+        sub.META.update({
+            'REQUEST_METHOD': method,
+            'QUERY_STRING': urlencode(params, doseq=True),
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(content)),
+        })
+        sub.GET = QueryDict(sub.META['QUERY_STRING'])
+        sub._stream = BytesIO(content)
+        sub._read_started = False
+        # The batch request is already authenticated; reuse its user instead of re-checking the JWT
+        sub._force_auth_user = request.user
+        sub._force_auth_token = request.auth
+        sub._dont_enforce_csrf_checks = True
+        sub.batch_operation = True
+        return match.func(sub, *match.args, **match.kwargs)
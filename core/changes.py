@@ -0,0 +1,171 @@
+"""
+Change log behind the ``/changes/`` delta-sync endpoints.
+
+Every save or delete of a synced model appends a ChangeLog row. The row is written
+by a post_save/post_delete receiver on the same connection, so it commits or rolls
+back with the write itself (the viewsets wrap their writes in a transaction). Bulk
+writes that skip signals call ``record_many`` themselves.
+
+A client keeps the highest ChangeLog id it has seen as its token and asks for
+everything after it:
+
+    GET /api/students/changes/?since=1234
+    -> {"token": 1290, "results": [...changed rows...], "deleted": [17, 42], "more": false}
+
+Ids are handed out at insert but become visible at commit, so on Postgres a
+transaction can commit id 1289 after 1290 is already visible. The token sent to
+clients is therefore the newest id written at least CHANGES_SETTLE_SECONDS ago
+(``settled_token``): anything newer is sent again on the next request, which is
+harmless, instead of being skipped for good when an older id shows up late.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.db.models import Max, Min
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from . import metrics
+from .models import ClassRoom, Student, Attendance, Grade, FeeStructure, Payment, ChangeLog
+
+
+TRACKED = (ClassRoom, Student, Attendance, Grade, FeeStructure, Payment)
+
+
+class TokenExpired(Exception):
+    """The token is older than the retained log; the client has to reload the full list."""
+
+
+def label(model):
+    return model._meta.model_name
+
+
+# Fields copied into the payload of live events (see core.events); other models send none
+EVENT_FIELDS = {
+    Student: ('first_name', 'last_name', 'roll_number', 'classroom_id'),
+    Attendance: ('student_id', 'date', 'status'),
+    Payment: ('student_id', 'fee_type', 'total_fee', 'total_paid', 'balance', 'due_date', 'receipt_number'),
+}
+
+
+def _entry(model, instance, action, classroom_id=None):
+    student_id = instance.pk if model is Student else getattr(instance, 'student_id', None)
+    if model is ClassRoom:
+        classroom_id = instance.pk
+    elif hasattr(instance, 'classroom_id'):
+        classroom_id = instance.classroom_id
+    fields = EVENT_FIELDS.get(model, ())
+    return ChangeLog(
+        model=label(model),
+        object_id=instance.pk,
+        action=action,
+        classroom_id=classroom_id,
+        student_id=student_id,
+        payload={name: getattr(instance, name) for name in fields},
+    )
+
+
+def _student_classrooms(using, student_ids):
+    return dict(Student.objects.using(using).filter(pk__in=student_ids).values_list('pk', 'classroom_id'))
+
+
+def record(sender, instance, using, **kwargs):
+    """post_save/post_delete receiver."""
+    action = ChangeLog.ACTION_SAVE if 'created' in kwargs else ChangeLog.ACTION_DELETE
+    classroom_id = None
+    if getattr(instance, 'student_id', None) is not None:
+        classroom_id = _student_classrooms(using, [instance.student_id]).get(instance.student_id)
+    _entry(sender, instance, action, classroom_id).save(using=using)
+
+
+def record_many(model, objects, action=ChangeLog.ACTION_SAVE, using=None):
+    """Log writes made with bulk_create/update/delete, which send no signals."""
+    using = using or router.db_for_write(ChangeLog)
+    objects = [obj for obj in objects if obj.pk is not None]
+    classrooms = {}
+    if any(getattr(obj, 'student_id', None) is not None for obj in objects):
+        classrooms = _student_classrooms(using, {obj.student_id for obj in objects})
+    ChangeLog.objects.using(using).bulk_create(
+        [_entry(model, obj, action, classrooms.get(getattr(obj, 'student_id', None))) for obj in objects],
+        batch_size=1000,
+    )
+
+
+def connect():
+    for model in TRACKED:
+        post_save.connect(record, sender=model, dispatch_uid=f'core.changes.save.{label(model)}')
+        post_delete.connect(record, sender=model, dispatch_uid=f'core.changes.delete.{label(model)}')
+
+
+def current_token():
+    """The newest id; cache keys use it, so a write is seen at once."""
+    return ChangeLog.objects.aggregate(token=Max('id'))['token'] or 0
+
+
+def settled_token():
+    """The newest id no transaction still in flight can come in under (see the module docstring)."""
+    cutoff = timezone.now() - timedelta(seconds=settings.CHANGES_SETTLE_SECONDS)
+    # Walks the id index back from the top, over the last few seconds of writes only
+    token = ChangeLog.objects.filter(created_at__lt=cutoff).order_by('-id').values_list('id', flat=True).first()
+    if token is None:
+        # Everything is recent: resume from just before the oldest entry
+        first = ChangeLog.objects.order_by('id').values_list('id', flat=True).first()
+        return first - 1 if first else 0
+    return token
+
+
+def cached(name, timeout, compute, *key_parts, token=None):
+    """
+    compute() cached until the next tracked write: the current token is part of the key,
+    so any save or delete makes the old entry unreachable. `timeout` bounds staleness
+    for anything the log does not see (bulk writes without record_many, the date).
+    Pass a narrower `token` (e.g. profiles.version) to survive writes that don't matter.
+    """
+    token = current_token() if token is None else token
+    key = ':'.join(str(part) for part in (name, *key_parts, token))
+    value = cache.get(key)
+    metrics.record_cache(name, value is not None)
+    if value is None:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
+
+
+def changes_since(model, since, limit):
+    """
+    Ids saved and deleted after `since`, collapsed to each object's latest action.
+    Returns (saved_ids, deleted_ids, token, more).
+    """
+    bounds = ChangeLog.objects.aggregate(first=Min('id'), last=Max('id'))
+    if bounds['first'] is not None and since < bounds['first'] - 1:
+        raise TokenExpired
+    entries = list(
+        ChangeLog.objects.filter(model=label(model), id__gt=since)
+        .order_by('id')
+        .values_list('id', 'object_id', 'action')[:limit + 1]
+    )
+    more = len(entries) > limit
+    entries = entries[:limit]
+
+    latest = {}
+    for _, object_id, action in entries:
+        latest[object_id] = action
+    saved = [pk for pk, action in latest.items() if action == ChangeLog.ACTION_SAVE]
+    deleted = [pk for pk, action in latest.items() if action == ChangeLog.ACTION_DELETE]
+    if more:
+        token = entries[-1][0]
+    else:
+        # Nothing left for this model: skip ahead to the newest settled entry of any model. That can
+        # be below `since`; the rows in between are sent again next time rather than risk missing one.
+        token = min(bounds['last'] or 0, settled_token())
+    return saved, deleted, token, more
+
+
+def prune(days):
+    """Delete entries older than `days`, always keeping the newest so tokens stay comparable."""
+    last = current_token()
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = ChangeLog.objects.filter(created_at__lt=cutoff, id__lt=last).delete()
+    return deleted
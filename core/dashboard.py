@@ -0,0 +1,68 @@
+"""
+Figures for the dashboard, each group computed in a single aggregate query.
+
+``students_total`` counts every student record: this schema keeps no enrolment
+status (the legacy ``active``/``inactive`` flag is not imported), so there is no
+narrower "active" figure to give.
+"""
+from django.db.models import Count, Q, Sum
+
+from .models import Attendance, ClassRoom, Payment, Student
+
+
+def _money(value):
+    return f'{value or 0:.2f}'
+
+
+def _payment_row(payment):
+    return {
+        'id': payment.id,
+        'student': payment.student_id,
+        'student_full_name': f'{payment.student.first_name} {payment.student.last_name}',
+        'fee_type': payment.fee_type,
+        'total_paid': _money(payment.total_paid),
+        'balance': _money(payment.balance),
+        'payment_date': payment.payment_date.isoformat(),
+        'due_date': payment.due_date.isoformat() if payment.due_date else None,
+        'receipt_number': payment.receipt_number,
+    }
+
+
+def summary(today, listed=5):
+    month_start = today.replace(day=1)
+    this_month = Q(payment_date__gte=month_start, payment_date__lte=today)
+    overdue = Q(due_date__lt=today, balance__gt=0)
+
+    payments = Payment.objects.aggregate(
+        month_count=Count('id', filter=this_month),
+        month_total=Sum('total_paid', filter=this_month),
+        overdue_count=Count('id', filter=overdue),
+        overdue_amount=Sum('balance', filter=overdue),
+    )
+    attendance = Attendance.objects.filter(date=today).aggregate(
+        marked=Count('id'),
+        present=Count('id', filter=Q(status__in=[Attendance.STATUS_PRESENT, Attendance.STATUS_LATE])),
+    )
+    latest = Payment.objects.select_related('student').order_by('-created_at')[:listed]
+    oldest_overdue = Payment.objects.select_related('student').filter(overdue).order_by('due_date')[:listed]
+
+    return {
+        'date': today.isoformat(),
+        'students_total': Student.objects.count(),
+        'classrooms': ClassRoom.objects.count(),
+        'payments_this_month': {
+            'count': payments['month_count'],
+            'total': _money(payments['month_total']),
+        },
+        'overdue': {
+            'count': payments['overdue_count'],
+            'amount': _money(payments['overdue_amount']),
+            'payments': [_payment_row(p) for p in oldest_overdue],
+        },
+        'attendance_today': {
+            'marked': attendance['marked'],
+            'present': attendance['present'],
+            'rate': round(100 * attendance['present'] / attendance['marked'], 1) if attendance['marked'] else None,
+        },
+        'latest_payments': [_payment_row(p) for p in latest],
+    }
@@ -0,0 +1,44 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+_replica_reads = ContextVar('core_replica_reads', default=False)
+
+
+def allow_replica_reads(allowed):
+    """Route core reads in the current context to replicas (True) or the primary (False)."""
+    return _replica_reads.set(allowed)
+
+
+def reset_replica_reads(token):
+    _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Send reads of core models to a random DATABASE_REPLICAS alias when the
+    current request allows it (see ReplicaRoutingMiddleware). Writes, and reads
+    outside such requests (management commands, admin, auth), use ``default``.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'core' and settings.DATABASE_REPLICAS and _replica_reads.get():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary, so objects loaded from either may be related
+        aliases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
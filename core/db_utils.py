@@ -0,0 +1,66 @@
+from django.db import DatabaseError, connections
+
+
+def estimated_row_count(model, using='default'):
+    """
+    Cheap row-count estimate for a model's table, or None if the backend has none.
+
+    Postgres reads the planner's pg_class.reltuples; SQLite reads sqlite_stat1
+    (populated by ANALYZE) and falls back to MAX(rowid).
+    """
+    table = model._meta.db_table
+    connection = connections[using]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+                row = cursor.fetchone()
+                return row[0] if row and row[0] >= 0 else None
+            if connection.vendor == 'sqlite':
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+                if cursor.fetchone():
+                    cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+                    row = cursor.fetchone()
+                    if row:
+                        return int(row[0].split()[0])
+                cursor.execute(f'SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}')
+                return cursor.fetchone()[0] or 0
+    except DatabaseError:
+        return None
+    return None
+
+
+def table_size_bytes(model, using='default'):
+    """On-disk size of a model's table including its indexes, or None if the backend can't tell."""
+    table = model._meta.db_table
+    connection = connections[using]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_total_relation_size(%s::regclass)', [table])
+                return cursor.fetchone()[0]
+            if connection.vendor == 'sqlite':
+                # dbstat is only available when SQLite is built with SQLITE_ENABLE_DBSTAT_VTAB
+                cursor.execute(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name = %s OR name IN "
+                    "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s)",
+                    [table, table],
+                )
+                return cursor.fetchone()[0]
+    except DatabaseError:
+        return None
+    return None
+
+
+def vacuum_analyze(models, using='default', vacuum=False):
+    """Refresh planner statistics for these tables; on SQLite VACUUM rewrites the whole file."""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for model in models:
+            table = connection.ops.quote_name(model._meta.db_table)
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'VACUUM (ANALYZE) {table}' if vacuum else f'ANALYZE {table}')
+            else:
+                cursor.execute(f'ANALYZE {table}')
+        if vacuum and connection.vendor == 'sqlite':
+            cursor.execute('VACUUM')
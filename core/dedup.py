@@ -0,0 +1,228 @@
+"""
+Find students entered twice, for example under a new roll number or in another class.
+
+Every student gets a few blocking keys built from normalised values: name with any
+two parts of the date of birth, date of birth with phone or with father's name,
+name with father's name or with phone, and surname, first initial and date of
+birth. Names are lower-cased, stripped of accents and punctuation and put in word
+order, so "Rao, Asha" and "asha rao" agree. Phones keep their last ten digits.
+Dates of birth also produce the day/month-swapped date when both parts are 12 or
+less.
+
+Only students that share a key are compared, so a full scan does close to linear
+work instead of comparing every pair. Each candidate pair is scored from name
+similarity, date of birth, father's name and phone. A field that is blank on either
+side is left out of the score. Pairs scoring at least DUPLICATE_STUDENT_MIN_SCORE
+are reported.
+
+Before a student is created, the same scoring runs against the few students with
+the same date of birth or the same name (see StudentViewSet.create).
+"""
+import unicodedata
+from datetime import date
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from .models import Student
+
+
+FIELDS = ('pk', 'first_name', 'last_name', 'date_of_birth', 'father_name', 'contact_phone', 'roll_number', 'classroom_id')
+# Weight of each kind of evidence; blank fields drop out and the rest are rescaled
+WEIGHTS = {'name': 0.5, 'date_of_birth': 0.3, 'father_name': 0.1, 'contact_phone': 0.1}
+# Keys shared by more students than this (e.g. a blank father and a common birthday) say little; skip them
+MAX_BLOCK = 50
+PROGRESS_EVERY = 2000
+
+
+def _words(text):
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode().lower()
+    return ''.join(c if c.isalpha() else ' ' for c in text).split()
+
+
+def _name(first, last):
+    return ' '.join(sorted(_words(f'{first} {last}')))
+
+
+def _phone(value):
+    digits = ''.join(c for c in value or '' if c.isdigit())
+    return digits[-10:] if len(digits) >= 7 else ''
+
+
+def _dates(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    dates = [value]
+    if value.day <= 12 and value.month != value.day:
+        dates.append(value.replace(month=value.day, day=value.month))
+    return dates
+
+
+class _Record:
+    """The normalised fields of one student (saved or about to be)."""
+
+    def __init__(self, values):
+        self.values = values
+        self.pk = values.get('pk')
+        self.name = _name(values.get('first_name'), values.get('last_name'))
+        words = _words(values.get('first_name'))
+        self.initial = words[0][0] if words else ''
+        self.surname = ' '.join(_words(values.get('last_name')))
+        self.dates = _dates(values.get('date_of_birth'))
+        self.father = ' '.join(_words(values.get('father_name')))
+        self.phone = _phone(values.get('contact_phone'))
+
+    def keys(self):
+        keys = set()
+        for born in self.dates:
+            if self.name:
+                # Any two of year, month and day, so one mistyped part still shares a key
+                keys.update((('name_ym', self.name, born.year, born.month), ('name_yd', self.name, born.year, born.day),
+                             ('name_md', self.name, born.month, born.day)))
+            if self.phone:
+                keys.add(('dob_phone', born, self.phone))
+            if self.father:
+                keys.add(('dob_father', born, self.father))
+            if self.surname and self.initial:
+                keys.add(('surname_initial_dob', self.surname, self.initial, born))
+        if self.name and self.father:
+            keys.add(('name_father', self.name, self.father))
+        if self.name and self.phone:
+            keys.add(('name_phone', self.name, self.phone))
+        return keys
+
+
+def _date_match(a, b):
+    if not a.dates or not b.dates:
+        return None
+    if a.dates[0] == b.dates[0]:
+        return 1.0
+    if a.dates[0] in b.dates:
+        return 0.8
+    x, y = a.dates[0], b.dates[0]
+    # One part mistyped: with the same name, enough only if the father or phone agrees too
+    return 0.4 if sum((x.year == y.year, x.month == y.month, x.day == y.day)) == 2 else 0.0
+
+
+def _name_match(a, b):
+    """How well the worst-matching word of the shorter name matches a word of the other."""
+    shorter, longer = sorted((a.name.split(), b.name.split()), key=len)
+    return min(max(SequenceMatcher(None, word, other).ratio() for other in longer) for word in shorter)
+
+
+def score(a, b):
+    """(0..1, reasons) for how likely two records are the same child."""
+    parts = {'name': _name_match(a, b) if a.name and b.name else None}
+    parts['date_of_birth'] = _date_match(a, b)
+    parts['father_name'] = SequenceMatcher(None, a.father, b.father).ratio() if a.father and b.father else None
+    parts['contact_phone'] = float(a.phone == b.phone) if a.phone and b.phone else None
+    known = {field: value for field, value in parts.items() if value is not None}
+    total = sum(WEIGHTS[field] for field in known)
+    if not known or 'name' not in known:
+        return 0.0, []
+    reasons = [f'same {field.replace("_", " ")}' if value == 1 else f'similar {field.replace("_", " ")}'
+               for field, value in known.items() if value >= 0.8]
+    return sum(WEIGHTS[field] * value for field, value in known.items()) / total, reasons
+
+
+def _row(record, other_score=None, reasons=None):
+    values = record.values
+    row = {
+        'id': record.pk,
+        'first_name': values['first_name'],
+        'last_name': values['last_name'],
+        'date_of_birth': str(values['date_of_birth']),
+        'roll_number': values['roll_number'],
+        'classroom': values['classroom_id'],
+    }
+    if other_score is not None:
+        row.update(score=round(other_score, 2), reasons=reasons)
+    return row
+
+
+def candidates_for(values, min_score=None, exclude=None):
+    """Saved students that `values` (a student payload) probably duplicates, best first."""
+    min_score = settings.DUPLICATE_STUDENT_MIN_SCORE if min_score is None else min_score
+    record = _Record(values)
+    if not record.name:
+        return []
+    # Both terms are indexed. Every other key pairs the phone or father with the date of birth or the name,
+    # so these are the only students that can share a key.
+    first, last = (values.get('first_name') or '').strip().lower(), (values.get('last_name') or '').strip().lower()
+    nearby = Q(date_of_birth__in=record.dates) | Q(lower_last=last, lower_first=first) | Q(lower_last=first, lower_first=last)
+    students = Student.objects.alias(lower_last=Lower('last_name'), lower_first=Lower('first_name')).filter(nearby)
+    keys = record.keys()
+    found = []
+    for other in students.exclude(pk=exclude).order_by().values(*FIELDS):
+        other = _Record(other)
+        if keys & other.keys():
+            value, reasons = score(record, other)
+            if value >= min_score:
+                found.append(_row(other, value, reasons))
+    return sorted(found, key=lambda row: -row['score'])
+
+
+def find_duplicates(queryset=None, min_score=None, progress=None):
+    """
+    Groups of students that are probably the same child, from one pass over `queryset`.
+
+    progress(stage, done, total) is called every PROGRESS_EVERY students read and blocks
+    compared, and at the end of each stage; the total of students is None until then.
+    """
+    min_score = settings.DUPLICATE_STUDENT_MIN_SCORE if min_score is None else min_score
+    queryset = Student.objects.all() if queryset is None else queryset
+    records, blocks = {}, {}
+    for values in queryset.order_by().values(*FIELDS).iterator(chunk_size=PROGRESS_EVERY):
+        record = _Record(values)
+        records[record.pk] = record
+        for key in record.keys():
+            blocks.setdefault(key, []).append(record.pk)
+        if progress and len(records) % PROGRESS_EVERY == 0:
+            progress('students', len(records), None)
+    if progress:
+        progress('students', len(records), len(records))
+
+    compared, pairs = set(), []
+    for done, members in enumerate(blocks.values(), 1):
+        if progress and (done % PROGRESS_EVERY == 0 or done == len(blocks)):
+            progress('blocks', done, len(blocks))
+        if len(members) < 2 or len(members) > MAX_BLOCK:
+            continue
+        for i, first in enumerate(members):
+            for second in members[i + 1:]:
+                pair = (first, second) if first < second else (second, first)
+                if pair in compared:
+                    continue
+                compared.add(pair)
+                value, reasons = score(records[first], records[second])
+                if value >= min_score:
+                    pairs.append((pair, value, reasons))
+
+    # Union-find, so A~B and B~C report one group of three
+    parent = {}
+
+    def root(pk):
+        while parent.get(pk, pk) != pk:
+            pk = parent[pk]
+        return pk
+
+    for (first, second), _, _ in pairs:
+        parent[root(second)] = root(first)
+    groups = {}
+    for (first, second), value, reasons in pairs:
+        group = groups.setdefault(root(first), {'students': set(), 'pairs': []})
+        group['students'].update((first, second))
+        group['pairs'].append({'students': [first, second], 'score': round(value, 2), 'reasons': reasons})
+    return {
+        'students': len(records),
+        'blocks': len(blocks),
+        'compared': len(compared),
+        'groups': [
+            {'students': [_row(records[pk]) for pk in sorted(group['students'])], 'pairs': group['pairs']}
+            for group in sorted(groups.values(), key=lambda group: min(group['students']))
+        ],
+    }
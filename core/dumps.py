@@ -0,0 +1,241 @@
+"""
+Dump and restore a school's core data as gzipped NDJSON, one file per model.
+
+    <dir>/manifest.json
+    <dir>/01-core.classroom.ndjson.gz    {"id": 1, "name": "5", "section": "A"}
+    <dir>/02-core.student.ndjson.gz      ...
+
+A dump reads every model inside one transaction, so the files form a consistent
+snapshot, and it streams rows straight to disk. The manifest records each file's
+row count and the SHA-256 of its uncompressed content.
+
+A restore runs in one transaction. Foreign-key checks are deferred until every
+file has been loaded, and rows go in with executemany batches. Values are written
+exactly as dumped, including ids and auto_now timestamps. A file whose checksum or
+row count does not match its manifest entry rolls the whole restore back. Afterwards
+the change log is reset, so every sync token issued before the restore expires and
+clients reload their lists.
+
+Logins (auth users and AdminUser), jobs and the change log itself are not included.
+"""
+import gzip
+import hashlib
+import json
+import os
+import uuid
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.management.color import no_style
+from django.db import connections, models, router, transaction
+from django.utils import timezone
+from django.utils.duration import duration_iso_string
+
+from .models import (
+    ClassRoom, Student, Attendance, Grade, FeeStructure, Payment, PaymentReceipt, ReceiptSequence,
+    ArchivedAttendance, ArchivedGrade, ArchivedPayment, ArchiveRun, LegacyIdMap, ReminderLog, ChangeLog,
+)
+
+
+# Parents before children; restore loads in this order
+MODELS = (
+    ClassRoom, Student, Attendance, Grade, FeeStructure, Payment, PaymentReceipt, ReceiptSequence,
+    ArchivedAttendance, ArchivedGrade, ArchivedPayment, ArchiveRun, LegacyIdMap, ReminderLog,
+)
+FORMAT = 1
+MANIFEST = 'manifest.json'
+BATCH_SIZE = 2000
+# Fields whose JSON form (a string) has to be turned back into a Python value
+CONVERTED_FIELDS = (
+    models.DateField, models.TimeField, models.DecimalField, models.DurationField, models.UUIDField,
+)
+
+
+class DumpError(Exception):
+    """The dump is incomplete, corrupt, or doesn't fit this database."""
+
+
+def _encode(value):
+    # Unlike DjangoJSONEncoder, keep microseconds so a restore is exact
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, timedelta):
+        return duration_iso_string(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f'Cannot serialise {type(value).__name__}')
+
+
+def _file_name(position, model):
+    return f'{position:02d}-{model._meta.label_lower}.ndjson.gz'
+
+
+def _fields(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def _snapshot(connection):
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+
+
+def dump_model(model, path, using):
+    """Write one model's rows to `path`; returns (rows, sha256 of the uncompressed lines)."""
+    names = _fields(model)
+    digest, rows = hashlib.sha256(), 0
+    queryset = model._base_manager.using(using).order_by('pk').values_list(*names)
+    with gzip.open(path, 'wb', compresslevel=5) as out:
+        for values in queryset.iterator(chunk_size=BATCH_SIZE):
+            line = json.dumps(dict(zip(names, values)), default=_encode, separators=(',', ':')).encode() + b'\n'
+            digest.update(line)
+            out.write(line)
+            rows += 1
+    return rows, digest.hexdigest()
+
+
+def dump(directory, using=None, progress=None):
+    """Dump every model in MODELS into `directory`; returns the manifest."""
+    using = using or router.db_for_read(Student)
+    os.makedirs(directory, exist_ok=True)
+    if os.path.exists(os.path.join(directory, MANIFEST)):
+        raise DumpError(f'{directory} already holds a dump')
+
+    entries = []
+    with transaction.atomic(using=using):
+        _snapshot(connections[using])
+        for position, model in enumerate(MODELS, 1):
+            name = _file_name(position, model)
+            rows, checksum = dump_model(model, os.path.join(directory, name), using)
+            entries.append({
+                'model': model._meta.label_lower,
+                'file': name,
+                'fields': _fields(model),
+                'rows': rows,
+                'sha256': checksum,
+            })
+            if progress:
+                progress(model, rows)
+
+    manifest = {'format': FORMAT, 'created_at': timezone.now().isoformat(), 'models': entries}
+    # Written last: a directory without a manifest is an unfinished dump
+    with open(os.path.join(directory, MANIFEST), 'w') as out:
+        json.dump(manifest, out, indent=2)
+    return manifest
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise DumpError(f'{directory} has no {MANIFEST}; the dump is missing or did not finish')
+    if manifest.get('format') != FORMAT:
+        raise DumpError(f'Unsupported dump format {manifest.get("format")!r}')
+    known = {model._meta.label_lower for model in MODELS}
+    unknown = [entry['model'] for entry in manifest['models'] if entry['model'] not in known]
+    if unknown:
+        raise DumpError(f'Unknown models in dump: {", ".join(unknown)}')
+    return manifest
+
+
+def _lines(directory, entry):
+    """Yield the raw lines of a dump file, then check them against the manifest."""
+    digest, rows = hashlib.sha256(), 0
+    with gzip.open(os.path.join(directory, entry['file']), 'rb') as lines:
+        for line in lines:
+            digest.update(line)
+            rows += 1
+            yield line
+    if rows != entry['rows']:
+        raise DumpError(f'{entry["file"]} has {rows} rows, the manifest says {entry["rows"]}')
+    if digest.hexdigest() != entry['sha256']:
+        raise DumpError(f'{entry["file"]} does not match its checksum in the manifest')
+
+
+def verify(directory):
+    """Check every file's checksum and row count without touching the database."""
+    manifest = read_manifest(directory)
+    for entry in manifest['models']:
+        for _ in _lines(directory, entry):
+            pass
+    return manifest
+
+
+def _row_preparer(model, names, connection):
+    """Column list plus a function turning a decoded JSON row into INSERT parameters."""
+    fields = model._meta.concrete_fields
+    missing = set(names) - {field.attname for field in fields}
+    if missing:
+        raise DumpError(f'{model._meta.label} has no fields {", ".join(sorted(missing))}; migrate this database first')
+    # Fields added to the model since the dump was taken get their defaults
+    defaults = {field.attname: field.get_default() for field in fields if field.attname not in names}
+    steps = [(field.attname, field.to_python if isinstance(field, CONVERTED_FIELDS) else None, field) for field in fields]
+
+    def prepare(row):
+        values = []
+        for attname, convert, field in steps:
+            value = row[attname] if attname in row else defaults[attname]
+            if convert is not None and isinstance(value, str):
+                value = convert(value)
+            values.append(field.get_db_prep_save(value, connection))
+        return values
+
+    return [field.column for field in fields], prepare
+
+
+def restore_model(model, directory, entry, using, batch_size=BATCH_SIZE):
+    connection = connections[using]
+    columns, prepare = _row_preparer(model, entry['fields'], connection)
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table), ', '.join(quote(column) for column in columns), ', '.join(['%s'] * len(columns)),
+    )
+    batch, rows = [], 0
+    with connection.cursor() as cursor:
+        for line in _lines(directory, entry):
+            batch.append(prepare(json.loads(line)))
+            if len(batch) >= batch_size:
+                cursor.executemany(sql, batch)
+                rows += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+            rows += len(batch)
+    return rows
+
+
+def restore(directory, using=None, replace=False, batch_size=BATCH_SIZE, progress=None):
+    """Load a dump in one transaction; returns {model label: rows}."""
+    manifest = read_manifest(directory)
+    using = using or router.db_for_write(Student)
+    connection = connections[using]
+    by_label = {model._meta.label_lower: model for model in MODELS}
+    loaded = [by_label[entry['model']] for entry in manifest['models']]
+    quote = connection.ops.quote_name
+
+    counts = {}
+    with transaction.atomic(using=using):
+        occupied = [model._meta.label for model in loaded if model._base_manager.using(using).exists()]
+        if occupied and not replace:
+            raise DumpError(f'Not empty: {", ".join(occupied)}. Restore into an empty database or replace the existing rows')
+        with connection.constraint_checks_disabled():
+            with connection.cursor() as cursor:
+                if replace:
+                    for model in reversed(loaded):
+                        cursor.execute(f'DELETE FROM {quote(model._meta.db_table)}')
+            for entry, model in zip(manifest['models'], loaded):
+                counts[model._meta.label] = restore_model(model, directory, entry, using, batch_size)
+                if progress:
+                    progress(model, counts[model._meta.label])
+        connection.check_constraints(table_names=[model._meta.db_table for model in loaded])
+
+        with connection.cursor() as cursor:
+            for statement in connection.ops.sequence_reset_sql(no_style(), loaded):
+                cursor.execute(statement)
+        # Old sync tokens describe data that may no longer exist: a fresh log expires all of them
+        ChangeLog.objects.using(using).all().delete()
+        ChangeLog.objects.using(using).create(model='restore', object_id=0, action=ChangeLog.ACTION_SAVE)
+    return counts
@@ -0,0 +1,318 @@
+"""
+Server-sent events for live Student, Attendance and Payment changes.
+
+    POST /api/events/ticket/                    (with the usual Authorization header)
+    -> {"ticket": "...", "expires_in": 30}
+    GET /api/events/?ticket=<ticket>&classroom=3&classroom=4&models=payment,attendance
+
+Each event is one ChangeLog row:
+
+    id: 1290
+    event: payment
+    data: {"action": "save", "id": 77, "classroom": 3, "student": 12, "data": {"balance": "1500.00", ...}}
+
+The stream must be served by the ASGI app (see README), where an open connection
+costs a coroutine rather than a sync worker. Writes reach every worker through the
+ChangeLog table itself: each worker runs one poller per database, shared by all of
+its open streams, so no broker is needed. Browsers reconnect with Last-Event-ID and
+get what they missed from the log.
+
+EventSource cannot set headers, so browsers authenticate with a ticket rather than
+the access token: it is signed for the stream only, names the user and school, and
+expires after EVENTS_TICKET_SECONDS. URLs end up in proxy logs, and a logged ticket
+is useless by the time anyone reads it. Other clients can send the Authorization
+header instead. Either way the school must be the one the host serves.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections, router
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+
+from . import tenancy
+from .models import ChangeLog
+
+
+logger = logging.getLogger('core.events')
+
+EVENT_MODELS = ('student', 'attendance', 'payment')
+BATCH = 500
+TICKET_SALT = 'core.events.ticket'
+
+
+def _entries_after(alias, last_id, limit=BATCH):
+    try:
+        return list(
+            ChangeLog.objects.using(alias)
+            .filter(id__gt=last_id, model__in=EVENT_MODELS)
+            .order_by('id')
+            .values('id', 'model', 'object_id', 'action', 'classroom_id', 'student_id', 'payload')[:limit]
+        )
+    except Exception:
+        connections[alias].close_if_unusable_or_obsolete()
+        raise
+
+
+def _late_entries(alias, floor, below, seen):
+    """Entries between floor and below that were not visible when the poller passed them."""
+    try:
+        ids = (
+            ChangeLog.objects.using(alias)
+            .filter(id__gt=floor, id__lt=below, model__in=EVENT_MODELS)
+            .values_list('id', flat=True)
+        )
+        missing = [pk for pk in ids if pk not in seen]
+        if not missing:
+            return []
+        return list(
+            ChangeLog.objects.using(alias)
+            .filter(id__in=missing)
+            .order_by('id')
+            .values('id', 'model', 'object_id', 'action', 'classroom_id', 'student_id', 'payload')
+        )
+    except Exception:
+        connections[alias].close_if_unusable_or_obsolete()
+        raise
+
+
+def _latest_id(alias):
+    return ChangeLog.objects.using(alias).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def _oldest_id(alias):
+    return ChangeLog.objects.using(alias).order_by('id').values_list('id', flat=True).first() or 0
+
+
+class Feed:
+    """
+    Polls ChangeLog on one database and hands new entries to every subscribed queue.
+
+    An id can commit after a higher one was already passed on. Every id handed out in the
+    last CHANGES_SETTLE_SECONDS is remembered, and each poll also looks for ids in that
+    window it hasn't seen, so a late entry is sent (out of order) rather than skipped.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.queues = set()
+        self.last_id = None
+        self.task = None
+        # Every id above `floor` that was handed out, with when it was first seen
+        self.floor = 0
+        self.seen = {}
+
+    def subscribe(self, queue):
+        self.queues.add(queue)
+        if self.task is None or self.task.done():
+            # A fresh context: the poller outlives the request that started it
+            self.task = asyncio.get_running_loop().create_task(self._poll(), context=contextvars.Context())
+
+    def unsubscribe(self, queue):
+        self.queues.discard(queue)
+
+    def _settle(self, now):
+        """Move the floor up to the newest id seen long enough ago that nothing below it is in flight."""
+        settled = [pk for pk, seen_at in self.seen.items() if now - seen_at >= settings.CHANGES_SETTLE_SECONDS]
+        if settled:
+            self.floor = max(self.floor, *settled)
+            self.seen = {pk: seen_at for pk, seen_at in self.seen.items() if pk > self.floor}
+
+    async def _poll(self):
+        try:
+            self.last_id = self.floor = await sync_to_async(_latest_id)(self.alias)
+            self.seen = {}
+            while self.queues:
+                try:
+                    entries = await sync_to_async(_entries_after)(self.alias, self.last_id)
+                    late = []
+                    if self.last_id > self.floor:
+                        late = await sync_to_async(_late_entries)(self.alias, self.floor, self.last_id, self.seen)
+                except Exception:
+                    logger.exception('Polling change log on %s failed', self.alias)
+                    entries, late = [], []
+                now = time.monotonic()
+                if entries:
+                    self.last_id = entries[-1]['id']
+                if late or entries:
+                    for entry in late + entries:
+                        self.seen[entry['id']] = now
+                    for queue in list(self.queues):
+                        queue.put_nowait(late + entries)
+                self._settle(now)
+                if len(entries) < BATCH:
+                    await asyncio.sleep(settings.EVENTS_POLL_SECONDS)
+        finally:
+            self.last_id = None
+
+
+_feeds = {}
+
+
+def _feed(alias):
+    if alias not in _feeds:
+        _feeds[alias] = Feed(alias)
+    return _feeds[alias]
+
+
+def _format(entry):
+    data = {
+        'action': entry['action'],
+        'id': entry['object_id'],
+        'classroom': entry['classroom_id'],
+        'student': entry['student_id'],
+        'data': entry['payload'],
+    }
+    return f'id: {entry["id"]}\nevent: {entry["model"]}\ndata: {json.dumps(data)}\n\n'
+
+
+def _parse_filters(request):
+    classrooms = set()
+    for value in request.GET.getlist('classroom'):
+        for part in value.split(','):
+            if not part.strip():
+                continue
+            if not part.strip().isdigit():
+                raise ValueError(f'classroom must be a classroom id, not {part!r}')
+            classrooms.add(int(part))
+    models = {m.strip() for m in request.GET.get('models', '').split(',') if m.strip()} or set(EVENT_MODELS)
+    unknown = models - set(EVENT_MODELS)
+    if unknown:
+        raise ValueError(f'Unknown models: {", ".join(sorted(unknown))}')
+    return classrooms, models
+
+
+class TicketView(APIView):
+    """A short-lived ticket for opening the event stream, so the access token stays out of URLs."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        ticket = signing.dumps({'user': request.user.pk, 'tenant': tenancy.current_tenant()}, salt=TICKET_SALT)
+        return Response({'ticket': ticket, 'expires_in': settings.EVENTS_TICKET_SECONDS})
+
+
+def _ticket_user(raw, host_tenant):
+    try:
+        ticket = signing.loads(raw, salt=TICKET_SALT, max_age=settings.EVENTS_TICKET_SECONDS)
+    except signing.SignatureExpired:
+        raise AuthenticationFailed('Ticket has expired; ask for a new one.')
+    except signing.BadSignature:
+        raise AuthenticationFailed('Ticket is invalid.')
+    tenant = ticket['tenant']
+    if settings.TENANTS and host_tenant is not None and tenant != host_tenant:
+        raise AuthenticationFailed('Ticket was issued for a different school.')
+    with tenancy.use_tenant(tenant):
+        user = get_user_model().objects.filter(pk=ticket['user']).first()
+    if user is None:
+        raise AuthenticationFailed('User not found.')
+    return user, tenant
+
+
+def _token_user(request, host_tenant):
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    raw = auth.get_raw_token(header) if header else None
+    if not raw:
+        raise AuthenticationFailed('Authentication credentials were not provided.')
+    token = auth.get_validated_token(raw)
+    tenant = None
+    if settings.TENANTS:
+        try:
+            tenant = tenancy.tenant_for_token(token, host_tenant)
+        except tenancy.WrongTenant as exc:
+            raise AuthenticationFailed(str(exc))
+    with tenancy.use_tenant(tenant):
+        user = auth.get_user(token)
+    return user, tenant
+
+
+async def _authenticate(request):
+    """Returns (user, tenant slug) from ?ticket= or the Authorization header."""
+    host_tenant = tenancy.tenant_for_host(request.get_host()) if settings.TENANTS else None
+    raw = request.GET.get('ticket')
+    if raw:
+        return await sync_to_async(_ticket_user)(raw, host_tenant)
+    return await sync_to_async(_token_user)(request, host_tenant)
+
+
+async def stream(request):
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'detail': 'Live events are served by the ASGI app; see README.'}, status=501)
+    try:
+        user, tenant = await _authenticate(request)
+    except (InvalidToken, TokenError):
+        return JsonResponse({'detail': 'Token is invalid or expired.'}, status=401)
+    except AuthenticationFailed as exc:
+        return JsonResponse({'detail': str(exc.detail)}, status=401)
+    if not user.is_active:
+        return JsonResponse({'detail': 'User is inactive.'}, status=401)
+    try:
+        classrooms, models = _parse_filters(request)
+    except ValueError as exc:
+        return JsonResponse({'detail': str(exc)}, status=400)
+
+    with tenancy.use_tenant(tenant):
+        alias = router.db_for_read(ChangeLog)
+    since = request.headers.get('Last-Event-ID') or request.GET.get('since')
+    response = StreamingHttpResponse(
+        _events(alias, classrooms, models, int(since) if since and since.isdigit() else None),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def _events(alias, classrooms, models, since):
+    feed = _feed(alias)
+    queue = asyncio.Queue()
+    feed.subscribe(queue)
+    loop = asyncio.get_running_loop()
+    # Close now and then so clients reconnect, re-authenticate and spread across workers
+    deadline = loop.time() + settings.EVENTS_MAX_SECONDS
+    # The feed may pass on what the catch-up already sent; it never repeats itself
+    caught_up = set()
+
+    def wanted(entry):
+        if entry['id'] in caught_up or entry['model'] not in models:
+            return False
+        return not classrooms or entry['classroom_id'] in classrooms
+
+    try:
+        yield f'retry: {settings.EVENTS_RETRY_MS}\n\n'
+        if since is not None:
+            missed = await sync_to_async(_entries_after)(alias, since, settings.CHANGES_PAGE_SIZE)
+            oldest = await sync_to_async(_oldest_id)(alias)
+            if len(missed) >= settings.CHANGES_PAGE_SIZE or since < oldest - 1:
+                # Too far behind, or the log was pruned: the client reloads its lists instead
+                yield 'event: reset\ndata: {}\n\n'
+                return
+            for entry in missed:
+                if wanted(entry):
+                    yield _format(entry)
+            caught_up.update(entry['id'] for entry in missed)
+
+        while loop.time() < deadline:
+            try:
+                entries = await asyncio.wait_for(queue.get(), timeout=settings.EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            for entry in entries:
+                if wanted(entry):
+                    yield _format(entry)
+    finally:
+        feed.unsubscribe(queue)
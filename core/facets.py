@@ -0,0 +1,145 @@
+"""
+Distinct values with counts, for the filter dropdowns.
+
+Each facet is one grouped query over the rows it describes:
+
+    subject, term           grades
+    month, fee_type,        payments (month is the payment date's 'YYYY-MM')
+    payment_method
+    status                  attendance marks
+    classroom, section      students
+
+Filters use the facet names plus ``student``, e.g. ``?classroom=3&month=2026-10``.
+A filter narrows every facet whose rows it describes, except the facet it names:
+with ``fee_type=tuition`` selected, the fee_type facet still lists the other fee
+types (with their counts under the remaining filters), so a dropdown can switch
+between them. ``month`` filters payments by payment date and attendance by date.
+"""
+from datetime import date
+
+from django.db.models import Count, F
+from django.db.models.functions import TruncMonth
+
+from .models import Attendance, Grade, Payment, Student
+
+
+class FacetError(ValueError):
+    """An unknown facet or a filter value that doesn't parse; `param` names the query parameter."""
+
+    def __init__(self, param, message):
+        super().__init__(message)
+        self.param = param
+
+
+# facet -> (model, field grouped on)
+FACETS = {
+    'subject': (Grade, 'subject'),
+    'term': (Grade, 'term'),
+    'month': (Payment, 'payment_date'),
+    'fee_type': (Payment, 'fee_type'),
+    'payment_method': (Payment, 'payment_method'),
+    'status': (Attendance, 'status'),
+    'classroom': (Student, 'classroom_id'),
+    'section': (Student, 'classroom__section'),
+}
+
+# filter -> {model: field it constrains}
+FILTERS = {
+    'student': {Grade: 'student_id', Payment: 'student_id', Attendance: 'student_id'},
+    'classroom': {Student: 'classroom_id', Grade: 'student__classroom_id', Payment: 'student__classroom_id',
+                  Attendance: 'student__classroom_id'},
+    'section': {Student: 'classroom__section', Grade: 'student__classroom__section',
+                Payment: 'student__classroom__section', Attendance: 'student__classroom__section'},
+    'subject': {Grade: 'subject'},
+    'term': {Grade: 'term'},
+    'month': {Payment: 'payment_date', Attendance: 'date'},
+    'fee_type': {Payment: 'fee_type'},
+    'payment_method': {Payment: 'payment_method'},
+    'status': {Attendance: 'status'},
+}
+
+
+def _month(value):
+    try:
+        start = date.fromisoformat(f'{value}-01')
+    except ValueError:
+        raise FacetError('month', f'Expected a month like 2026-10, not {value!r}.')
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+
+def clean_names(value):
+    """Facet names from a comma-separated list; all of them when it is empty. Raises FacetError."""
+    names = [name.strip() for name in (value or '').split(',') if name.strip()]
+    for name in names:
+        if name not in FACETS:
+            raise FacetError('only', f'Unknown facet {name!r}; expected some of: {", ".join(FACETS)}.')
+    return names or list(FACETS)
+
+
+def clean_filters(params):
+    """The recognised filters from query parameters, parsed; raises FacetError."""
+    filters = {}
+    for name in FILTERS:
+        value = (params.get(name) or '').strip()
+        if not value:
+            continue
+        if name in ('student', 'classroom'):
+            if not value.isdigit():
+                raise FacetError(name, f'Expected an id, not {value!r}.')
+            value = int(value)
+        elif name == 'month':
+            _month(value)
+        filters[name] = value
+    return filters
+
+
+def _queryset(name, filters):
+    model, _ = FACETS[name]
+    queryset = model.objects.all()
+    for other, value in filters.items():
+        target = FILTERS[other].get(model)
+        if other == name or target is None:
+            continue
+        if other == 'month':
+            start, end = _month(value)
+            queryset = queryset.filter(**{f'{target}__gte': start, f'{target}__lt': end})
+        else:
+            queryset = queryset.filter(**{target: value})
+    return queryset
+
+
+def _labels(model, field):
+    return dict(model._meta.get_field(field).choices or ())
+
+
+def facet(name, filters):
+    """[{'value', 'count', ...}] for one facet, from one grouped query."""
+    model, field = FACETS[name]
+    queryset = _queryset(name, filters).order_by()
+    if name == 'classroom':
+        rows = (
+            queryset.values('classroom_id', 'classroom__name', 'classroom__section')
+            .annotate(count=Count('pk'))
+            .order_by('classroom__name', 'classroom__section')
+        )
+        return [
+            {'value': row['classroom_id'], 'name': row['classroom__name'], 'section': row['classroom__section'],
+             'count': row['count']}
+            for row in rows
+        ]
+    if name == 'month':
+        rows = queryset.values(value=TruncMonth(field)).annotate(count=Count('pk')).order_by('-value')
+        return [{'value': row['value'].strftime('%Y-%m'), 'count': row['count']} for row in rows]
+
+    rows = queryset.values(value=F(field)).annotate(count=Count('pk')).order_by('value')
+    labels = _labels(model, field) if '__' not in field else {}
+    if labels:
+        return [{'value': row['value'], 'label': labels.get(row['value'], row['value']), 'count': row['count']}
+                for row in rows]
+    return [{'value': row['value'], 'count': row['count']} for row in rows]
+
+
+def facets(names, filters):
+    """{facet: values} for the facets in `names` under `filters` (see clean_names and clean_filters)."""
+    return {name: facet(name, filters) for name in names}
@@ -0,0 +1,96 @@
+from contextvars import ContextVar
+from time import perf_counter
+
+
+_current = ContextVar('core_request_timings', default=None)
+
+
+class RequestTimings:
+    """Per-request counters filled in by the middleware, DB execute wrapper and serializers."""
+
+    __slots__ = (
+        'started', 'viewset', 'action', 'db_queries', 'db_time',
+        'serialize_time', 'render_time', 'render_started', 'serializing', 'total_time',
+    )
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.viewset = ''
+        self.action = ''
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+        self.render_started = None
+        self.serializing = False
+        self.total_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Installed with connection.execute_wrapper() on every alias
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_time += perf_counter() - started
+
+    def finish(self):
+        self.total_time = perf_counter() - self.started
+
+    def server_timing(self):
+        app_time = max(0.0, self.total_time - self.db_time - self.serialize_time - self.render_time)
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.db_queries} queries"',
+            f'serialize;dur={self.serialize_time * 1000:.2f}',
+            f'render;dur={self.render_time * 1000:.2f}',
+            f'app;dur={app_time * 1000:.2f}',
+            f'total;dur={self.total_time * 1000:.2f}',
+        ])
+
+    def as_log_fields(self):
+        return {
+            'viewset': self.viewset,
+            'action': self.action,
+            'db_queries': self.db_queries,
+            'db_ms': round(self.db_time * 1000, 2),
+            'serialize_ms': round(self.serialize_time * 1000, 2),
+            'render_ms': round(self.render_time * 1000, 2),
+            'total_ms': round(self.total_time * 1000, 2),
+        }
+
+
+def current_timings():
+    return _current.get()
+
+
+def activate(timings):
+    return _current.set(timings)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def view_names(view_func, method):
+    """Return (viewset, action) for a resolved view, e.g. ('StudentViewSet', 'list')."""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__name__', ''), ''
+    actions = getattr(view_func, 'actions', None) or {}
+    return cls.__name__, actions.get(method.lower(), method.lower())
+
+
+class TimedSerializerMixin:
+    """Attribute time spent in to_representation() (minus SQL it triggers) to the current request."""
+
+    def to_representation(self, instance):
+        timings = _current.get()
+        if timings is None or timings.serializing:
+            return super().to_representation(instance)
+        timings.serializing = True
+        started, db_before = perf_counter(), timings.db_time
+        try:
+            return super().to_representation(instance)
+        finally:
+            timings.serializing = False
+            timings.serialize_time += (perf_counter() - started) - (timings.db_time - db_before)
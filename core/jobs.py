@@ -0,0 +1,159 @@
+"""
+Database-backed background jobs for work too slow for a request (imports, exports,
+billing runs). Jobs are rows in core.Job; ``manage.py run_jobs`` claims and runs them
+in a thread pool. No broker is needed: claiming is a conditional UPDATE, which is
+atomic on both SQLite and Postgres.
+
+    @job('export_csv')
+    def export_csv(ctx, model):
+        ...
+        ctx.progress(done, total)
+        return {'rows': total}
+
+    enqueue('export_csv', {'model': 'Student'}, user=request.user)
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger('core.jobs')
+
+HANDLERS = {}
+
+
+class RetryLater(Exception):
+    """Raise from a handler to reschedule without it counting as an error."""
+
+    def __init__(self, seconds=60):
+        super().__init__(f'retry in {seconds}s')
+        self.seconds = seconds
+
+
+def job(kind, max_attempts=3):
+    """Register a handler ``fn(ctx, **payload)`` for jobs of this kind."""
+    def decorator(fn):
+        HANDLERS[kind] = (fn, max_attempts)
+        return fn
+    return decorator
+
+
+def enqueue(kind, payload=None, user=None, run_after=None):
+    if kind not in HANDLERS:
+        raise ValueError(f'Unknown job kind {kind!r}')
+    return Job.objects.create(
+        kind=kind,
+        payload=payload or {},
+        max_attempts=HANDLERS[kind][1],
+        run_after=run_after or timezone.now(),
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+
+
+class JobContext:
+    """Handed to handlers for progress reporting; writes are throttled to one per second."""
+
+    def __init__(self, job):
+        self.job = job
+        self._last_write = 0.0
+
+    def progress(self, done, total=None, message=''):
+        now = time.monotonic()
+        finished = total is not None and done >= total
+        if not finished and now - self._last_write < 1.0:
+            return
+        self._last_write = now
+        # Also renews the lease so long jobs are not mistaken for dead ones
+        fields = {'progress_done': done, 'progress_message': message[:255], 'locked_at': timezone.now()}
+        if total is not None:
+            fields['progress_total'] = total
+        Job.objects.filter(pk=self.job.pk).update(**fields)
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def requeue_stale():
+    """Put jobs whose worker died mid-run back in the queue."""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    return Job.objects.filter(status=Job.STATUS_RUNNING, locked_at__lt=cutoff).update(
+        status=Job.STATUS_QUEUED, locked_by='', locked_at=None,
+    )
+
+
+def claim(worker):
+    """Atomically take the next runnable job, or return None."""
+    now = timezone.now()
+    candidates = (
+        Job.objects.filter(status=Job.STATUS_QUEUED, run_after__lte=now, kind__in=list(HANDLERS))
+        .order_by('run_after', 'pk')
+        .values_list('pk', flat=True)[:10]
+    )
+    for pk in candidates:
+        claimed = Job.objects.filter(pk=pk, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING,
+            locked_by=worker,
+            locked_at=now,
+            started_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run(job_obj):
+    fn, _ = HANDLERS[job_obj.kind]
+    try:
+        result = fn(JobContext(job_obj), **job_obj.payload)
+    except RetryLater as exc:
+        Job.objects.filter(pk=job_obj.pk).update(
+            status=Job.STATUS_QUEUED,
+            attempts=F('attempts') - 1,
+            run_after=timezone.now() + timedelta(seconds=exc.seconds),
+            locked_by='',
+            locked_at=None,
+        )
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception('Job %s (%s) failed on attempt %s', job_obj.pk, job_obj.kind, job_obj.attempts)
+        if job_obj.attempts < job_obj.max_attempts:
+            backoff = settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (job_obj.attempts - 1)
+            Job.objects.filter(pk=job_obj.pk).update(
+                status=Job.STATUS_QUEUED,
+                error=error,
+                run_after=timezone.now() + timedelta(seconds=backoff),
+                locked_by='',
+                locked_at=None,
+            )
+        else:
+            Job.objects.filter(pk=job_obj.pk).update(
+                status=Job.STATUS_FAILED, error=error, finished_at=timezone.now(), locked_by='',
+            )
+    else:
+        Job.objects.filter(pk=job_obj.pk).update(
+            status=Job.STATUS_SUCCEEDED, result=result, error='', finished_at=timezone.now(), locked_by='',
+        )
+
+
+def run_pending(limit=None):
+    """Run queued jobs in the calling thread until none are left."""
+    count = 0
+    while limit is None or count < limit:
+        job_obj = claim(worker_id())
+        if job_obj is None:
+            break
+        run(job_obj)
+        count += 1
+    return count
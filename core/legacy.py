@@ -0,0 +1,461 @@
+"""
+Import a school from the legacy PHP/MySQL system (php/database/schema.sql).
+
+Rows are read as a stream, from a mysqldump or SQL file (plain or .gz) or from a
+DB-API connection to the live MySQL database. They are written with bulk_create in
+chunks, one transaction per chunk. Every imported row gets a LegacyIdMap entry in
+the same transaction, and foreign keys are remapped through those entries. An
+interrupted import is resumed by running it again, because rows that are already
+mapped are skipped. Memory is bounded by one chunk. For dump files it is also
+bounded by the largest INSERT statement, which mysqldump caps at net_buffer_length
+(1 MB by default).
+
+Tables are imported parents first: users, classrooms, students, fee_structure,
+payments. Where the legacy schema differs from ours:
+
+- classrooms: ``capacity`` is dropped, and a class that already exists here is reused.
+- students: legacy roll numbers are unique per school, so they are always unique
+  per class here. Students with no class are skipped, and so are their payments.
+  ``gender`` and ``status`` have no counterpart here.
+- fee_structure: free-text fee types such as ``Tuition Fee`` become tuition,
+  admission or other, and ``yearly`` becomes ``annually``. The original type and the
+  ``academic_year`` go into the description. When several legacy rows fall on the
+  same class and type, the first one is kept and the others are mapped to it.
+- payments: the fee type comes from the payment's fee_structure row, and
+  ``balance`` is recomputed. A duplicate receipt number gets the legacy id appended.
+- users: each becomes an AdminUser with a Django login. The bcrypt hash is kept, so
+  users sign in with their old password, which is rehashed on first login. If the
+  username already belongs to an AdminUser, the row is matched to it. If only the
+  username or email is taken, the row is skipped.
+"""
+import gzip
+import re
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import router, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import changes
+from .models import AdminUser, ClassRoom, FeeStructure, LegacyIdMap, Payment, Student
+
+
+TABLES = ('users', 'classrooms', 'students', 'fee_structure', 'payments')
+
+_INSERT_RE = re.compile(r'\s*INSERT\s+(?:IGNORE\s+)?INTO\s+`?(\w+)`?\s*(?:\(([^)]*)\))?\s*VALUES\s*', re.I)
+_CREATE_RE = re.compile(r'\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?(\w+)`?\s*\((.*)\)', re.I | re.S)
+_COLUMN_RE = re.compile(r'`?(\w+)`?\s')
+_NOT_COLUMNS = {'PRIMARY', 'UNIQUE', 'KEY', 'INDEX', 'CONSTRAINT', 'FOREIGN', 'FULLTEXT', 'CHECK'}
+# One value or punctuation mark of a VALUES list: 'string', NULL, bare number, ( ) , ;
+_TOKEN_RE = re.compile(r"""\s*(?:'((?:[^'\\]|\\.|'')*)'|(NULL)\b|([^,()\s';]+)|([(),;]))""", re.I | re.S)
+_QUOTE_RE = re.compile(r"\\.|'", re.S)
+_ESCAPE_RE = re.compile(r"\\(.)|''", re.S)
+_ESCAPES = {'0': '\0', 'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a'}
+
+
+def _unescape(text):
+    if '\\' not in text and "''" not in text:
+        return text
+    return _ESCAPE_RE.sub(lambda m: "'" if m.group(1) is None else _ESCAPES.get(m.group(1), m.group(1)), text)
+
+
+def _statements(lines):
+    """SQL statements of a dump, one at a time; comment lines between statements are dropped."""
+    parts, in_string = [], False
+    for line in lines:
+        if not parts and (not line.strip() or line.startswith('--')):
+            continue
+        parts.append(line)
+        for match in _QUOTE_RE.finditer(line):
+            if match.group() == "'":
+                in_string = not in_string
+        if not in_string and line.rstrip().endswith(';'):
+            yield ''.join(parts)
+            parts = []
+
+
+def _columns(body):
+    """Column names from the body of a CREATE TABLE, skipping keys and constraints."""
+    names, depth, start = [], 0, 0
+    for i, char in enumerate(body + ','):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            match = _COLUMN_RE.match(body[start:i].strip() + ' ')
+            if match and match.group(1).upper() not in _NOT_COLUMNS:
+                names.append(match.group(1))
+            start = i + 1
+    return names
+
+
+def _values(statement, pos):
+    """Yield each parenthesised row of an INSERT ... VALUES statement as a list of strings and Nones."""
+    row = None
+    for match in _TOKEN_RE.finditer(statement, pos):
+        string, null, bare, punct = match.groups()
+        if punct == '(':
+            row = []
+        elif punct == ')':
+            yield row
+            row = None
+        elif punct:
+            continue
+        elif string is not None:
+            row.append(_unescape(string))
+        elif null:
+            row.append(None)
+        else:
+            row.append(bare)
+
+
+class DumpSource:
+    """Rows from a mysqldump or SQL file, optionally gzipped. The file is read once per table."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.columns = {}
+
+    def _open(self):
+        opener = gzip.open if self.path.endswith('.gz') else open
+        return opener(self.path, 'rt', encoding='utf-8', errors='replace')
+
+    def rows(self, table, after=0):
+        # Rows are filtered against LegacyIdMap by the importer, so `after` is not needed here
+        last_id = 0
+        with self._open() as lines:
+            for statement in _statements(lines):
+                create = _CREATE_RE.match(statement)
+                if create:
+                    self.columns[create.group(1)] = _columns(create.group(2))
+                    continue
+                insert = _INSERT_RE.match(statement)
+                if not insert or insert.group(1) != table:
+                    continue
+                if insert.group(2):
+                    names = [name.strip(' `') for name in insert.group(2).split(',')]
+                elif table in self.columns:
+                    names = self.columns[table]
+                else:
+                    raise ValueError(f'INSERT INTO {table} has no column list and no CREATE TABLE before it')
+                for values in _values(statement, insert.end()):
+                    row = dict(zip(names, values))
+                    # Hand-written inserts leave the id to AUTO_INCREMENT; number them the way MySQL would
+                    last_id = int(row['id']) if row.get('id') is not None else last_id + 1
+                    row['id'] = last_id
+                    yield row
+
+
+class ConnectionSource:
+    """Rows straight from the legacy database over a DB-API connection (MySQLdb or PyMySQL)."""
+
+    def __init__(self, connection, page_size=1000):
+        self.connection = connection
+        self.page_size = page_size
+
+    def rows(self, table, after=0):
+        if table not in TABLES:
+            raise ValueError(f'Unknown legacy table {table!r}')
+        while True:
+            cursor = self.connection.cursor()
+            try:
+                # Keyset pages: each query is an index range scan, however far in we are
+                cursor.execute(f'SELECT * FROM {table} WHERE id > %s ORDER BY id LIMIT %s', (after, self.page_size))
+                names = [column[0] for column in cursor.description]
+                page = cursor.fetchall()
+            finally:
+                cursor.close()
+            for values in page:
+                yield dict(zip(names, values))
+            if len(page) < self.page_size:
+                return
+            after = page[-1][names.index('id')]
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def _int(value):
+    return None if value in (None, '') else int(value)
+
+
+def _decimal(value):
+    return Decimal(0) if value in (None, '') else Decimal(str(value))
+
+
+def _date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date) or value is None:
+        return value
+    text = str(value)[:10]
+    # MySQL's zero date
+    return None if not text or text.startswith('0000') else date.fromisoformat(text)
+
+
+def _datetime(value):
+    if value in (None, '') or str(value).startswith('0000'):
+        return None
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value))
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+def _password(legacy_hash):
+    """PHP password_hash() bcrypt in BCryptPasswordHasher's format; anything else is unusable."""
+    legacy_hash = _text(legacy_hash)
+    if legacy_hash.startswith(('$2y$', '$2a$', '$2b$')):
+        return 'bcrypt$$2b$' + legacy_hash[4:]
+    return make_password(None)
+
+
+def _fee_type(legacy_type):
+    lowered = legacy_type.lower()
+    for fee_type in ('tuition', 'admission'):
+        if fee_type in lowered:
+            return fee_type
+    return 'other'
+
+
+FREQUENCIES = {'yearly': 'annually'}
+PAYMENT_METHODS = {'cheque': 'check', 'card': 'credit_card'}
+ROLES = {'admin': 'admin', 'user': 'staff'}
+
+
+def _mapped(source, table, legacy_ids):
+    """legacy id -> new id for the given rows of a legacy table."""
+    return dict(
+        LegacyIdMap.objects.filter(source=source, table=table, legacy_id__in=set(legacy_ids))
+        .values_list('legacy_id', 'new_id')
+    )
+
+
+def _import_users(rows, source):
+    usernames = {_text(row['username']) for row in rows}
+    emails = {_text(row['email']) for row in rows}
+    admins = dict(AdminUser.objects.filter(username__in=usernames).values_list('username', 'pk'))
+    taken = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    taken_emails = set(AdminUser.objects.filter(email__in=emails).values_list('email', flat=True))
+
+    mapping, pending, skipped = {}, [], 0
+    for row in rows:
+        username, email = _text(row['username']), _text(row['email'])
+        if username in admins:
+            mapping[row['id']] = admins[username]
+        elif username in taken or email in taken_emails:
+            skipped += 1
+        else:
+            taken.add(username)
+            taken_emails.add(email)
+            pending.append(row)
+
+    users = User.objects.bulk_create([
+        User(
+            username=_text(row['username']),
+            email=_text(row['email']),
+            first_name=_text(row['first_name']),
+            last_name=_text(row['last_name']),
+            password=_password(row['password']),
+            is_staff=True,
+            is_active=_text(row.get('status')) != 'inactive',
+        )
+        for row in pending
+    ])
+    created = AdminUser.objects.bulk_create([
+        AdminUser(
+            username=user.username,
+            email=user.email,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            role=ROLES.get(_text(row.get('role')), 'staff'),
+            status=_text(row.get('status')) or 'active',
+            last_login=_datetime(row.get('last_login')),
+            notes=_text(row.get('notes')),
+            django_user=user,
+        )
+        for row, user in zip(pending, users)
+    ])
+    mapping.update((row['id'], admin.pk) for row, admin in zip(pending, created))
+    return AdminUser, mapping, created, skipped
+
+
+def _import_classrooms(rows, source):
+    keys = {row['id']: (_text(row['name']), _text(row['section'])) for row in rows}
+    names, sections = {name for name, _ in keys.values()}, {section for _, section in keys.values()}
+    ids = {
+        (name, section): pk
+        for pk, name, section in ClassRoom.objects.filter(name__in=names, section__in=sections)
+        .values_list('pk', 'name', 'section')
+    }
+    created = ClassRoom.objects.bulk_create([
+        ClassRoom(name=name, section=section) for name, section in dict.fromkeys(keys.values()) if (name, section) not in ids
+    ])
+    ids.update(((classroom.name, classroom.section), classroom.pk) for classroom in created)
+    return ClassRoom, {legacy_id: ids[key] for legacy_id, key in keys.items()}, created, 0
+
+
+def _import_students(rows, source):
+    classrooms = _mapped(source, 'classrooms', (_int(row.get('classroom_id')) for row in rows))
+    keep = [
+        row for row in rows
+        if _int(row.get('classroom_id')) in classrooms and _date(row.get('date_of_birth')) is not None
+    ]
+    existing = {
+        (roll_number, classroom_id): pk
+        for pk, roll_number, classroom_id in Student.objects.filter(
+            roll_number__in={_text(row['roll_number']) for row in keep},
+            classroom_id__in=set(classrooms.values()),
+        ).values_list('pk', 'roll_number', 'classroom_id')
+    }
+
+    mapping, pending = {}, []
+    for row in keep:
+        key = (_text(row['roll_number']), classrooms[_int(row['classroom_id'])])
+        if key in existing:
+            mapping[row['id']] = existing[key]
+        else:
+            pending.append(row)
+    created = Student.objects.bulk_create([
+        Student(
+            first_name=_text(row['first_name']),
+            last_name=_text(row['last_name']),
+            date_of_birth=_date(row['date_of_birth']),
+            admission_date=_date(row.get('admission_date')),
+            roll_number=_text(row['roll_number']),
+            classroom_id=classrooms[_int(row['classroom_id'])],
+            father_name=_text(row.get('father_name')),
+            contact_phone=_text(row.get('phone')),
+            contact_email=_text(row.get('email')),
+            address=_text(row.get('address')),
+        )
+        for row in pending
+    ])
+    mapping.update((row['id'], student.pk) for row, student in zip(pending, created))
+    return Student, mapping, created, len(rows) - len(keep)
+
+
+def _import_fee_structure(rows, source):
+    classrooms = _mapped(source, 'classrooms', (_int(row.get('classroom_id')) for row in rows))
+    keep = [row for row in rows if _int(row.get('classroom_id')) in classrooms]
+    ids = {
+        (classroom_id, fee_type): pk
+        for pk, classroom_id, fee_type in FeeStructure.objects.filter(classroom_id__in=set(classrooms.values()))
+        .values_list('pk', 'classroom_id', 'fee_type')
+    }
+
+    pending = {}
+    for row in keep:
+        key = (classrooms[_int(row['classroom_id'])], _fee_type(_text(row['fee_type'])))
+        if key not in ids and key not in pending:
+            pending[key] = row
+    created = FeeStructure.objects.bulk_create([
+        FeeStructure(
+            classroom_id=classroom_id,
+            fee_type=fee_type,
+            amount=_decimal(row['amount']),
+            frequency=FREQUENCIES.get(_text(row.get('frequency')), _text(row.get('frequency')) or 'monthly'),
+            description=f'{_text(row["fee_type"])} ({_text(row.get("academic_year"))})',
+        )
+        for (classroom_id, fee_type), row in pending.items()
+    ])
+    ids.update(((fee.classroom_id, fee.fee_type), fee.pk) for fee in created)
+    mapping = {
+        row['id']: ids[(classrooms[_int(row['classroom_id'])], _fee_type(_text(row['fee_type'])))]
+        for row in keep
+    }
+    return FeeStructure, mapping, created, len(rows) - len(keep)
+
+
+def _import_payments(rows, source):
+    students = _mapped(source, 'students', (_int(row.get('student_id')) for row in rows))
+    fees = _mapped(source, 'fee_structure', (_int(row.get('fee_structure_id')) for row in rows))
+    fee_types = dict(FeeStructure.objects.filter(pk__in=set(fees.values())).values_list('pk', 'fee_type'))
+    keep = [
+        row for row in rows
+        if _int(row.get('student_id')) in students and _date(row.get('payment_date')) is not None
+    ]
+    numbers = {_text(row.get('receipt_number')) for row in keep} - {''}
+    taken = set(Payment.objects.filter(receipt_number__in=numbers).values_list('receipt_number', flat=True))
+
+    payments = []
+    for row in keep:
+        number = _text(row.get('receipt_number'))
+        if number in taken:
+            number = f'{number}-{row["id"]}'[:100]
+        if number:
+            taken.add(number)
+        total_fee, total_paid = _decimal(row['total_fee']), _decimal(row['total_paid'])
+        method = _text(row.get('payment_method'))
+        payments.append(Payment(
+            student_id=students[_int(row['student_id'])],
+            fee_type=fee_types.get(fees.get(_int(row.get('fee_structure_id'))), 'other'),
+            total_fee=total_fee,
+            total_paid=total_paid,
+            balance=total_fee - total_paid,
+            payment_date=_date(row['payment_date']),
+            due_date=_date(row.get('due_date')),
+            payment_method=PAYMENT_METHODS.get(method, method or 'cash'),
+            receipt_number=number,
+            notes=_text(row.get('notes')),
+        ))
+    created = Payment.objects.bulk_create(payments)
+    mapping = {row['id']: payment.pk for row, payment in zip(keep, created)}
+    return Payment, mapping, created, len(rows) - len(keep)
+
+
+IMPORTERS = {
+    'users': _import_users,
+    'classrooms': _import_classrooms,
+    'students': _import_students,
+    'fee_structure': _import_fee_structure,
+    'payments': _import_payments,
+}
+
+
+def _chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_table(reader, table, source='legacy', chunk_size=1000, progress=None):
+    """Import one legacy table in chunks; returns counts of created, matched and skipped rows."""
+    counts = {'created': 0, 'matched': 0, 'skipped': 0, 'already_imported': 0}
+    alias = router.db_for_write(LegacyIdMap)
+    after = LegacyIdMap.objects.filter(source=source, table=table).aggregate(last=Max('legacy_id'))['last'] or 0
+    for chunk in _chunked(reader.rows(table, after), chunk_size):
+        with transaction.atomic(using=alias):
+            done = _mapped(source, table, (row['id'] for row in chunk))
+            pending = [row for row in chunk if row['id'] not in done]
+            model, mapping, created, skipped = IMPORTERS[table](pending, source) if pending else (None, {}, [], 0)
+            LegacyIdMap.objects.bulk_create([
+                LegacyIdMap(source=source, table=table, legacy_id=legacy_id, new_id=new_id)
+                for legacy_id, new_id in mapping.items()
+            ])
+            if created and model in changes.TRACKED:
+                changes.record_many(model, created)
+        counts['created'] += len(created)
+        counts['matched'] += len(mapping) - len(created)
+        counts['skipped'] += skipped
+        counts['already_imported'] += len(done)
+        if progress:
+            progress(table, counts)
+    return counts
+
+
+def import_legacy(reader, source='legacy', tables=TABLES, chunk_size=1000, progress=None):
+    """Import the legacy tables parents first; returns {table: counts}."""
+    return {
+        table: import_table(reader, table, source, chunk_size, progress)
+        for table in TABLES if table in tables
+    }
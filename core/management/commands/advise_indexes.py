@@ -0,0 +1,135 @@
+import json
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Student, Attendance, Grade, Payment
+
+
+MODELS = {model._meta.db_table: model for model in (Student, Attendance, Grade, Payment)}
+
+PREDICATE_RE = re.compile(r'"(?P<table>\w+)"\."(?P<column>\w+)"\s*(?P<op>=|IN\b|IS\b|>=|<=|<|>|BETWEEN\b|LIKE\b)', re.IGNORECASE)
+ORDER_BY_RE = re.compile(r'ORDER BY (?P<clause>.+?)(?:\s+LIMIT\b|\s+OFFSET\b|$)', re.IGNORECASE | re.DOTALL)
+ORDER_COLUMN_RE = re.compile(r'"(?P<table>\w+)"\."(?P<column>\w+)"(?:\s+(?P<direction>ASC|DESC))?', re.IGNORECASE)
+EQUALITY_OPS = {'=', 'IN', 'IS'}
+
+
+def scanned_tables(plan):
+    """Tables the plan reads without an index, and tables sorted without one."""
+    scans, sorts = set(), False
+    for line in plan or []:
+        match = re.search(r'\bSCAN (?:TABLE )?(\w+)', line)
+        if match and 'USING' not in line:
+            scans.add(match.group(1))
+        match = re.search(r'Seq Scan on (\w+)', line)
+        if match:
+            scans.add(match.group(1))
+        if 'TEMP B-TREE FOR ORDER BY' in line or re.match(r'\s*(->\s*)?Sort\b', line):
+            sorts = True
+    return scans, sorts
+
+
+def existing_prefixes(model):
+    """Field-name tuples already served by an index on this model."""
+    indexed = []
+    for index in model._meta.indexes:
+        indexed.append(tuple(field.lstrip('-') for field in index.fields))
+    for fields in model._meta.unique_together:
+        indexed.append(tuple(fields))
+    for field in model._meta.fields:
+        if field.primary_key or field.db_index or field.unique:
+            indexed.append((field.name,))
+    return indexed
+
+
+class Command(BaseCommand):
+    help = 'Aggregate the slow-query log and propose composite indexes for Student, Attendance, Grade and Payment'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=None, help='Slow-query log to read (defaults to SLOW_QUERY_LOG)')
+        parser.add_argument('--min-count', type=int, default=1, help='Ignore patterns seen fewer times than this')
+        parser.add_argument('--json', action='store_true', help='Print suggestions as JSON')
+
+    def handle(self, *args, **options):
+        path = options['log'] or settings.SLOW_QUERY_LOG
+        try:
+            with open(path) as fh:
+                entries = [json.loads(line) for line in fh if line.strip()]
+        except FileNotFoundError:
+            raise CommandError(f'No slow-query log at {path}; set SLOW_QUERY_THRESHOLD_MS and exercise the app first')
+
+        suggestions = defaultdict(lambda: {'count': 0, 'total_ms': 0.0, 'views': set(), 'example': ''})
+        for entry in entries:
+            for table, fields in self._suggest(entry):
+                stats = suggestions[(table, fields)]
+                stats['count'] += 1
+                stats['total_ms'] += entry['duration_ms']
+                if entry.get('view'):
+                    stats['views'].add(entry['view'])
+                stats['example'] = stats['example'] or entry['sql']
+
+        ranked = sorted(
+            ((key, stats) for key, stats in suggestions.items() if stats['count'] >= options['min_count']),
+            key=lambda item: item[1]['total_ms'],
+            reverse=True,
+        )
+
+        if options['json']:
+            self.stdout.write(json.dumps([
+                {
+                    'model': MODELS[table].__name__,
+                    'fields': list(fields),
+                    'count': stats['count'],
+                    'total_ms': round(stats['total_ms'], 2),
+                    'views': sorted(stats['views']),
+                    'example_sql': stats['example'],
+                }
+                for (table, fields), stats in ranked
+            ], indent=2))
+            return
+
+        self.stdout.write(f'Read {len(entries)} slow queries from {path}')
+        if not ranked:
+            self.stdout.write(self.style.SUCCESS('No scans on Student, Attendance, Grade or Payment need a new index'))
+            return
+        for (table, fields), stats in ranked:
+            model = MODELS[table]
+            name = f'{model._meta.model_name[:8]}_{"_".join(f.lstrip("-") for f in fields)}'[:26] + '_idx'
+            self.stdout.write(self.style.WARNING(
+                f'{model.__name__}: {stats["count"]} slow queries, {stats["total_ms"]:.0f}ms total'
+                + (f' ({", ".join(sorted(stats["views"]))})' if stats['views'] else '')
+            ))
+            self.stdout.write(f'    models.Index(fields={list(fields)!r}, name={name!r}),')
+
+    def _suggest(self, entry):
+        scans, sorts = scanned_tables(entry.get('plan'))
+        sql = entry['sql']
+        order_match = ORDER_BY_RE.search(sql)
+        where_sql = sql[:order_match.start()] if order_match else sql
+
+        for table, model in MODELS.items():
+            if table not in scans and not (sorts and f'FROM "{table}"' in sql):
+                continue
+            columns = {field.column: field.name for field in model._meta.fields}
+            equality, ranges = [], []
+            for match in PREDICATE_RE.finditer(where_sql):
+                if match.group('table') != table or match.group('column') not in columns:
+                    continue
+                field = columns[match.group('column')]
+                target = equality if match.group('op').upper() in EQUALITY_OPS else ranges
+                if field not in equality and field not in ranges:
+                    target.append(field)
+            ordering = []
+            if order_match:
+                for match in ORDER_COLUMN_RE.finditer(order_match.group('clause')):
+                    if match.group('table') == table and match.group('column') in columns:
+                        prefix = '-' if (match.group('direction') or '').upper() == 'DESC' else ''
+                        ordering.append(prefix + columns[match.group('column')])
+
+            fields = sorted(equality) + ranges[:1]
+            fields += [f for f in ordering if f.lstrip('-') not in fields]
+            fields = tuple(fields[:4])
+            if not fields or any(existing[:len(fields)] == tuple(f.lstrip('-') for f in fields) for existing in existing_prefixes(model)):
+                continue
+            yield table, fields
@@ -0,0 +1,43 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core import tenancy
+from core.archive import academic_year_label, archive_year
+
+
+class Command(BaseCommand):
+    help = 'Move a closed academic year of Attendance, Grade and Payment rows into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('year', type=int, help='Starting calendar year of the academic year, e.g. 2024 for 2024-25')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--pause', type=float, default=0.05, help='Seconds to sleep between batches so writers are not starved')
+        parser.add_argument('--vacuum', action='store_true', help='Also VACUUM (rewrites the whole SQLite file; locks it while running)')
+        parser.add_argument('--tenant', help="Archive this tenant's database")
+
+    def handle(self, *args, **options):
+        if options['tenant'] and options['tenant'] not in settings.TENANTS:
+            raise CommandError(f'Unknown tenant {options["tenant"]!r}')
+
+        def progress(model, moved):
+            self.stdout.write(f'  {model.__name__}: {moved} rows moved', ending='\r')
+            self.stdout.flush()
+
+        self.stdout.write(f'Archiving academic year {academic_year_label(options["year"])}')
+        try:
+            with tenancy.use_tenant(options['tenant']):
+                report = archive_year(
+                    options['year'],
+                    batch_size=options['batch_size'],
+                    pause=options['pause'],
+                    vacuum=options['vacuum'],
+                    progress=progress,
+                )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write('')
+        self.stdout.write(json.dumps(report, indent=2))
+        for model, ids in report['skipped'].items():
+            self.stdout.write(self.style.WARNING(f'{model}: {len(ids)} rows left in place, their ids are already archived'))
+        self.stdout.write(self.style.SUCCESS(f'Archived {sum(report["moved"].values())} rows'))
@@ -0,0 +1,46 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core import tenancy
+from core.backups import BackupError, backup, sqlite_aliases
+from core.tasks import schedule_backup
+
+
+class Command(BaseCommand):
+    help = 'Snapshot SQLite databases with the online backup API while the app keeps writing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append', dest='aliases', help='Alias to back up (repeatable); defaults to default and every tenant on SQLite')
+        parser.add_argument('--dir', help='Defaults to BACKUP_DIR')
+        parser.add_argument('--pages', type=int, help='Pages copied per locked step (BACKUP_PAGES_PER_STEP)')
+        parser.add_argument('--pause', type=float, help='Seconds to sleep between steps (BACKUP_STEP_PAUSE)')
+        parser.add_argument('--keep', type=int, help='Snapshots kept per database (BACKUP_KEEP)')
+        parser.add_argument('--schedule', action='store_true', help='Queue a backup job per school now; run_jobs repeats it every BACKUP_INTERVAL_HOURS')
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            if settings.BACKUP_INTERVAL_HOURS <= 0:
+                raise CommandError('Set BACKUP_INTERVAL_HOURS to schedule backups')
+            for tenant in list(settings.TENANTS) or [None]:
+                with tenancy.use_tenant(tenant):
+                    queued = schedule_backup(run_after=timezone.now())
+                self.stdout.write(f'  {tenant or "default"}: {"queued" if queued else "already queued"}')
+            self.stdout.write(self.style.SUCCESS(f'Backups scheduled every {settings.BACKUP_INTERVAL_HOURS:g} hours'))
+            return
+
+        aliases = options['aliases'] or sqlite_aliases()
+        unknown = [alias for alias in aliases if alias not in settings.DATABASES]
+        if unknown:
+            raise CommandError(f'Unknown databases: {", ".join(unknown)}')
+        for alias in aliases:
+            try:
+                report = backup(alias, options['dir'], options['pages'], options['pause'], options['keep'])
+            except BackupError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(json.dumps(report, indent=2))
+            self.stdout.write(self.style.SUCCESS(
+                f'{alias}: {report["bytes"]} bytes in {report["seconds"]}s, '
+                f'lock held {report["lock_seconds_max"] * 1000:.1f} ms at most per step'
+            ))
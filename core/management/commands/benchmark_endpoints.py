@@ -0,0 +1,169 @@
+import json
+import statistics
+import time
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.models import ChangeLog
+from core.urls import router
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every GET route registered in core/urls.py (latency percentiles, query counts, response sizes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help='User to authenticate as (defaults to the first active superuser)')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--host', default='localhost', help='Host header sent with each request')
+        parser.add_argument('--only', nargs='*', default=None, help='Only benchmark routes whose name contains one of these strings')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+        parser.add_argument('--compare', help='Previous JSON report to print a p50/p95/query diff against')
+        parser.add_argument('--since', type=int, help='Token sent to the changes/ routes (default: one page behind the newest change)')
+
+    def handle(self, *args, **options):
+        user = self._user(options['username'])
+        token = RefreshToken.for_user(user).access_token
+        client = Client(HTTP_HOST=options['host'], HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        since = self._since() if options['since'] is None else options['since']
+        results = {}
+        # Measure the endpoints, not the throttle refusing them
+        with override_settings(THROTTLE_ENABLED=False):
+            for name, url in self._routes(options['only'], since):
+                results[name] = self._measure(client, url, options['iterations'], options['warmup'])
+
+        report = {
+            'generated_at': datetime.now(timezone.utc).isoformat(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'iterations': options['iterations'],
+            'changes_since': since,
+            'row_counts': {
+                model.__name__: model.objects.count()
+                for model in {viewset.queryset.model for _, viewset, _ in router.registry if getattr(viewset, 'queryset', None) is not None}
+            },
+            'routes': results,
+        }
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Wrote {len(results)} route results to {options["output"]}'))
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            self._compare(options['compare'], results)
+
+    def _user(self, username):
+        try:
+            if username:
+                return User.objects.get(username=username)
+            return User.objects.filter(is_superuser=True, is_active=True).earliest('pk')
+        except User.DoesNotExist:
+            raise CommandError('No user to authenticate as; create a superuser or pass --username')
+
+    def _since(self):
+        """A token one page of changes behind the newest, so changes/ returns rows rather than nothing."""
+        tokens = ChangeLog.objects.order_by('id').values_list('id', flat=True)
+        oldest, newest = tokens.first(), tokens.last()
+        if oldest is None:
+            return 0
+        return max(oldest - 1, newest - settings.CHANGES_PAGE_SIZE)
+
+    def _routes(self, only, since):
+        """Yield (route name, concrete URL) for the list, detail and extra GET routes of every viewset."""
+        for prefix, viewset, basename in router.registry:
+            queryset = getattr(viewset, 'queryset', None)
+            # Plain ViewSets (dashboard, facets) have no rows to pick a detail route from
+            first = None
+            if queryset is not None:
+                first = queryset.model.objects.order_by('pk').values_list('pk', flat=True).first()
+            routes = []
+            if hasattr(viewset, 'list'):
+                routes.append((f'{basename}-list', f'/api/{prefix}/'))
+            if first is not None and hasattr(viewset, 'retrieve'):
+                routes.append((f'{basename}-detail', f'/api/{prefix}/{first}/'))
+            for action in viewset.get_extra_actions():
+                if 'get' not in action.mapping:
+                    continue
+                if action.detail and first is None:
+                    continue
+                path = f'{first}/{action.url_path}' if action.detail else action.url_path
+                query = f'?since={since}' if action.url_path == 'changes' else ''
+                routes.append((f'{basename}-{action.url_name}', f'/api/{prefix}/{path}/{query}'))
+            for name, url in routes:
+                if only is None or any(part in name for part in only):
+                    yield name, url
+
+    def _measure(self, client, url, iterations, warmup):
+        for _ in range(warmup):
+            client.get(url)
+
+        latencies, queries, sizes, statuses = [], [], [], set()
+        for _ in range(iterations):
+            counter = _QueryCounter()
+            with connection.execute_wrapper(counter):
+                started = time.perf_counter()
+                response = client.get(url)
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(counter.count)
+            sizes.append(len(response.content))
+            statuses.add(response.status_code)
+
+        return {
+            'url': url,
+            'status': sorted(statuses),
+            'latency_ms': {
+                'min': round(min(latencies), 3),
+                'p50': round(_percentile(latencies, 50), 3),
+                'p90': round(_percentile(latencies, 90), 3),
+                'p95': round(_percentile(latencies, 95), 3),
+                'p99': round(_percentile(latencies, 99), 3),
+                'max': round(max(latencies), 3),
+                'mean': round(statistics.fmean(latencies), 3),
+            },
+            'queries': max(queries),
+            'response_bytes': max(sizes),
+        }
+
+    def _compare(self, path, results):
+        with open(path) as fh:
+            previous = json.load(fh)['routes']
+        self.stderr.write(f'{"route":40} {"p50 ms":>18} {"p95 ms":>18} {"queries":>10} {"bytes":>18}')
+        for name, current in sorted(results.items()):
+            before = previous.get(name)
+            if before is None:
+                self.stderr.write(f'{name:40} (new)')
+                continue
+            self.stderr.write(
+                f'{name:40} '
+                f'{before["latency_ms"]["p50"]:>8.1f} -> {current["latency_ms"]["p50"]:<7.1f} '
+                f'{before["latency_ms"]["p95"]:>8.1f} -> {current["latency_ms"]["p95"]:<7.1f} '
+                f'{before["queries"]:>4} -> {current["queries"]:<3} '
+                f'{before["response_bytes"]:>8} -> {current["response_bytes"]:<8}'
+            )
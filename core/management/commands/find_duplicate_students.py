@@ -0,0 +1,43 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core import tenancy
+from core.dedup import find_duplicates
+
+
+class Command(BaseCommand):
+    help = 'Report students that were probably entered twice (same child, other roll number or class)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-score', type=float, help='Lowest similarity (0-1) reported; default DUPLICATE_STUDENT_MIN_SCORE')
+        parser.add_argument('--output', help='Write the full report as JSON to this file')
+        parser.add_argument('--tenant', help="Scan this tenant's students")
+
+    def handle(self, *args, **options):
+        if options['tenant'] and options['tenant'] not in settings.TENANTS:
+            raise CommandError(f'Unknown tenant {options["tenant"]!r}')
+
+        def progress(stage, done, total):
+            self.stdout.write(f'  {stage}: {done}' + (f'/{total}' if total is not None else ''), ending='\r')
+            self.stdout.flush()
+
+        started = time.perf_counter()
+        with tenancy.use_tenant(options['tenant']):
+            report = find_duplicates(min_score=options['min_score'], progress=progress)
+        self.stdout.write('')
+
+        if options['output']:
+            with open(options['output'], 'w') as out:
+                json.dump(report, out, indent=2)
+        for group in report['groups']:
+            best = max(pair['score'] for pair in group['pairs'])
+            self.stdout.write(f'  {best:.2f}  ' + '  |  '.join(
+                f'#{s["id"]} {s["first_name"]} {s["last_name"]} {s["date_of_birth"]} roll {s["roll_number"]} class {s["classroom"]}'
+                for s in group['students']
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(report["groups"])} groups of likely duplicates among {report["students"]} students '
+            f'({report["compared"]} pairs compared) in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,201 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from core.models import ClassRoom, Student, Attendance, Grade, FeeStructure, Payment
+
+
+FIRST_NAMES = [
+    'Aarav', 'Vivaan', 'Aditya', 'Arjun', 'Sai', 'Reyansh', 'Krishna', 'Ishaan', 'Rohan', 'Kabir',
+    'Ananya', 'Diya', 'Aadhya', 'Saanvi', 'Myra', 'Kiara', 'Pari', 'Anika', 'Riya', 'Meera',
+    'Zara', 'Aisha', 'Fatima', 'Imran', 'Yusuf', 'Sara', 'Omar', 'Noah', 'Liam', 'Emma',
+]
+LAST_NAMES = [
+    'Sharma', 'Verma', 'Gupta', 'Singh', 'Kumar', 'Patel', 'Reddy', 'Nair', 'Iyer', 'Khan',
+    'Das', 'Bose', 'Mehta', 'Joshi', 'Chopra', 'Malhotra', 'Rao', 'Pillai', 'Ali', 'Shah',
+]
+SUBJECTS = ['Mathematics', 'Science', 'English', 'Hindi', 'Social Studies', 'Computer Science']
+TERMS = ['Term 1', 'Term 2', 'Final']
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = 'Generate a realistic synthetic school (classrooms, students, attendance, grades, fees, payments)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--classrooms', type=int, default=30, help='Number of classrooms, spread across the available sections')
+        parser.add_argument('--students-per-class', type=int, default=30)
+        parser.add_argument('--days', type=int, default=365, help='Calendar days of attendance history (weekends are skipped)')
+        parser.add_argument('--start-date', type=date.fromisoformat, default=None, help='First day of the school year (YYYY-MM-DD), defaults to --days ago')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed, the same seed produces the same school')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true', help='Delete all existing core data first')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        start_date = options['start_date'] or (date.today() - timedelta(days=options['days']))
+        end_date = min(start_date + timedelta(days=options['days']), date.today())
+        if options['classrooms'] < 1 or options['students_per_class'] < 1:
+            raise CommandError('--classrooms and --students-per-class must be positive')
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            if options['clear']:
+                self._clear()
+            classrooms = self._classrooms(options['classrooms'])
+            self._fee_structures(classrooms)
+            students = self._students(rng, classrooms, options['students_per_class'], start_date, batch_size)
+            counts = {
+                'classrooms': len(classrooms),
+                'students': len(students),
+                'attendance': self._attendance(rng, students, start_date, end_date, batch_size),
+                'grades': self._grades(rng, students, batch_size),
+                'payments': self._payments(rng, students, start_date, end_date, batch_size),
+            }
+
+        elapsed = time.perf_counter() - started
+        summary = ', '.join(f'{count} {name}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Generated {summary} in {elapsed:.1f}s'))
+
+    def _clear(self):
+        # Children first: Student.classroom is PROTECT
+        for model in (Attendance, Grade, Payment, FeeStructure, Student, ClassRoom):
+            model.objects.all().delete()
+
+    def _classrooms(self, count):
+        sections = [code for code, _ in ClassRoom.SECTION_CHOICES]
+        classrooms = []
+        for index in range(count):
+            classroom, _ = ClassRoom.objects.get_or_create(
+                name=f'Class {index // len(sections) + 1}',
+                section=sections[index % len(sections)],
+            )
+            classrooms.append(classroom)
+        return classrooms
+
+    def _fee_structures(self, classrooms):
+        existing = set(FeeStructure.objects.values_list('classroom_id', 'fee_type'))
+        fees = []
+        for classroom in classrooms:
+            level = int(classroom.name.split()[-1]) if classroom.name.split()[-1].isdigit() else 1
+            plan = [
+                ('tuition', Decimal(1500 + 250 * level), 'monthly'),
+                ('admission', Decimal(5000 + 500 * level), 'one-time'),
+                ('other', Decimal(2000), 'annually'),
+            ]
+            for fee_type, amount, frequency in plan:
+                if (classroom.id, fee_type) not in existing:
+                    fees.append(FeeStructure(classroom=classroom, fee_type=fee_type, amount=amount, frequency=frequency))
+        FeeStructure.objects.bulk_create(fees)
+
+    def _students(self, rng, classrooms, per_class, start_date, batch_size):
+        taken = set(Student.objects.filter(classroom__in=classrooms).values_list('classroom_id', 'roll_number'))
+        students = []
+        for index, classroom in enumerate(classrooms):
+            age = 5 + index // len(ClassRoom.SECTION_CHOICES)
+            roll = 0
+            for _ in range(per_class):
+                roll += 1
+                while (classroom.id, str(roll)) in taken:
+                    roll += 1
+                first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                students.append(Student(
+                    first_name=first_name,
+                    last_name=last_name,
+                    father_name=f'{rng.choice(FIRST_NAMES)} {last_name}',
+                    date_of_birth=start_date - timedelta(days=365 * age + rng.randint(0, 364)),
+                    admission_date=start_date - timedelta(days=rng.randint(0, 365 * 3)),
+                    roll_number=str(roll),
+                    classroom=classroom,
+                    contact_phone=f'9{rng.randint(100000000, 999999999)}',
+                    contact_email=f'{first_name}.{last_name}{roll}@example.com'.lower(),
+                ))
+        return Student.objects.bulk_create(students, batch_size=batch_size)
+
+    def _attendance(self, rng, students, start_date, end_date, batch_size):
+        school_days = [
+            start_date + timedelta(days=offset)
+            for offset in range((end_date - start_date).days)
+            if (start_date + timedelta(days=offset)).weekday() < 5
+        ]
+        statuses = [Attendance.STATUS_PRESENT, Attendance.STATUS_ABSENT, Attendance.STATUS_LATE]
+
+        def rows():
+            for student in students:
+                for day in school_days:
+                    status = rng.choices(statuses, weights=(90, 6, 4))[0]
+                    yield Attendance(student_id=student.id, date=day, status=status)
+
+        total = 0
+        for chunk in _chunked(rows(), batch_size):
+            Attendance.objects.bulk_create(chunk)
+            total += len(chunk)
+        return total
+
+    def _grades(self, rng, students, batch_size):
+        def rows():
+            for student in students:
+                ability = rng.gauss(70, 12)
+                for subject in SUBJECTS:
+                    for term in TERMS:
+                        score = max(0, min(100, round(rng.gauss(ability, 10), 2)))
+                        yield Grade(student_id=student.id, subject=subject, term=term, score=Decimal(str(score)))
+
+        total = 0
+        for chunk in _chunked(rows(), batch_size):
+            Grade.objects.bulk_create(chunk)
+            total += len(chunk)
+        return total
+
+    def _payments(self, rng, students, start_date, end_date, batch_size):
+        tuition = dict(FeeStructure.objects.filter(fee_type='tuition').values_list('classroom_id', 'amount'))
+        months = []
+        month = start_date.replace(day=1)
+        while month <= end_date:
+            months.append(month)
+            month = (month + timedelta(days=32)).replace(day=1)
+        methods = [code for code, _ in Payment.PAYMENT_METHOD_CHOICES]
+
+        def rows():
+            for student in students:
+                fee = tuition.get(student.classroom_id, Decimal('2000'))
+                for month in months:
+                    due_date = month.replace(day=10)
+                    roll = rng.random()
+                    if roll < 0.8:
+                        paid = fee
+                    elif roll < 0.95:
+                        paid = (fee / 2).quantize(Decimal('0.01'))
+                    else:
+                        paid = Decimal('0')
+                    yield Payment(
+                        student_id=student.id,
+                        fee_type='tuition',
+                        amount=paid,
+                        total_fee=fee,
+                        total_paid=paid,
+                        balance=fee - paid,
+                        payment_date=min(due_date + timedelta(days=rng.randint(-9, 15)), end_date),
+                        due_date=due_date,
+                        payment_method=rng.choice(methods),
+                    )
+
+        total = 0
+        for chunk in _chunked(rows(), batch_size):
+            Payment.objects.bulk_create(chunk)
+            total += len(chunk)
+        return total
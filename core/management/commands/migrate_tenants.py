@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Run migrate on the default database and every tenant database in TENANTS_FILE'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', action='append', dest='tenants', help='Only migrate this tenant (repeatable)')
+        parser.add_argument('--skip-default', action='store_true', help="Don't migrate the 'default' database")
+
+    def handle(self, *args, **options):
+        slugs = options['tenants'] or list(settings.TENANTS)
+        unknown = [slug for slug in slugs if slug not in settings.TENANTS]
+        if unknown:
+            raise CommandError(f'Unknown tenants: {", ".join(unknown)}')
+
+        aliases = [] if options['skip_default'] or options['tenants'] else ['default']
+        aliases += [settings.TENANTS[slug]['alias'] for slug in slugs]
+        failed = []
+        for alias in aliases:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Migrating {alias}'))
+            try:
+                call_command('migrate', database=alias, interactive=False, verbosity=options['verbosity'])
+            except Exception as exc:
+                failed.append(alias)
+                self.stderr.write(self.style.ERROR(f'{alias}: {exc}'))
+        if failed:
+            raise CommandError(f'Migration failed for {", ".join(failed)}')
+        self.stdout.write(self.style.SUCCESS(f'Migrated {len(aliases)} databases'))
@@ -0,0 +1,76 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core import tenancy
+from core.models import ClassRoom
+from core.promotion import PlanError, auto_plan, promote
+
+
+class Command(BaseCommand):
+    help = 'Promote whole classes to their next class at year end; a dry run unless --apply is given'
+
+    def add_arguments(self, parser):
+        parser.add_argument('plan', nargs='?', help='JSON list of {"source": ..., "target": ..., "renumber": false}; '
+                                                    'classes by id or by label, e.g. "5 - A"')
+        parser.add_argument('--auto', action='store_true', help='Move every class whose name ends in a number up by one, same section')
+        parser.add_argument('--renumber', action='store_true', help='With --auto, give each target class fresh roll numbers in name order')
+        parser.add_argument('--apply', action='store_true', help='Write the changes; without it only the diff is shown')
+        parser.add_argument('--tenant', help="Promote in this tenant's database")
+
+    def _load(self, path):
+        try:
+            with open(path) as f:
+                plan = json.load(f)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+        if not isinstance(plan, list) or not all(isinstance(entry, dict) for entry in plan):
+            raise CommandError('The plan must be a JSON list of {"source": ..., "target": ...} objects')
+        labels = {str(classroom): classroom.pk for classroom in ClassRoom.objects.all()}
+
+        def resolve(value):
+            if isinstance(value, int) or (isinstance(value, str) and value.isdigit() and value not in labels):
+                return int(value)
+            if value in labels:
+                return labels[value]
+            raise CommandError(f'No class labelled {value!r}')
+
+        try:
+            return [
+                {'source': resolve(entry['source']), 'target': resolve(entry['target']), 'renumber': bool(entry.get('renumber'))}
+                for entry in plan
+            ]
+        except KeyError as exc:
+            raise CommandError(f'Every plan entry needs a {exc.args[0]!r}')
+
+    def handle(self, *args, **options):
+        if bool(options['plan']) == options['auto']:
+            raise CommandError('Give either a plan file or --auto')
+        if options['tenant'] and options['tenant'] not in settings.TENANTS:
+            raise CommandError(f'Unknown tenant {options["tenant"]!r}')
+
+        with tenancy.use_tenant(options['tenant']):
+            plan = auto_plan(options['renumber']) if options['auto'] else self._load(options['plan'])
+            if not plan:
+                raise CommandError('The plan is empty')
+            try:
+                diff = promote(plan, dry_run=not options['apply'])
+            except PlanError as exc:
+                for collision in exc.collisions:
+                    self.stderr.write(f'  class {collision["classroom"]}: roll number {collision["roll_number"]} '
+                                      f'held by {collision["students"]} students')
+                raise CommandError(str(exc))
+
+        for step in diff['classes']:
+            renumber = ', renumbered' if step['target'] in diff['renumbered'] else ''
+            self.stdout.write(f'  {step["source_name"]} -> {step["target_name"]}: {step["students"]} students{renumber}')
+        for collision in diff['collisions']:
+            self.stdout.write(self.style.WARNING(
+                f'  collision in class {collision["classroom"]}: roll number {collision["roll_number"]} '
+                f'held by {collision["students"]} students'
+            ))
+        moved = len(diff['students'])
+        if diff['dry_run']:
+            self.stdout.write(f'Dry run: {moved} students would change. Run again with --apply to write them.')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Promoted {moved} students'))
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.changes import prune
+
+
+class Command(BaseCommand):
+    help = 'Delete old change-log entries behind the /changes/ endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Keep this many days (defaults to CHANGE_LOG_RETENTION_DAYS)')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else settings.CHANGE_LOG_RETENTION_DAYS
+        deleted = prune(days)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} change-log entries older than {days} days'))
@@ -0,0 +1,49 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core import reconcile, tenancy
+
+
+class Command(BaseCommand):
+    help = 'Match a bank statement CSV against recorded payments and report duplicates and unmatched items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('statement', help='CSV with date, credit/amount and reference/narration columns')
+        parser.add_argument('--window', type=int, default=reconcile.DATE_WINDOW_DAYS,
+                            help='Days between payment and bank date for an amount match')
+        parser.add_argument('--fuzzy-window', type=int, default=reconcile.FUZZY_WINDOW_DAYS,
+                            help='Days searched when matching by name or a differently written receipt')
+        parser.add_argument('--min-score', type=float, default=reconcile.FUZZY_MIN_SCORE,
+                            help='Lowest similarity (0-1) accepted by the fuzzy pass')
+        parser.add_argument('--output', help='Write the full report as JSON to this file')
+        parser.add_argument('--tenant', help="Reconcile against this tenant's payments")
+
+    def handle(self, *args, **options):
+        if options['tenant'] and options['tenant'] not in settings.TENANTS:
+            raise CommandError(f'Unknown tenant {options["tenant"]!r}')
+        started = time.perf_counter()
+        try:
+            with open(options['statement'], encoding='utf-8-sig', errors='replace', newline='') as stream:
+                lines = reconcile.read_statement(stream)
+        except OSError as exc:
+            raise CommandError(f'Cannot read {options["statement"]}: {exc}')
+        except reconcile.StatementError as exc:
+            raise CommandError(str(exc))
+
+        with tenancy.use_tenant(options['tenant']):
+            report = reconcile.reconcile(lines, options['window'], options['fuzzy_window'], options['min_score'])
+
+        if options['output']:
+            with open(options['output'], 'w') as out:
+                json.dump(report, out, indent=2)
+        for row in report['duplicates'][:20]:
+            self.stdout.write(f'  duplicate line {row["line"]} ({row["reason"].replace("_", " ")} {row["of"]}): '
+                              f'{row["amount"]} {row["reference"]}')
+        for row in report['unmatched_lines'][:20]:
+            self.stdout.write(f'  unmatched line {row["line"]}: {row["date"]} {row["amount"]} {row["reference"]}')
+        self.stdout.write(json.dumps(report['summary'], indent=2))
+        self.stdout.write(self.style.SUCCESS(
+            f'Matched {report["summary"]["matched"]} of {len(lines)} lines in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,79 @@
+import contextvars
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import jobs, tenancy
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (exports, fee generation, imports, ...) in a thread pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=2)
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit')
+        parser.add_argument('--tenant', action='append', dest='tenants', help='Serve this tenant (repeatable); defaults to all tenants')
+
+    def handle(self, *args, **options):
+        tenants = options['tenants'] or list(settings.TENANTS) or [None]
+        unknown = [slug for slug in tenants if slug is not None and slug not in settings.TENANTS]
+        if unknown:
+            raise CommandError(f'Unknown tenants: {", ".join(unknown)}')
+
+        if options['once']:
+            for tenant in tenants:
+                with tenancy.use_tenant(tenant):
+                    count = jobs.run_pending()
+                self.stdout.write(f'{tenant or "default"}: ran {count} jobs')
+            return
+
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        self.stdout.write(self.style.SUCCESS(
+            f'Job worker started with {options["threads"]} threads for {", ".join(t or "default" for t in tenants)}'
+        ))
+
+        running = set()
+        last_requeue = 0.0
+        with ThreadPoolExecutor(max_workers=options['threads'], thread_name_prefix='job') as pool:
+            while not self.stopping:
+                running = {future for future in running if not future.done()}
+                if time.monotonic() - last_requeue > 60:
+                    for tenant in tenants:
+                        with tenancy.use_tenant(tenant):
+                            jobs.requeue_stale()
+                    last_requeue = time.monotonic()
+
+                claimed = False
+                for tenant in tenants:
+                    if len(running) >= options['threads']:
+                        break
+                    with tenancy.use_tenant(tenant):
+                        job = jobs.claim(jobs.worker_id())
+                        if job is not None:
+                            # Threads don't inherit context variables, so the tenant is passed along explicitly
+                            context = contextvars.copy_context()
+                            running.add(pool.submit(context.run, self._run, job))
+                            claimed = True
+                if not claimed:
+                    time.sleep(options['poll_interval'])
+        self.stdout.write('Job worker stopped')
+
+    def _run(self, job):
+        self.stdout.write(f'Running {job}')
+        try:
+            jobs.run(job)
+        finally:
+            # Worker threads must not keep connections open between jobs
+            for conn in connections.all(initialized_only=True):
+                conn.close()
+
+    def _stop(self, signum, frame):
+        self.stdout.write('Stopping after running jobs finish...')
+        self.stopping = True
@@ -0,0 +1,304 @@
+"""
+Prometheus-text metrics shared across gunicorn workers without an external service.
+
+Each worker keeps its own counters and histograms in memory and periodically writes
+them to ``METRICS_DIR/worker-<pid>.json``. The ``/metrics`` view merges every file in
+that directory, so whichever worker answers the scrape reports totals for all of them.
+When a worker exits, its counters and histograms are folded into ``retired.json`` and
+its file is removed; files of workers that died without exiting cleanly are folded in
+at the next scrape. Totals never go backwards and the directory doesn't grow with
+every worker restart.
+
+The endpoint needs ``Authorization: Bearer <METRICS_TOKEN>``. Without a token only
+requests straight from ``METRICS_ALLOWED_IPS`` (localhost by default) are served;
+a request that came through a proxy is refused, since its REMOTE_ADDR is the proxy's.
+"""
+import atexit
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev servers only
+    fcntl = None
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500, 1000)
+SIZE_BUCKETS = (1024, 10240, 102400, 1048576, 10485760)
+
+HISTOGRAMS = {
+    'core_http_request_duration_seconds': ('Request latency by viewset and action', LATENCY_BUCKETS),
+    'core_http_db_queries': ('DB queries per request by viewset and action', QUERY_BUCKETS),
+    'core_http_response_size_bytes': ('Response body size by viewset and action', SIZE_BUCKETS),
+}
+COUNTERS = {
+    'core_http_requests_total': 'Requests by viewset, action and status',
+    'core_cache_requests_total': 'Cache lookups by cache and result',
+    'core_worker_busy_seconds_total': 'Seconds each worker spent handling requests',
+}
+# Per-process series, meaningless once the process is gone
+LIVE_ONLY = ('core_worker_busy_seconds_total',)
+RETIRED = 'retired.json'
+PROXY_HEADERS = ('HTTP_X_FORWARDED_FOR', 'HTTP_X_REAL_IP', 'HTTP_FORWARDED')
+GAUGES = {
+    'core_worker_uptime_seconds': 'Seconds since each live worker started',
+    'core_cache_hit_ratio': 'Cache hits / lookups by cache',
+}
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class WorkerMetrics:
+    def __init__(self):
+        self.pid = os.getpid()
+        self.started = time.time()
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.last_flush = 0.0
+
+    def inc(self, name, labels, amount=1):
+        key = (name, _key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        key = (name, _key(labels))
+        with self.lock:
+            entry = self.histograms.get(key)
+            if entry is None:
+                entry = self.histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'pid': self.pid,
+                'started': self.started,
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [
+                    [name, list(labels), list(entry[0]), entry[1], entry[2]]
+                    for (name, labels), entry in self.histograms.items()
+                ],
+            }
+
+    def path(self):
+        return os.path.join(settings.METRICS_DIR, f'worker-{self.pid}.json')
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self.last_flush = now
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        _write_json(self.path(), self.snapshot())
+
+    def retire(self):
+        """On exit: fold this worker's totals into the retired file and remove its own."""
+        if self.pid != os.getpid():
+            return
+        with _directory_lock():
+            _retire(self.path(), self.snapshot())
+
+
+def _write_json(path, data):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as fh:
+        json.dump(data, fh)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _directory_lock():
+    """Serialise retiring and collecting across processes."""
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    with open(os.path.join(settings.METRICS_DIR, '.lock'), 'w') as fh:
+        if fcntl:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        yield
+
+
+def _load(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(counters, histograms, data):
+    for name, labels, value in data['counters']:
+        key = (name, tuple(tuple(pair) for pair in labels))
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, buckets, total, count in data['histograms']:
+        key = (name, tuple(tuple(pair) for pair in labels))
+        entry = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+        entry[0] = [a + b for a, b in zip(entry[0], buckets)]
+        entry[1] += total
+        entry[2] += count
+
+
+def _retire(path, data):
+    """Add a finished worker's snapshot to the retired totals and delete its file; hold the lock."""
+    retired_path = os.path.join(settings.METRICS_DIR, RETIRED)
+    counters, histograms = {}, {}
+    _merge(counters, histograms, _load(retired_path) or {'counters': [], 'histograms': []})
+    _merge(counters, histograms, {
+        'counters': [row for row in data['counters'] if row[0] not in LIVE_ONLY],
+        'histograms': data['histograms'],
+    })
+    _write_json(retired_path, {
+        'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+        'histograms': [[name, list(labels), *entry] for (name, labels), entry in histograms.items()],
+    })
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def worker_metrics():
+    """Return this process's metrics, starting fresh after a fork."""
+    global _worker
+    if _worker is None or _worker.pid != os.getpid():
+        with _worker_lock:
+            if _worker is None or _worker.pid != os.getpid():
+                _worker = WorkerMetrics()
+                atexit.register(_worker.retire)
+    return _worker
+
+
+def record_request(viewset, action, status, duration, db_queries, response_size):
+    metrics = worker_metrics()
+    labels = {'viewset': viewset, 'action': action}
+    metrics.observe('core_http_request_duration_seconds', labels, duration)
+    metrics.observe('core_http_db_queries', labels, db_queries)
+    if response_size is not None:
+        metrics.observe('core_http_response_size_bytes', labels, response_size)
+    metrics.inc('core_http_requests_total', {**labels, 'status': str(status)})
+    metrics.inc('core_worker_busy_seconds_total', {'pid': str(metrics.pid)}, duration)
+    metrics.flush()
+
+
+def record_cache(cache, hit):
+    """Count a lookup against one of the application caches (summary, facets, ...)."""
+    if settings.METRICS_ENABLED:
+        worker_metrics().inc('core_cache_requests_total', {'cache': cache, 'result': 'hit' if hit else 'miss'})
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """Merge the retired totals and every live worker's file into (counters, histograms, gauges)."""
+    counters, histograms, gauges = {}, {}, {}
+    with _directory_lock():
+        for path in glob.glob(os.path.join(settings.METRICS_DIR, 'worker-*.json')):
+            data = _load(path)
+            if data is None:
+                continue
+            if not _pid_alive(data['pid']):
+                # Killed without running its exit hook
+                _retire(path, data)
+                continue
+            _merge(counters, histograms, data)
+            gauges[('core_worker_uptime_seconds', (('pid', str(data['pid'])),))] = time.time() - data['started']
+        retired = _load(os.path.join(settings.METRICS_DIR, RETIRED))
+        if retired:
+            _merge(counters, histograms, retired)
+
+    lookups = {}
+    for (name, labels), value in counters.items():
+        if name == 'core_cache_requests_total':
+            label_map = dict(labels)
+            hits, total = lookups.get(label_map['cache'], (0, 0))
+            lookups[label_map['cache']] = (hits + (value if label_map['result'] == 'hit' else 0), total + value)
+    for cache, (hits, total) in lookups.items():
+        gauges[('core_cache_hit_ratio', (('cache', cache),))] = hits / total if total else 0.0
+    return counters, histograms, gauges
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def render():
+    counters, histograms, gauges = collect()
+    lines = []
+
+    def series(name, kind, help_text, rows):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(rows)
+
+    for name, help_text in COUNTERS.items():
+        rows = [f'{name}{_format_labels(labels)} {value}' for (n, labels), value in sorted(counters.items()) if n == name]
+        series(name, 'counter', help_text, rows)
+    for name, help_text in GAUGES.items():
+        rows = [f'{name}{_format_labels(labels)} {value:.6f}' for (n, labels), value in sorted(gauges.items()) if n == name]
+        series(name, 'gauge', help_text, rows)
+    for name, (help_text, bounds) in HISTOGRAMS.items():
+        rows = []
+        for (n, labels), (buckets, total, count) in sorted(histograms.items()):
+            if n != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(list(bounds) + ['+Inf'], buckets):
+                cumulative += bucket_count
+                rows.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            rows.append(f'{name}_sum{_format_labels(labels)} {total}')
+            rows.append(f'{name}_count{_format_labels(labels)} {count}')
+        series(name, 'histogram', help_text, rows)
+    return '\n'.join(lines) + '\n'
+
+
+def allowed(request):
+    """A matching bearer token, or a direct request from one of METRICS_ALLOWED_IPS."""
+    token = settings.METRICS_TOKEN
+    header = request.headers.get('Authorization', '')
+    if token and header.startswith('Bearer ') and hmac.compare_digest(header[len('Bearer '):].strip(), token):
+        return True
+    if any(name in request.META for name in PROXY_HEADERS):
+        return False
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+
+def metrics_view(request):
+    if not allowed(request):
+        return HttpResponseForbidden()
+    if settings.METRICS_ENABLED:
+        worker_metrics().flush(force=True)
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,205 @@
+import logging
+import random
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import db_routers, metrics, tenancy
+from .instrumentation import RequestTimings, activate, current_timings, deactivate, view_names
+
+
+logger = logging.getLogger('core.performance')
+
+
+class ServerTimingMiddleware:
+    """
+    Record DB, serializer, render and total time for a sample of requests.
+
+    Sampled responses get a Server-Timing header and one structured log line on
+    the ``core.performance`` logger. Unsampled requests only pay for a random() call.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PERFORMANCE_SAMPLE_RATE', 0.0)
+
+    def __call__(self, request):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = activate(timings)
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            deactivate(token)
+
+        timings.finish()
+        response['Server-Timing'] = timings.server_timing()
+        fields = timings.as_log_fields()
+        view = f"{fields['viewset']}.{fields['action']}" if fields['viewset'] else '-'
+        logger.info(
+            '%s %s %s %sms (%s queries)',
+            request.method, request.path, view, fields['total_ms'], fields['db_queries'],
+            extra={'method': request.method, 'path': request.path, 'status': response.status_code, **fields},
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = current_timings()
+        if timings is not None:
+            timings.viewset, timings.action = view_names(view_func, request.method)
+        return None
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook returns
+        timings = current_timings()
+        if timings is not None:
+            timings.render_started = perf_counter()
+            response.add_post_render_callback(lambda rendered: self._rendered(timings))
+        return response
+
+    def _rendered(self, timings):
+        timings.render_time += perf_counter() - timings.render_started
+
+
+class MetricsMiddleware:
+    """
+    Feed per-viewset latency, query count and response size into core.metrics.
+
+    Reuses the RequestTimings started by ServerTimingMiddleware when the request
+    was sampled, otherwise counts queries with its own execute wrapper.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'METRICS_ENABLED', False)
+
+    def __call__(self, request):
+        if not self.enabled or request.path == '/metrics':
+            return self.get_response(request)
+
+        timings = current_timings()
+        token = None
+        if timings is None:
+            timings = RequestTimings()
+            token = activate(timings)
+        started = perf_counter()
+        try:
+            with ExitStack() as stack:
+                if token is not None:
+                    for conn in connections.all():
+                        stack.enter_context(conn.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            if token is not None:
+                deactivate(token)
+
+        size = None if response.streaming else len(response.content)
+        metrics.record_request(
+            timings.viewset or 'other', timings.action or request.method.lower(), response.status_code,
+            perf_counter() - started, timings.db_queries, size,
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = current_timings()
+        if timings is not None and not timings.viewset:
+            timings.viewset, timings.action = view_names(view_func, request.method)
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let safe-method requests to core viewsets read from replicas, except for
+    clients that wrote within the last DATABASE_REPLICA_PIN_SECONDS. A successful
+    write sets a short-lived cookie that pins the client to the primary, so it
+    reads its own writes while replicas catch up. Browsers don't send that cookie
+    to an API on another origin, so the write also answers with ``X-DB-Pin: <seconds>``
+    and a client that sends ``X-DB-Pin`` back is pinned the same way.
+    """
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+    HEADER = 'X-DB-Pin'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = bool(getattr(settings, 'DATABASE_REPLICAS', None))
+        self.cookie = getattr(settings, 'DATABASE_REPLICA_PIN_COOKIE', 'db_pin')
+        self.pin_seconds = getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 5)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        token = db_routers.allow_replica_reads(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            db_routers.reset_replica_reads(token)
+
+        if request.method not in self.SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(self.cookie, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+            response[self.HEADER] = str(self.pin_seconds)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self.enabled or request.method not in self.SAFE_METHODS or self._pinned(request):
+            return None
+        cls = getattr(view_func, 'cls', None)
+        if cls is not None and cls.__module__.startswith('core.'):
+            db_routers.allow_replica_reads(True)
+        return None
+
+    def _pinned(self, request):
+        return bool(request.COOKIES.get(self.cookie) or request.headers.get(self.HEADER))
+
+
+class TenantMiddleware:
+    """
+    Resolve the school for this request from the Host header or the JWT ``tenant``
+    claim and route its queries to that school's database (see core.tenancy).
+    A token whose claim is missing or names another school gets 403.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = bool(getattr(settings, 'TENANTS', None))
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        tenant = tenancy.tenant_for_host(request.get_host())
+        access = self._access_token(request)
+        if access is not None:
+            try:
+                tenant = tenancy.tenant_for_token(access, tenant)
+            except tenancy.WrongTenant as exc:
+                return JsonResponse({'detail': str(exc)}, status=403)
+        if tenant is None and settings.TENANT_REQUIRED:
+            return JsonResponse({'detail': 'Unknown school.'}, status=404)
+
+        token = tenancy.activate(tenant)
+        try:
+            return self.get_response(request)
+        finally:
+            tenancy.deactivate(token)
+
+    def _access_token(self, request):
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if not header.startswith('Bearer '):
+            return None
+        try:
+            return AccessToken(header[len('Bearer '):])
+        except TokenError:
+            # Let DRF authentication report the bad token
+            return None
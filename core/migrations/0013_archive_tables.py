@@ -0,0 +1,82 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_remove_adminuser_password'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('academic_year', models.PositiveIntegerField(unique=True)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='running', max_length=10)),
+                ('moved', models.JSONField(blank=True, default=dict)),
+                ('report', models.JSONField(blank=True, default=dict)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-academic_year'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedGrade',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('subject', models.CharField(max_length=100)),
+                ('term', models.CharField(max_length=50)),
+                ('score', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('max_score', models.DecimalField(decimal_places=2, default=100, max_digits=6)),
+                ('recorded_at', models.DateTimeField()),
+                ('academic_year', models.PositiveIntegerField(db_index=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_grades', to='core.student')),
+            ],
+            options={
+                'ordering': ['-recorded_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedPayment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fee_type', models.CharField(choices=[('tuition', 'Tuition Fee'), ('admission', 'Admission Fee'), ('other', 'Other')], max_length=20)),
+                ('amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('total_fee', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('total_paid', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('payment_date', models.DateField()),
+                ('due_date', models.DateField(blank=True, null=True)),
+                ('payment_method', models.CharField(choices=[('cash', 'Cash'), ('check', 'Check'), ('bank_transfer', 'Bank Transfer'), ('credit_card', 'Credit Card'), ('online', 'Online Payment')], default='cash', max_length=20)),
+                ('receipt_number', models.CharField(blank=True, max_length=100)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField()),
+                ('academic_year', models.PositiveIntegerField(db_index=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_payments', to='core.student')),
+            ],
+            options={
+                'ordering': ['-payment_date', '-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedAttendance',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('present', 'Present'), ('absent', 'Absent'), ('late', 'Late')], default='present', max_length=10)),
+                ('notes', models.CharField(blank=True, max_length=255)),
+                ('academic_year', models.PositiveIntegerField(db_index=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_attendance_records', to='core.student')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('student', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:07
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_changelog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changelog',
+            name='classroom_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='changelog',
+            name='payload',
+            field=models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder),
+        ),
+        migrations.AddField(
+            model_name='changelog',
+            name='student_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_changelog_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
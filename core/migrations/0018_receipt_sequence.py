@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:15
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def dedupe_receipt_numbers(apps, schema_editor):
+    # Receipt numbers used to be free text; keep the first of each duplicate and suffix the rest
+    Payment = apps.get_model('core', 'Payment')
+    duplicates = (
+        Payment.objects.exclude(receipt_number='')
+        .values('receipt_number')
+        .annotate(n=Count('id'))
+        .filter(n__gt=1)
+        .values_list('receipt_number', flat=True)
+    )
+    for number in list(duplicates):
+        for payment in Payment.objects.filter(receipt_number=number).order_by('id')[1:]:
+            payment.receipt_number = f'{number}-{payment.pk}'[:100]
+            payment.save(update_fields=['receipt_number'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_payment_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceiptSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('academic_year', models.PositiveIntegerField(unique=True)),
+                ('next_value', models.PositiveBigIntegerField(default=1)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-academic_year'],
+            },
+        ),
+        migrations.RunPython(dedupe_receipt_numbers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='payment',
+            constraint=models.UniqueConstraint(condition=models.Q(('receipt_number', ''), _negated=True), fields=('receipt_number',), name='core_payment_receipt_number_uniq'),
+        ),
+    ]
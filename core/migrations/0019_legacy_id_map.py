@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_receipt_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LegacyIdMap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=100)),
+                ('table', models.CharField(max_length=50)),
+                ('legacy_id', models.BigIntegerField()),
+                ('new_id', models.BigIntegerField()),
+                ('imported_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('source', 'table', 'legacy_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_legacy_id_map'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(max_length=7)),
+                ('email', models.EmailField(max_length=254)),
+                ('payments', models.PositiveIntegerField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-sent_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('balance__gt', 0)), fields=['due_date', 'student'], name='core_payment_unpaid_due'),
+        ),
+        migrations.AddField(
+            model_name='reminderlog',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='core.student'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='reminderlog',
+            unique_together={('student', 'period')},
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_student_duplicate_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['student_id', 'id'], name='core_changelog_student_id'),
+        ),
+    ]
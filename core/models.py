@@ -1,4 +1,6 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 from django.contrib.auth.models import User
 
@@ -39,6 +41,11 @@ class Student(models.Model):
     class Meta:
         unique_together = ('roll_number', 'classroom')
         ordering = ['last_name', 'first_name']
+        # The duplicate check before each insert looks students up by date of birth and name (core.dedup)
+        indexes = [
+            models.Index(fields=['date_of_birth'], name='core_student_dob'),
+            models.Index(Lower('last_name'), Lower('first_name'), name='core_student_lower_name'),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -134,9 +141,22 @@ class Payment(models.Model):
     receipt_number = models.CharField(max_length=100, blank=True)
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped on every write; updates must name the version they read (If-Match)
+    version = models.PositiveIntegerField(default=1, editable=False)
 
     class Meta:
         ordering = ['-payment_date', '-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['receipt_number'],
+                condition=~models.Q(receipt_number=''),
+                name='core_payment_receipt_number_uniq',
+            ),
+        ]
+        indexes = [
+            # Only unpaid rows: the overdue scans (reminders, dashboard) stay small as history grows
+            models.Index(fields=['due_date', 'student'], condition=models.Q(balance__gt=0), name='core_payment_unpaid_due'),
+        ]
 
     def __str__(self):
         return f"{self.student} - {self.get_fee_type_display()} - ₹{self.total_fee} ({self.payment_date})"
@@ -195,3 +215,228 @@ class AdminUser(models.Model):
         """Check if the admin user can log in based on their status"""
         return self.status == 'active' and self.django_user and self.django_user.is_active
 
+
+
+class PaymentReceipt(models.Model):
+    """One installment of a payment and the receipt issued for it; a payment keeps its latest receipt_number."""
+    # No constraint or cascade: an issued receipt stays on record when the payment is archived (same id) or deleted
+    payment = models.ForeignKey(Payment, on_delete=models.DO_NOTHING, db_constraint=False, related_name='receipts')
+    receipt_number = models.CharField(max_length=100, unique=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    payment_date = models.DateField()
+    payment_method = models.CharField(max_length=20, choices=Payment.PAYMENT_METHOD_CHOICES, default='cash')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['payment_date', 'id']
+        indexes = [models.Index(fields=['payment_date'], name='core_paymentreceipt_date')]
+
+    def __str__(self):
+        return f"{self.receipt_number} - ₹{self.amount} ({self.payment_date})"
+
+
+class ArchivedAttendance(models.Model):
+    """Attendance rows from a closed academic year, moved out of the hot table by core.archive."""
+    id = models.BigIntegerField(primary_key=True)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='archived_attendance_records')
+    date = models.DateField()
+    status = models.CharField(max_length=10, choices=Attendance.STATUS_CHOICES, default=Attendance.STATUS_PRESENT)
+    notes = models.CharField(max_length=255, blank=True)
+    academic_year = models.PositiveIntegerField(db_index=True)
+
+    class Meta:
+        unique_together = ('student', 'date')
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.student} - {self.date} - {self.status}"
+
+
+class ArchivedGrade(models.Model):
+    """Grade rows from a closed academic year."""
+    id = models.BigIntegerField(primary_key=True)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='archived_grades')
+    subject = models.CharField(max_length=100)
+    term = models.CharField(max_length=50)
+    score = models.DecimalField(max_digits=6, decimal_places=2)
+    max_score = models.DecimalField(max_digits=6, decimal_places=2, default=100)
+    recorded_at = models.DateTimeField()
+    academic_year = models.PositiveIntegerField(db_index=True)
+
+    class Meta:
+        ordering = ['-recorded_at']
+
+    def __str__(self):
+        return f"{self.student} - {self.subject} ({self.term})"
+
+
+class ArchivedPayment(models.Model):
+    """Payment rows from a closed academic year."""
+    id = models.BigIntegerField(primary_key=True)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='archived_payments')
+    fee_type = models.CharField(max_length=20, choices=FeeStructure.FEE_TYPE_CHOICES)
+    amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    total_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    payment_date = models.DateField()
+    due_date = models.DateField(null=True, blank=True)
+    payment_method = models.CharField(max_length=20, choices=Payment.PAYMENT_METHOD_CHOICES, default='cash')
+    receipt_number = models.CharField(max_length=100, blank=True)
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    academic_year = models.PositiveIntegerField(db_index=True)
+
+    class Meta:
+        ordering = ['-payment_date', '-created_at']
+
+    def __str__(self):
+        return f"{self.student} - {self.get_fee_type_display()} - ₹{self.total_fee} ({self.payment_date})"
+
+    @property
+    def is_overdue(self):
+        # Archived years are closed; outstanding balances are carried forward, not overdue here
+        return False
+
+
+class ArchiveRun(models.Model):
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    academic_year = models.PositiveIntegerField(unique=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+    moved = models.JSONField(default=dict, blank=True)
+    report = models.JSONField(default=dict, blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-academic_year']
+
+    def __str__(self):
+        return f"Archive {self.academic_year} ({self.status})"
+
+
+class Job(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    progress_done = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(null=True, blank=True)
+    progress_message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'run_after'], name='core_job_status_run_after')]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+    @property
+    def progress_percent(self):
+        if not self.progress_total:
+            return 100 if self.status == self.STATUS_SUCCEEDED else None
+        return round(100 * self.progress_done / self.progress_total, 1)
+
+
+class ChangeLog(models.Model):
+    """One row per save or delete of a synced model; the id is the sync token clients send back."""
+    ACTION_SAVE = 'save'
+    ACTION_DELETE = 'delete'
+    ACTION_CHOICES = [
+        (ACTION_SAVE, 'Save'),
+        (ACTION_DELETE, 'Delete'),
+    ]
+
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    # Denormalised for the live event stream's per-classroom filter and compact payload
+    classroom_id = models.BigIntegerField(null=True, blank=True)
+    student_id = models.BigIntegerField(null=True, blank=True)
+    payload = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['model', 'id'], name='core_changelog_model_id'),
+            # Newest entry for one student, the cache version of their profile
+            models.Index(fields=['student_id', 'id'], name='core_changelog_student_id'),
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.model} #{self.object_id}"
+
+
+class ReceiptSequence(models.Model):
+    """Next unissued receipt number for one academic year (see core.receipts)."""
+    academic_year = models.PositiveIntegerField(unique=True)
+    next_value = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-academic_year']
+
+    def __str__(self):
+        return f"Receipts {self.academic_year}: next {self.next_value}"
+
+
+class LegacyIdMap(models.Model):
+    """Which row a legacy PHP/MySQL row was imported as (see core.legacy); re-runs skip mapped rows."""
+    source = models.CharField(max_length=100)
+    table = models.CharField(max_length=50)
+    legacy_id = models.BigIntegerField()
+    new_id = models.BigIntegerField()
+    imported_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('source', 'table', 'legacy_id')
+
+    def __str__(self):
+        return f"{self.source}.{self.table} #{self.legacy_id} -> {self.new_id}"
+
+
+class ReminderLog(models.Model):
+    """An overdue-fee reminder sent to a student's contact (see core.reminders); at most one per billing period."""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='reminders')
+    period = models.CharField(max_length=7)  # 'YYYY-MM'
+    email = models.EmailField()
+    payments = models.PositiveIntegerField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('student', 'period')
+        ordering = ['-sent_at']
+
+    def __str__(self):
+        return f"Reminder {self.period} to {self.email}"
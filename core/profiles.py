@@ -0,0 +1,130 @@
+"""
+Everything the student page shows, in one response and a fixed number of queries.
+
+1. The student, with the classroom joined and three Prefetch querysets: grades,
+   the last RECENT_ATTENDANCE attendance marks, and the payments still owing.
+2. One aggregate over the student's attendance (counts per status).
+3. One aggregate over the student's payments (fees, paid, balance, overdue).
+
+That makes six queries however much history the student has, plus one for the
+version. The result is cached under the student's change version (see
+``version``). Any write to the student, their attendance, grades or payments, or
+to their classroom, changes that version, so the next request builds it again.
+Other students' writes leave the entry alone.
+"""
+from django.db.models import Count, Max, Prefetch, Q, Subquery, Sum
+
+from .models import Attendance, ChangeLog, Grade, Payment, Student
+from .serializers import ClassRoomSerializer, StudentSerializer
+
+
+RECENT_ATTENDANCE = 10
+
+
+def _money(value):
+    return f'{value or 0:.2f}'
+
+
+def _percent(part, whole):
+    return round(100 * part / whole, 1) if whole else None
+
+
+def version(pk):
+    """Newest change-log id touching the student, their rows or their classroom (0 if none)."""
+    classroom = Student.objects.filter(pk=pk).values('classroom_id')
+    return ChangeLog.objects.filter(
+        Q(student_id=pk) | Q(model='classroom', object_id=Subquery(classroom)),
+    ).aggregate(token=Max('id'))['token'] or 0
+
+
+def _terms(grades):
+    """Grades grouped by term, terms in the order they were first recorded."""
+    terms = {}
+    for grade in grades:
+        terms.setdefault(grade.term, []).append(grade)
+    result = []
+    for term, rows in terms.items():
+        scored = sum(grade.score for grade in rows)
+        possible = sum(grade.max_score for grade in rows)
+        result.append({
+            'term': term,
+            'percent': _percent(scored, possible),
+            'grades': [
+                {
+                    'id': grade.id,
+                    'subject': grade.subject,
+                    'score': _money(grade.score),
+                    'max_score': _money(grade.max_score),
+                    'percent': _percent(grade.score, grade.max_score),
+                    'recorded_at': grade.recorded_at.isoformat(),
+                }
+                for grade in rows
+            ],
+        })
+    return result
+
+
+def build(pk, today, recent=RECENT_ATTENDANCE):
+    """The profile of student `pk` as plain data; raises Student.DoesNotExist."""
+    student = (
+        Student.objects
+        .select_related('classroom')
+        .prefetch_related(
+            Prefetch('grades', queryset=Grade.objects.order_by('recorded_at', 'subject')),
+            Prefetch('attendance_records', queryset=Attendance.objects.order_by('-date')[:recent],
+                     to_attr='recent_attendance'),
+            Prefetch('payments', queryset=Payment.objects.filter(balance__gt=0).order_by('due_date', 'payment_date'),
+                     to_attr='outstanding'),
+        )
+        .get(pk=pk)
+    )
+    attendance = Attendance.objects.filter(student_id=pk).aggregate(
+        marked=Count('id'),
+        **{status: Count('id', filter=Q(status=status)) for status, _ in Attendance.STATUS_CHOICES},
+    )
+    overdue = Q(due_date__lt=today, balance__gt=0)
+    fees = Payment.objects.filter(student_id=pk).aggregate(
+        payments=Count('id'),
+        fee_total=Sum('total_fee'),
+        paid_total=Sum('total_paid'),
+        balance_total=Sum('balance'),
+        overdue_count=Count('id', filter=overdue),
+        overdue_amount=Sum('balance', filter=overdue),
+        last_payment=Max('payment_date', filter=Q(total_paid__gt=0)),
+    )
+
+    attended = attendance[Attendance.STATUS_PRESENT] + attendance[Attendance.STATUS_LATE]
+    return {
+        'student': StudentSerializer(student).data,
+        'classroom': ClassRoomSerializer(student.classroom).data,
+        'attendance': {
+            'marked': attendance['marked'],
+            **{status: attendance[status] for status, _ in Attendance.STATUS_CHOICES},
+            'rate': _percent(attended, attendance['marked']),
+            'recent': [
+                {'id': mark.id, 'date': mark.date.isoformat(), 'status': mark.status, 'notes': mark.notes}
+                for mark in student.recent_attendance
+            ],
+        },
+        'grades': _terms(student.grades.all()),
+        'fees': {
+            'payments': fees['payments'],
+            'total_fee': _money(fees['fee_total']),
+            'total_paid': _money(fees['paid_total']),
+            'balance': _money(fees['balance_total']),
+            'overdue_count': fees['overdue_count'],
+            'overdue_amount': _money(fees['overdue_amount']),
+            'last_payment_date': fees['last_payment'].isoformat() if fees['last_payment'] else None,
+            'outstanding': [
+                {
+                    'id': payment.id,
+                    'fee_type': payment.fee_type,
+                    'total_fee': _money(payment.total_fee),
+                    'balance': _money(payment.balance),
+                    'due_date': payment.due_date.isoformat() if payment.due_date else None,
+                    'overdue': bool(payment.due_date and payment.due_date < today),
+                }
+                for payment in student.outstanding
+            ],
+        },
+    }
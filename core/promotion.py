@@ -0,0 +1,210 @@
+"""
+Year-end promotion: move whole classrooms to their next class in one transaction.
+
+A plan maps source classrooms to target classrooms:
+
+    [{"source": 4, "target": 7, "renumber": true}, {"source": 7, "target": 10}]
+
+Every student of a source class moves. Classes may chain, for example 5A -> 6A
+while 6A -> 7A. The moves are ordered so that a class is emptied before it is
+filled, and each move is a single UPDATE. Roll numbers have to stay unique within
+a class. Before anything is written, one grouped query finds every roll number
+that would appear twice in a target class. A target marked ``renumber`` gets fresh
+roll numbers 1..n in name order instead, so collisions there don't matter. Cycles
+(A -> B -> A) are refused. A dry run returns the same diff without writing.
+"""
+import re
+
+from django.db import connections, router, transaction
+from django.db.models import Case, CharField, Count, F, IntegerField, Value, When
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+
+from . import changes
+from .models import ClassRoom, Student
+
+
+NAME_ORDER = ('last_name', 'first_name', 'pk')
+# Students per change-log batch
+CHUNK_SIZE = 500
+NUMBERED_NAME_RE = re.compile(r'^(.*?)(\d+)$')
+
+
+class PlanError(Exception):
+    """The plan can't be applied; `collisions` lists clashing roll numbers, if that is why."""
+
+    def __init__(self, message, collisions=None):
+        super().__init__(message)
+        self.collisions = collisions or []
+
+
+def auto_plan(renumber=False):
+    """Each class whose name ends in a number moves to the one numbered one higher, same section."""
+    classes = {(name, section): pk for pk, name, section in ClassRoom.objects.values_list('pk', 'name', 'section')}
+    plan = []
+    for (name, section), pk in sorted(classes.items()):
+        match = NUMBERED_NAME_RE.match(name)
+        if not match:
+            continue
+        target = classes.get((f'{match.group(1)}{int(match.group(2)) + 1}', section))
+        if target is not None:
+            plan.append({'source': pk, 'target': target, 'renumber': renumber})
+    return plan
+
+
+def _move_order(steps):
+    """Sources ordered so that each class moves out before another moves in; refuses cycles."""
+    order, done = [], set()
+
+    def visit(source, path):
+        if source in done:
+            return
+        if source in path:
+            raise PlanError(f'Classes {" -> ".join(map(str, path + [source]))} form a cycle')
+        if steps[source] in steps:
+            visit(steps[source], path + [source])
+        done.add(source)
+        order.append(source)
+
+    for source in steps:
+        visit(source, [])
+    return order
+
+
+def _parse(plan, using):
+    steps, renumber = {}, set()
+    for entry in plan:
+        source, target = entry['source'], entry['target']
+        if source == target:
+            raise PlanError(f'Class {source} is mapped to itself')
+        if source in steps:
+            raise PlanError(f'Class {source} appears twice as a source')
+        steps[source] = target
+        if entry.get('renumber'):
+            renumber.add(target)
+    involved = {*steps, *steps.values()}
+    known = set(ClassRoom.objects.using(using).filter(pk__in=involved).values_list('pk', flat=True))
+    if involved - known:
+        raise PlanError(f'No such classes: {", ".join(map(str, sorted(involved - known)))}')
+    return steps, renumber
+
+
+def _final_classroom(steps):
+    return Case(
+        *[When(classroom_id=source, then=Value(target)) for source, target in steps.items()],
+        default=F('classroom_id'),
+        output_field=IntegerField(),
+    )
+
+
+def find_collisions(steps, renumber, using=None):
+    """Roll numbers that would occur twice in a class after the moves, from one grouped query."""
+    checked = set(steps.values()) - renumber
+    if not checked:
+        return []
+    clashes = (
+        Student.objects.using(using)
+        .filter(classroom_id__in={*steps, *checked})
+        .annotate(final_classroom=_final_classroom(steps))
+        .filter(final_classroom__in=checked)
+        .values('final_classroom', 'roll_number')
+        .annotate(students=Count('pk'))
+        .filter(students__gt=1)
+        .order_by('final_classroom', 'roll_number')
+    )
+    return [
+        {'classroom': row['final_classroom'], 'roll_number': row['roll_number'], 'students': row['students']}
+        for row in clashes
+    ]
+
+
+def _diff(steps, renumber, using):
+    names = {pk: str(classroom) for pk, classroom in ClassRoom.objects.using(using).in_bulk({*steps, *steps.values()}).items()}
+    students = (
+        Student.objects.using(using)
+        .filter(classroom_id__in={*steps, *renumber})
+        .order_by(*NAME_ORDER)
+        .values('pk', 'first_name', 'last_name', 'roll_number', 'classroom_id')
+    )
+    numbered, changed, counts = {}, [], {}
+    for student in students:
+        current = student['classroom_id']
+        final = steps.get(current, current)
+        roll_number = student['roll_number']
+        if final in renumber:
+            numbered[final] = numbered.get(final, 0) + 1
+            roll_number = str(numbered[final])
+        if current in steps:
+            counts[current] = counts.get(current, 0) + 1
+        if final != current or roll_number != student['roll_number']:
+            changed.append({
+                'id': student['pk'],
+                'name': f'{student["first_name"]} {student["last_name"]}',
+                'from': current,
+                'to': final,
+                'roll_number': student['roll_number'],
+                'new_roll_number': roll_number,
+            })
+    return {
+        'classes': [
+            {'source': source, 'source_name': names[source], 'target': target, 'target_name': names[target],
+             'students': counts.get(source, 0)}
+            for source, target in steps.items()
+        ],
+        'renumbered': sorted(renumber),
+        'students': changed,
+    }
+
+
+def _park(steps, renumber, using):
+    """Give everyone ending up in a renumbered class a unique placeholder so the moves can't clash."""
+    if renumber:
+        (
+            Student.objects.using(using)
+            .filter(classroom_id__in={*steps, *renumber})
+            .alias(final_classroom=_final_classroom(steps))
+            .filter(final_classroom__in=renumber)
+            .update(roll_number=Concat(Value('~'), Cast('pk', CharField())))
+        )
+
+
+def _renumber(classroom_id, using, now):
+    # One parameterised UPDATE run with executemany: a CASE with a branch per student
+    # costs far more to build in the ORM than the write itself
+    connection = connections[using]
+    ids = Student.objects.using(using).filter(classroom_id=classroom_id).order_by(*NAME_ORDER).values_list('pk', flat=True)
+    quote = connection.ops.quote_name
+    columns = [quote(Student._meta.get_field(name).column) for name in ('roll_number', 'updated_at', 'id')]
+    sql = 'UPDATE {} SET {} = %s, {} = %s WHERE {} = %s'.format(quote(Student._meta.db_table), *columns)
+    updated_at = Student._meta.get_field('updated_at').get_db_prep_save(now, connection)
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(str(number), updated_at, pk) for number, pk in enumerate(ids, 1)])
+
+
+def promote(plan, dry_run=True, using=None):
+    """Check and (unless dry_run) apply a plan; returns the diff with any collisions."""
+    using = using or router.db_for_write(Student)
+    with transaction.atomic(using=using):
+        steps, renumber = _parse(plan, using)
+        order = _move_order(steps)
+        collisions = find_collisions(steps, renumber, using)
+        diff = _diff(steps, renumber, using)
+        diff.update(dry_run=dry_run, collisions=collisions)
+        if dry_run:
+            return diff
+        if collisions:
+            raise PlanError('Roll numbers would collide; renumber those classes or fix the plan', collisions)
+
+        now = timezone.now()
+        _park(steps, renumber, using)
+        for source in order:
+            Student.objects.using(using).filter(classroom_id=source).update(classroom_id=steps[source], updated_at=now)
+        for target in sorted(renumber):
+            _renumber(target, using, now)
+
+        # Queryset updates send no post_save, so log the changes for sync and live events here
+        ids = [student['id'] for student in diff['students']]
+        for start in range(0, len(ids), CHUNK_SIZE):
+            chunk = Student.objects.using(using).filter(pk__in=ids[start:start + CHUNK_SIZE]).only(*changes.EVENT_FIELDS[Student])
+            changes.record_many(Student, list(chunk), using=using)
+    return diff
@@ -0,0 +1,118 @@
+"""
+Receipt numbers: one sequence per school and academic year, e.g. ``R-2026-27-000123``.
+
+Each school has its own database, so a ReceiptSequence row per academic year is
+enough to scope the sequence, and nothing ever takes MAX() over Payment. By default
+(RECEIPT_BLOCK_SIZE=1) every number is drawn from the counter inside the caller's
+transaction and rolls back with it, so the sequence is gapless; the cost is that
+concurrent receipts wait on the counter row.
+
+With a larger RECEIPT_BLOCK_SIZE, a worker outside a transaction reserves a block of
+numbers with one UPDATE and then issues them from memory, locking the counter row
+once per block. Numbers in a block that a worker never issues (it was restarted, or
+the write that took one rolled back) are skipped, so receipts are unique and
+increasing per worker but can have gaps. Callers that only know inside their
+transaction whether a receipt is due (the payment views) call reserve() first, then
+issue() once the write has succeeded.
+"""
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import tenancy
+from .archive import academic_year_label, academic_year_of
+from .models import ReceiptSequence
+
+
+_lock = threading.Lock()
+# (db alias, academic year) -> [next number to issue, end of block (exclusive)]
+_blocks = {}
+
+
+def reset_blocks():
+    """Forget reserved blocks (tests, or after restoring a database)."""
+    with _lock:
+        _blocks.clear()
+
+
+def _reserve(alias, year, size):
+    """Move the year's counter on by `size` and return the first number of the reserved range."""
+    with transaction.atomic(using=alias):
+        sequences = ReceiptSequence.objects.using(alias).filter(academic_year=year)
+        if not sequences.update(next_value=F('next_value') + size):
+            try:
+                with transaction.atomic(using=alias):
+                    ReceiptSequence.objects.using(alias).create(academic_year=year, next_value=1 + size)
+                return 1
+            except IntegrityError:
+                # Another worker created the row first
+                sequences.update(next_value=F('next_value') + size)
+        # The UPDATE holds the row until commit, so this reads our own increment
+        return sequences.values_list('next_value', flat=True).get() - size
+
+
+def prefix():
+    tenant = tenancy.current_tenant()
+    if tenant is not None:
+        return settings.TENANTS[tenant].get('receipt_prefix') or tenant.upper()
+    return settings.RECEIPT_PREFIX
+
+
+def format_receipt(year, number):
+    return f'{prefix()}-{academic_year_label(year)}-{number:06d}'
+
+
+def _take(key):
+    with _lock:
+        block = _blocks.get(key)
+        if block and block[0] < block[1]:
+            number = block[0]
+            block[0] += 1
+            return number
+    return None
+
+
+def _refill(alias, year, keep_first=True):
+    """Reserve a fresh block for this worker; with keep_first, returns its first number for the caller."""
+    size = settings.RECEIPT_BLOCK_SIZE
+    start = _reserve(alias, year, size)
+    with _lock:
+        # Threads that raced here each reserved their own block; keep the newest for later calls
+        _blocks[(alias, year)] = [start + 1 if keep_first else start, start + size]
+    return start
+
+
+def next_number(year, using=None):
+    alias = using or router.db_for_write(ReceiptSequence)
+    number = _take((alias, year))
+    if number is not None:
+        return number
+    if connections[alias].in_atomic_block or settings.RECEIPT_BLOCK_SIZE <= 1:
+        return _reserve(alias, year, 1)
+    return _refill(alias, year)
+
+
+def reserve(day=None, using=None):
+    """
+    Make sure this worker holds unissued numbers for `day`'s academic year. Call it
+    outside a transaction before a write that may issue a receipt; the issue() inside
+    the write then takes a number from memory once the write is certain to happen.
+    """
+    year = academic_year_of(day or timezone.localdate())
+    alias = using or router.db_for_write(ReceiptSequence)
+    if connections[alias].in_atomic_block or settings.RECEIPT_BLOCK_SIZE <= 1:
+        return
+    with _lock:
+        block = _blocks.get((alias, year))
+        if block and block[0] < block[1]:
+            return
+    _refill(alias, year, keep_first=False)
+
+
+def issue(day=None, using=None):
+    """A new receipt number for a payment made on `day` (today by default)."""
+    year = academic_year_of(day or timezone.localdate())
+    return format_receipt(year, next_number(year, using))
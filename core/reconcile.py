@@ -0,0 +1,297 @@
+"""
+Match a bank statement against recorded payments.
+
+The statement is a CSV export. Columns are found by header name: a date, a credit
+amount, and a reference or narration. Debits are ignored. Lines are streamed into
+compact tuples, and the installments in the statement's date range are loaded with
+one query (plus one for payments without installments). Matching is done with dictionaries, not by comparing every line with every
+payment:
+
+1. Receipt: some token of the reference is a receipt number, and the amounts agree.
+2. Amount and date: exactly one unclaimed payment of the same amount falls within
+   ``window`` days. Lookups go through a hash on (amount, day).
+3. Fuzzy: the same amount within ``fuzzy_window`` days, scored by how well the
+   reference names the student or spells the receipt. The best candidate is taken
+   if it scores at least ``min_score`` and is clearly ahead of any other student's.
+
+Each installment of a payment (see PaymentReceipt) is a candidate with its own
+amount, date and receipt, so a line can match an earlier installment as well as
+the latest. Payments with no installments on record (imported ones) are candidates
+as a whole. Each candidate is claimed at most once. A line whose receipt belongs to
+an installment that was already matched is reported as a duplicate. So is a line
+that repeats an earlier one (same date, amount and reference) when no payment is
+left for it; a parent paying twice on one day is still matched twice. What's left
+is reported as unmatched lines (with the ambiguous candidates, if any) and
+unmatched non-cash installments.
+Nothing is written.
+"""
+import csv
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from difflib import SequenceMatcher, get_close_matches
+
+from django.db.models import Exists, F, OuterRef
+from django.db.models.functions import Coalesce
+
+from .models import Payment, PaymentReceipt
+
+
+DATE_WINDOW_DAYS = 3
+FUZZY_WINDOW_DAYS = 10
+FUZZY_MIN_SCORE = 0.75
+# The best fuzzy candidate must beat the runner-up by this much
+FUZZY_MARGIN = 0.1
+# How close a misspelt name has to be to count, and the score for a receipt written differently
+NAME_CUTOFF = 0.8
+RECEIPT_MIN_DIGITS = 4
+RECEIPT_DIGITS_SCORE = 0.9
+# Statement lines pay into the bank; cash never shows up there
+BANK_METHODS = ('bank_transfer', 'online', 'check', 'credit_card')
+
+DATE_COLUMNS = ('date', 'value date', 'transaction date', 'txn date', 'posting date')
+AMOUNT_COLUMNS = ('credit', 'amount', 'deposit', 'deposits', 'credit amount')
+DEBIT_COLUMNS = ('debit', 'withdrawal', 'withdrawals', 'debit amount')
+REFERENCE_COLUMNS = ('reference', 'ref', 'narration', 'description', 'particulars', 'details', 'remarks')
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%d/%m/%y', '%d-%b-%Y', '%d %b %Y')
+TOKEN_SPLIT_RE = re.compile(r'[\s/,;|:()]+')
+
+Line = namedtuple('Line', 'number date cents reference tokens')
+# key tells installments and whole payments apart; pk is always the payment's
+Candidate = namedtuple('Candidate', 'key pk cents date receipt_number receipt student_id names')
+
+
+class StatementError(Exception):
+    """The statement can't be read: unknown columns, or a value that doesn't parse."""
+
+
+def _normalise(token):
+    return re.sub(r'[^0-9A-Z]', '', token.upper())
+
+
+def _tokens(text):
+    return {token for token in map(_normalise, TOKEN_SPLIT_RE.split(text)) if token}
+
+
+def _cents(value):
+    cleaned = re.sub(r'[^\d.\-]', '', value or '')
+    if not cleaned:
+        return None
+    try:
+        return int((Decimal(cleaned) * 100).to_integral_value())
+    except InvalidOperation:
+        return None
+
+
+def _date(value):
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _column(header, names, required=True):
+    lowered = {name.strip().lower(): name for name in header}
+    for name in names:
+        if name in lowered:
+            return lowered[name]
+    if required:
+        raise StatementError(f'No {names[0]} column; expected one of: {", ".join(names)}')
+    return None
+
+
+def read_statement(stream):
+    """Credit lines of a statement CSV (a text stream), as Line tuples in file order."""
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames:
+        raise StatementError('The statement is empty')
+    date_column = _column(reader.fieldnames, DATE_COLUMNS)
+    amount_column = _column(reader.fieldnames, AMOUNT_COLUMNS)
+    debit_column = _column(reader.fieldnames, DEBIT_COLUMNS, required=False)
+    reference_column = _column(reader.fieldnames, REFERENCE_COLUMNS)
+    lines = []
+    for number, row in enumerate(reader, start=2):
+        cents = _cents(row[amount_column])
+        if cents is None or cents <= 0 or (debit_column and _cents(row[debit_column])):
+            continue
+        day = _date(row[date_column] or '')
+        if day is None:
+            raise StatementError(f'Line {number}: cannot read the date {row[date_column]!r}')
+        reference = (row[reference_column] or '').strip()
+        lines.append(Line(number, day, cents, reference, _tokens(reference)))
+    return lines
+
+
+def _candidate(key, pk, paid, day, receipt, student_id, first_name, last_name):
+    names = frozenset(token for token in _tokens(f'{first_name} {last_name}') if len(token) > 1 and token.isalpha())
+    return Candidate(key, pk, int(paid * 100), day, receipt, _normalise(receipt), student_id, names)
+
+
+def _candidates(start, end):
+    """Each recorded installment in the range, then payments that have no installments on record."""
+    installments = (
+        PaymentReceipt.objects
+        .filter(payment_method__in=BANK_METHODS, payment_date__range=(start, end), amount__gt=0)
+        .values_list('pk', 'payment_id', 'amount', 'payment_date', 'receipt_number', 'payment__student_id',
+                     'payment__student__first_name', 'payment__student__last_name')
+    )
+    for pk, *row in installments.iterator(chunk_size=5000):
+        yield _candidate(('receipt', pk), *row)
+
+    payments = (
+        Payment.objects
+        .filter(payment_method__in=BANK_METHODS, payment_date__range=(start, end))
+        .exclude(Exists(PaymentReceipt.objects.filter(payment_id=OuterRef('pk'))))
+        .annotate(paid=Coalesce('amount', F('total_paid')))
+        .filter(paid__gt=0)
+        .values_list('pk', 'paid', 'payment_date', 'receipt_number', 'student_id',
+                     'student__first_name', 'student__last_name')
+    )
+    for row in payments.iterator(chunk_size=5000):
+        yield _candidate(('payment', row[0]), *row)
+
+
+def _digits(token):
+    return re.sub(r'\D', '', token).lstrip('0')
+
+
+def _line_row(line):
+    return {'line': line.number, 'date': line.date.isoformat(), 'amount': f'{line.cents / 100:.2f}', 'reference': line.reference}
+
+
+class _Index:
+    """The hash tables the passes probe; built once from the candidate payments."""
+
+    def __init__(self, payments):
+        self.payments = {}
+        self.by_receipt, self.by_receipt_digits, self.by_amount_day, self.by_amount_name = {}, {}, {}, {}
+        for payment in payments:
+            self.payments[payment.key] = payment
+            if payment.receipt:
+                self.by_receipt[payment.receipt] = payment
+                if _digits(payment.receipt):
+                    self.by_receipt_digits.setdefault(_digits(payment.receipt), []).append(payment)
+            self.by_amount_day.setdefault((payment.cents, payment.date), []).append(payment)
+            for name in payment.names:
+                self.by_amount_name.setdefault((payment.cents, name, payment.date), []).append(payment)
+        self.vocabulary = {name for _, name, _ in self.by_amount_name}
+        self._sorted_vocabulary = sorted(self.vocabulary)
+        self._spellings = {}
+
+    def spelling(self, token):
+        """(name, similarity) for a reference token: itself if it is a known name, else the closest one."""
+        if token in self.vocabulary:
+            return token, 1.0
+        if token not in self._spellings:
+            close = get_close_matches(token, self._sorted_vocabulary, n=1, cutoff=NAME_CUTOFF)
+            self._spellings[token] = (close[0], SequenceMatcher(None, token, close[0]).ratio()) if close else None
+        return self._spellings[token]
+
+
+def _fuzzy_options(line, index, claimed, days):
+    """(score, -days apart, payment) for same-amount payments the reference plausibly names."""
+    found = {}
+    for token in line.tokens:
+        if token.isalpha() and len(token) > 1:
+            spelled = index.spelling(token)
+            if spelled and spelled[1] > found.get(spelled[0], 0):
+                found[spelled[0]] = spelled[1]
+    scores = {}
+    for name, similarity in found.items():
+        for offset in range(-days, days + 1):
+            for payment in index.by_amount_name.get((line.cents, name, line.date + timedelta(days=offset)), ()):
+                if payment.key not in claimed:
+                    scores.setdefault(payment.key, {})[name] = similarity
+    options = {key: sum(hits.values()) / len(index.payments[key].names) for key, hits in scores.items()}
+    # Receipt numbers written differently: "2026-27/000123" for "R-2026-27-000123"
+    for digits in {_digits(token) for token in line.tokens} | {_digits(line.reference)}:
+        if len(digits) >= RECEIPT_MIN_DIGITS:
+            for payment in index.by_receipt_digits.get(digits, ()):
+                if payment.cents == line.cents and payment.key not in claimed:
+                    options[payment.key] = max(options.get(payment.key, 0), RECEIPT_DIGITS_SCORE)
+    return sorted(
+        ((score, -abs((index.payments[key].date - line.date).days), index.payments[key]) for key, score in options.items()),
+        key=lambda option: option[:2], reverse=True,
+    )
+
+
+def reconcile(lines, window=DATE_WINDOW_DAYS, fuzzy_window=FUZZY_WINDOW_DAYS, min_score=FUZZY_MIN_SCORE):
+    """Match statement lines to payments; returns the report described in the module docstring."""
+    report = {'matched': [], 'duplicates': [], 'unmatched_lines': [], 'unmatched_payments': []}
+    statement_start = min((line.date for line in lines), default=None)
+    statement_end = max((line.date for line in lines), default=None)
+    reach = timedelta(days=max(window, fuzzy_window))
+    index = _Index(_candidates(statement_start - reach, statement_end + reach) if lines else ())
+    claimed = {}
+
+    def match(line, payment, how, score=1.0):
+        claimed[payment.key] = line.number
+        report['matched'].append({**_line_row(line), 'payment': payment.pk, 'student': payment.student_id,
+                                  'receipt_number': payment.receipt_number, 'by': how, 'score': round(score, 2)})
+
+    # Pass 1a: receipt numbers
+    seen, repeats, pending = {}, {}, []
+    for line in lines:
+        key = (line.date, line.cents, _normalise(line.reference))
+        if key in seen:
+            repeats[line.number] = seen[key]
+        else:
+            seen[key] = line.number
+        hit = next((index.by_receipt[token] for token in line.tokens
+                    if token in index.by_receipt and index.by_receipt[token].cents == line.cents), None)
+        if hit is None:
+            pending.append(line)
+        elif hit.key in claimed:
+            report['duplicates'].append({**_line_row(line), 'reason': 'payment_already_matched', 'payment': hit.pk,
+                                         'of': claimed[hit.key]})
+        else:
+            match(line, hit, 'receipt')
+
+    # Pass 1b: a single unclaimed payment with this amount near this date
+    ambiguous = []
+    for line in pending:
+        options = [
+            payment
+            for offset in range(-window, window + 1)
+            for payment in index.by_amount_day.get((line.cents, line.date + timedelta(days=offset)), ())
+            if payment.key not in claimed
+        ]
+        if len(options) == 1:
+            match(line, options[0], 'amount_date')
+        else:
+            ambiguous.append((line, [payment.pk for payment in options[:5]]))
+
+    # Pass 2: the reference names the student (allowing typos) or spells the receipt differently
+    for line, nearby in ambiguous:
+        options = _fuzzy_options(line, index, claimed, fuzzy_window)
+        best = options[0] if options and options[0][0] >= min_score else None
+        # A close runner-up makes the line ambiguous, unless it is the same student's payment
+        if best and len(options) > 1 and best[0] - options[1][0] < FUZZY_MARGIN and best[2].student_id != options[1][2].student_id:
+            best = None
+        if best:
+            match(line, best[2], 'fuzzy', best[0])
+        elif line.number in repeats:
+            # Same date, amount and reference as an earlier line, and nothing left to match it to
+            report['duplicates'].append({**_line_row(line), 'reason': 'repeats_line', 'of': repeats[line.number]})
+        else:
+            report['unmatched_lines'].append({**_line_row(line), 'candidates': [option[2].pk for option in options[:5]] or nearby})
+
+    in_statement = [payment for payment in index.payments.values()
+                    if statement_start and statement_start <= payment.date <= statement_end]
+    report['unmatched_payments'] = [
+        {'payment': payment.pk, 'student': payment.student_id, 'date': payment.date.isoformat(),
+         'amount': f'{payment.cents / 100:.2f}', 'receipt_number': payment.receipt_number}
+        for payment in in_statement if payment.key not in claimed
+    ]
+    report['summary'] = {
+        'lines': len(lines),
+        'payments': len(in_statement),
+        **{key: len(value) for key, value in report.items()},
+        **{f'matched_by_{how}': sum(1 for row in report['matched'] if row['by'] == how)
+           for how in ('receipt', 'amount_date', 'fuzzy')},
+    }
+    return report
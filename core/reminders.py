@@ -0,0 +1,128 @@
+"""
+Overdue-fee reminders: at most one email per student per billing period ('YYYY-MM').
+
+Students are selected in keyset pages of REMINDER_BATCH_SIZE. Each page is one
+grouped query over the partial index on unpaid payments, with a second query for
+the fee lines it lists. Students already in ReminderLog for the period, and
+students without a contact email, are left out by the query itself. Messages are
+rendered a page at a time and sent over one connection from Django's email
+backend, so SMTP, console or file backends all work. Sends are paced to
+REMINDER_RATE_PER_MINUTE.
+
+A ReminderLog row is written for every message the backend accepts. The rows are
+saved even if a later send in the page fails. A re-run for the same period
+therefore only reaches students who have not been sent one yet.
+"""
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Count, Exists, Min, OuterRef, Q, Sum
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .models import Payment, ReminderLog, Student
+
+
+TEMPLATE = 'core/fee_reminder.txt'
+
+
+def current_period(today=None):
+    return (today or timezone.localdate()).strftime('%Y-%m')
+
+
+def _check_period(period):
+    try:
+        date.fromisoformat(f'{period}-01')
+    except (TypeError, ValueError):
+        raise ValueError(f'Billing period must look like 2026-10, not {period!r}')
+
+
+def overdue_accounts(period, today):
+    """Students owing overdue fees who have an email and no reminder for `period` yet, one row each."""
+    already_sent = ReminderLog.objects.filter(student_id=OuterRef('student_id'), period=period)
+    return (
+        Payment.objects
+        .filter(due_date__lt=today, balance__gt=0)
+        .exclude(student__contact_email='')
+        .exclude(Exists(already_sent))
+        .values('student_id')
+        .annotate(payments=Count('pk'), amount=Sum('balance'), oldest_due=Min('due_date'))
+        .order_by('student_id')
+    )
+
+
+def _render(accounts, today, template):
+    """One EmailMessage per account, using one query for the students and one for their fee lines."""
+    ids = [account['student_id'] for account in accounts]
+    students = Student.objects.select_related('classroom').in_bulk(ids)
+    fees = {}
+    labels = dict(Payment._meta.get_field('fee_type').choices)
+    lines = (
+        Payment.objects
+        .filter(Q(due_date__lt=today, balance__gt=0), student_id__in=ids)
+        .order_by('student_id', 'due_date')
+        .values('student_id', 'fee_type', 'balance', 'due_date')
+    )
+    for line in lines:
+        line['label'] = labels.get(line['fee_type'], line['fee_type'])
+        fees.setdefault(line['student_id'], []).append(line)
+
+    messages = []
+    for account in accounts:
+        student = students[account['student_id']]
+        amount = f'{account["amount"]:.2f}'
+        body = template.render({'student': student, 'fees': fees.get(student.pk, []), 'amount': amount})
+        subject = f'Fee reminder: ₹{amount} overdue for {student.first_name} {student.last_name}'
+        messages.append(EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [student.contact_email]))
+    return messages
+
+
+def send_reminders(period=None, today=None, batch_size=None, rate=None, connection=None, progress=None):
+    """Email every eligible student once for `period`; returns counts of sent and refused messages."""
+    today = today or timezone.localdate()
+    period = period or current_period(today)
+    _check_period(period)
+    batch_size = batch_size or settings.REMINDER_BATCH_SIZE
+    rate = settings.REMINDER_RATE_PER_MINUTE if rate is None else rate
+    interval = 60 / rate if rate > 0 else 0
+
+    accounts = overdue_accounts(period, today)
+    total = accounts.count()
+    template = get_template(TEMPLATE)
+    connection = connection or get_connection()
+    report = {'period': period, 'eligible': total, 'sent': 0, 'refused': 0}
+    after, done, next_send = 0, 0, time.monotonic()
+
+    with connection:
+        while True:
+            page = list(accounts.filter(student_id__gt=after)[:batch_size])
+            if not page:
+                break
+            after = page[-1]['student_id']
+            logs = []
+            try:
+                for account, message in zip(page, _render(page, today, template)):
+                    wait = next_send - time.monotonic()
+                    if wait > 0:
+                        time.sleep(wait)
+                    next_send = max(next_send, time.monotonic()) + interval
+                    if connection.send_messages([message]):
+                        logs.append(ReminderLog(
+                            student_id=account['student_id'],
+                            period=period,
+                            email=message.to[0],
+                            payments=account['payments'],
+                            amount=account['amount'],
+                        ))
+                    else:
+                        report['refused'] += 1
+                    done += 1
+            finally:
+                # Log what went out even if a send failed, so a retry doesn't repeat it
+                ReminderLog.objects.bulk_create(logs, ignore_conflicts=True)
+                report['sent'] += len(logs)
+            if progress:
+                progress(done, total)
+    return report
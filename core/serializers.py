@@ -1,16 +1,20 @@
+from decimal import Decimal
+
 from rest_framework import serializers
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from .models import ClassRoom, Student, Attendance, Grade, FeeStructure, Payment, AdminUser
+from .models import ClassRoom, Student, Attendance, Grade, FeeStructure, Payment, AdminUser, Job
+from . import jobs, reconcile, tasks
+from .instrumentation import TimedSerializerMixin
 
 
-class ClassRoomSerializer(serializers.ModelSerializer):
+class ClassRoomSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = ClassRoom
         fields = '__all__'
 
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     classroom_detail = ClassRoomSerializer(source='classroom', read_only=True)
 
     class Meta:
@@ -22,7 +26,7 @@ class StudentSerializer(serializers.ModelSerializer):
         ]
 
 
-class AttendanceSerializer(serializers.ModelSerializer):
+class AttendanceSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     student_detail = StudentSerializer(source='student', read_only=True)
 
     class Meta:
@@ -30,7 +34,7 @@ class AttendanceSerializer(serializers.ModelSerializer):
         fields = ['id', 'student', 'student_detail', 'date', 'status', 'notes']
 
 
-class GradeSerializer(serializers.ModelSerializer):
+class GradeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     student_detail = StudentSerializer(source='student', read_only=True)
 
     class Meta:
@@ -38,7 +42,7 @@ class GradeSerializer(serializers.ModelSerializer):
         fields = ['id', 'student', 'student_detail', 'subject', 'term', 'score', 'max_score', 'recorded_at']
 
 
-class FeeStructureSerializer(serializers.ModelSerializer):
+class FeeStructureSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     classroom_name = serializers.CharField(source='classroom.name', read_only=True)
 
     class Meta:
@@ -49,7 +53,7 @@ class FeeStructureSerializer(serializers.ModelSerializer):
         ]
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.first_name', read_only=True)
     student_full_name = serializers.SerializerMethodField()
     is_overdue = serializers.ReadOnlyField()
@@ -60,14 +64,56 @@ class PaymentSerializer(serializers.ModelSerializer):
             'id', 'student', 'student_name', 'student_full_name', 'fee_type', 
             'amount', 'total_fee', 'total_paid', 'balance', 'payment_date', 
             'due_date', 'is_overdue', 'payment_method', 'receipt_number', 
-            'notes', 'created_at'
+            'notes', 'created_at', 'version'
         ]
+        read_only_fields = ['balance', 'receipt_number']
 
     def get_student_full_name(self, obj):
         return f"{obj.student.first_name} {obj.student.last_name}"
 
+    def validate(self, attrs):
+        # The balance follows from the fee and what was paid; never trust a client-computed one
+        instance = self.instance
+        total_fee = attrs.get('total_fee', instance.total_fee if instance else 0)
+        total_paid = attrs.get('total_paid', instance.total_paid if instance else 0)
+        attrs['balance'] = total_fee - total_paid
+        return attrs
+
+
+class ApplyPaymentSerializer(serializers.Serializer):
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
+    payment_method = serializers.ChoiceField(choices=Payment.PAYMENT_METHOD_CHOICES, required=False)
+    payment_date = serializers.DateField(required=False)
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+
+class PromotionStepSerializer(serializers.Serializer):
+    source = serializers.IntegerField()
+    target = serializers.IntegerField()
+    renumber = serializers.BooleanField(default=False)
+
+
+class PromotionSerializer(serializers.Serializer):
+    plan = PromotionStepSerializer(many=True, allow_empty=False)
+    dry_run = serializers.BooleanField(default=True)
+
+
+class ReconcileSerializer(serializers.Serializer):
+    statement = serializers.FileField()
+    window = serializers.IntegerField(min_value=0, max_value=31, default=reconcile.DATE_WINDOW_DAYS)
+    fuzzy_window = serializers.IntegerField(min_value=0, max_value=62, default=reconcile.FUZZY_WINDOW_DAYS)
+    min_score = serializers.FloatField(min_value=0, max_value=1, default=reconcile.FUZZY_MIN_SCORE)
+
 
-class AdminUserSerializer(serializers.ModelSerializer):
+class DuplicateCheckSerializer(serializers.Serializer):
+    first_name = serializers.CharField()
+    last_name = serializers.CharField()
+    date_of_birth = serializers.DateField(required=False, allow_null=True)
+    father_name = serializers.CharField(required=False, allow_blank=True)
+    contact_phone = serializers.CharField(required=False, allow_blank=True)
+
+
+class AdminUserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     created_by_name = serializers.SerializerMethodField()
     full_name = serializers.ReadOnlyField()
     is_active = serializers.ReadOnlyField()
@@ -138,3 +184,35 @@ class AdminUserSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
+class JobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    progress_percent = serializers.ReadOnlyField()
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'payload', 'status', 'progress_done', 'progress_total', 'progress_percent',
+            'progress_message', 'result', 'error', 'attempts', 'max_attempts', 'run_after',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = [
+            'status', 'progress_done', 'progress_total', 'progress_message', 'result', 'error',
+            'attempts', 'max_attempts', 'run_after', 'created_at', 'started_at', 'finished_at'
+        ]
+
+    def validate_kind(self, value):
+        if value not in jobs.HANDLERS:
+            raise serializers.ValidationError(f"Unknown job kind. Choose from: {', '.join(sorted(jobs.HANDLERS))}")
+        return value
+
+    def validate(self, attrs):
+        payload = attrs.get('payload') or {}
+        if attrs.get('kind') == 'export_csv':
+            # Checked here too so a bad filter is a 400 now rather than a failed job later
+            try:
+                tasks.export_queryset(payload.get('model'), payload.get('filters'))
+            except (AttributeError, ValueError) as exc:
+                raise serializers.ValidationError({'payload': str(exc)})
+        return attrs
+
+    def create(self, validated_data):
+        return jobs.enqueue(validated_data['kind'], validated_data.get('payload'), user=self.context['request'].user)
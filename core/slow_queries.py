@@ -0,0 +1,114 @@
+"""
+Slow-query log: SQL, parameters, calling view and EXPLAIN output for queries over
+``SLOW_QUERY_THRESHOLD_MS``, appended as JSON lines to ``SLOW_QUERY_LOG``.
+
+Read by ``manage.py advise_indexes``.
+"""
+import json
+import logging
+import os
+import threading
+import traceback
+from datetime import datetime, timezone
+from time import perf_counter
+
+from django.conf import settings
+from django.db import transaction
+
+from .instrumentation import current_timings
+
+
+logger = logging.getLogger('core.slow_queries')
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+
+def _json_param(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = str(value)
+    return text if len(text) <= 200 else text[:200] + '...'
+
+
+def _caller():
+    """Innermost stack frame that belongs to this project rather than Django or a library."""
+    base = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()[:-3]):
+        if frame.filename.startswith(base) and 'site-packages' not in frame.filename and not frame.filename.endswith('slow_queries.py'):
+            return f'{os.path.relpath(frame.filename, base)}:{frame.lineno} in {frame.name}'
+    return ''
+
+
+def explain(connection, sql, params):
+    """Return the query plan as a list of lines, or None if the query can't be explained."""
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    # Plan only: EXPLAIN ANALYZE would run the slow statement a second time
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    _local.explaining = True
+    try:
+        # A savepoint keeps a failed EXPLAIN from aborting the caller's transaction
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(prefix + sql, params)
+                rows = cursor.fetchall()
+    except Exception as exc:
+        return [f'EXPLAIN failed: {exc}']
+    finally:
+        _local.explaining = False
+    if connection.vendor == 'sqlite':
+        # (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    return [' '.join(str(col) for col in row) for row in rows]
+
+
+class SlowQueryLogger:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, 'explaining', False):
+            return execute(sql, params, many, context)
+        started = perf_counter()
+        try:
+            result = execute(sql, params, many, context)
+        except Exception:
+            duration_ms = (perf_counter() - started) * 1000
+            if duration_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+                # The transaction may be aborted (Postgres), so no EXPLAIN
+                self.record(sql, params, many, duration_ms, failed=True)
+            raise
+        duration_ms = (perf_counter() - started) * 1000
+        if duration_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+            self.record(sql, params, many, duration_ms)
+        return result
+
+    def record(self, sql, params, many, duration_ms, failed=False):
+        timings = current_timings()
+        entry = {
+            'ts': datetime.now(timezone.utc).isoformat(),
+            'alias': self.connection.alias,
+            'vendor': self.connection.vendor,
+            'duration_ms': round(duration_ms, 2),
+            'sql': sql,
+            'params': [] if many or params is None else [_json_param(p) for p in params],
+            'view': f'{timings.viewset}.{timings.action}' if timings is not None and timings.viewset else '',
+            'caller': _caller(),
+            'plan': None if many or failed else explain(self.connection, sql, params),
+            'failed': failed,
+        }
+        logger.warning('Slow query (%.1fms) %s', duration_ms, sql[:200], extra={'slow_query': entry})
+        path = settings.SLOW_QUERY_LOG
+        if path:
+            with _write_lock, open(path, 'a') as fh:
+                fh.write(json.dumps(entry) + '\n')
+
+
+def install(sender, connection, **kwargs):
+    """connection_created receiver: add the slow-query wrapper to every new DB connection."""
+    if settings.SLOW_QUERY_THRESHOLD_MS > 0 and not any(
+        isinstance(wrapper, SlowQueryLogger) for wrapper in connection.execute_wrappers
+    ):
+        # Outermost, so connection.execute_wrapper() blocks keep popping their own wrapper
+        connection.execute_wrappers.insert(0, SlowQueryLogger(connection))
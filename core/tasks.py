@@ -0,0 +1,132 @@
+"""Background job handlers; see core.jobs for how they are queued and run."""
+import csv
+import os
+from datetime import date, timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import router, transaction
+from django.utils import timezone
+
+from . import backups, changes, reminders
+from .jobs import enqueue, job
+from .models import FeeStructure, Job, Payment, Student
+
+
+EXPORTABLE = ('ClassRoom', 'Student', 'Attendance', 'Grade', 'FeeStructure', 'Payment')
+# Export filters name the model's own columns with one of these lookups; nothing reaches into related tables
+EXPORT_LOOKUPS = ('exact', 'in', 'gt', 'gte', 'lt', 'lte', 'isnull')
+
+
+def export_path(job_id, extension='csv'):
+    """Where a job's file lives; job ids repeat across schools, so each database gets its own directory."""
+    directory = os.path.join(settings.MEDIA_ROOT, 'exports', router.db_for_write(Job))
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'job-{job_id}.{extension}')
+
+
+def export_queryset(model, filters=None):
+    """The rows export_csv writes; raises ValueError for a model or filter it doesn't allow."""
+    if model not in EXPORTABLE:
+        raise ValueError(f'{model} cannot be exported')
+    model_cls = apps.get_model('core', model)
+    filters = filters or {}
+    if not isinstance(filters, dict):
+        raise ValueError('filters must be an object of column lookups')
+    columns = {field.attname for field in model_cls._meta.concrete_fields}
+    for key in filters:
+        column, _, lookup = key.partition('__')
+        if column not in columns or (lookup and lookup not in EXPORT_LOOKUPS):
+            raise ValueError(f'{model} exports cannot be filtered by {key!r}')
+    return model_cls.objects.filter(**filters).order_by('pk')
+
+
+@job('export_csv')
+def export_csv(ctx, model, filters=None):
+    """Write every row of a core model (optionally filtered) to a CSV file."""
+    queryset = export_queryset(model, filters)
+    columns = [field.attname for field in queryset.model._meta.concrete_fields]
+    total = queryset.count()
+    path = export_path(ctx.job.pk)
+    with open(path, 'w', newline='') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(columns)
+        for done, row in enumerate(queryset.values_list(*columns).iterator(chunk_size=2000), start=1):
+            writer.writerow(row)
+            if done % 2000 == 0:
+                ctx.progress(done, total)
+    ctx.progress(total, total, 'done')
+    return {'rows': total, 'file': os.path.basename(path)}
+
+
+@job('generate_fees')
+def generate_fees(ctx, month):
+    """
+    Create one unpaid Payment per student for every monthly FeeStructure of their
+    classroom, for the given 'YYYY-MM'. Students already billed that month are skipped,
+    so re-running after a failure is safe.
+    """
+    first = date.fromisoformat(f'{month}-01')
+    due = first.replace(day=min(settings.FEE_DUE_DAY, 28))
+    fees = {}
+    for fee in FeeStructure.objects.filter(frequency='monthly'):
+        fees.setdefault(fee.classroom_id, []).append(fee)
+
+    students = Student.objects.filter(classroom_id__in=list(fees)).values_list('pk', 'classroom_id')
+    total = students.count()
+    billed = set(
+        Payment.objects.filter(due_date=due).values_list('student_id', 'fee_type')
+    )
+    created = 0
+    batch = []
+    for done, (student_id, classroom_id) in enumerate(students.iterator(chunk_size=2000), start=1):
+        for fee in fees[classroom_id]:
+            if (student_id, fee.fee_type) in billed:
+                continue
+            batch.append(Payment(
+                student_id=student_id,
+                fee_type=fee.fee_type,
+                total_fee=fee.amount,
+                total_paid=0,
+                balance=fee.amount,
+                payment_date=first,
+                due_date=due,
+                notes=f'Billed for {month}',
+            ))
+        if len(batch) >= 1000:
+            with transaction.atomic():
+                Payment.objects.bulk_create(batch)
+                changes.record_many(Payment, batch)
+            created += len(batch)
+            batch = []
+            ctx.progress(done, total)
+    if batch:
+        with transaction.atomic():
+            Payment.objects.bulk_create(batch)
+            changes.record_many(Payment, batch)
+        created += len(batch)
+    ctx.progress(total, total, 'done')
+    return {'month': month, 'created': created}
+
+
+def schedule_backup(run_after=None):
+    """Queue a backup_database job (BACKUP_INTERVAL_HOURS from now by default) unless one is waiting."""
+    if Job.objects.filter(kind='backup_database', status=Job.STATUS_QUEUED).exists():
+        return None
+    if run_after is None:
+        run_after = timezone.now() + timedelta(hours=settings.BACKUP_INTERVAL_HOURS)
+    return enqueue('backup_database', run_after=run_after)
+
+
+@job('backup_database')
+def backup_database(ctx):
+    """Snapshot the current school's SQLite database, first queueing the next run so a failure doesn't end the schedule."""
+    if settings.BACKUP_INTERVAL_HOURS > 0:
+        schedule_backup()
+    return backups.backup(router.db_for_write(Job))
+
+
+@job('send_fee_reminders')
+def send_fee_reminders(ctx, period=None):
+    """Email everyone with overdue fees, once per billing period ('YYYY-MM', this month by default)."""
+    return reminders.send_reminders(period, progress=ctx.progress)
@@ -0,0 +1,132 @@
+"""
+Serve several schools from one worker pool, each with its own database alias.
+
+A tenant is resolved per request from the Host header or, for a shared API host,
+from the ``tenant`` claim of the JWT. TenantRouter then sends every query in that
+request to the tenant's alias. Requests that resolve to no tenant use ``default``.
+
+Once TENANTS is configured every token carries the claim: the school it was issued
+on, or null for the default database. A user id means nothing outside its own
+database, so a token without the claim, or for another school, is refused on a
+school's host (see tenant_for_token).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache.backends.base import default_key_func
+from rest_framework.exceptions import PermissionDenied
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+_current_tenant = ContextVar('core_current_tenant', default=None)
+
+
+def current_tenant():
+    return _current_tenant.get()
+
+
+def tenant_alias(slug):
+    return settings.TENANTS[slug]['alias']
+
+
+def activate(slug):
+    return _current_tenant.set(slug)
+
+
+def deactivate(token):
+    _current_tenant.reset(token)
+
+
+@contextmanager
+def use_tenant(slug):
+    """Run a block (management command, job) against one tenant's database."""
+    if slug is not None and slug not in settings.TENANTS:
+        raise KeyError(f'Unknown tenant {slug!r}')
+    token = activate(slug)
+    try:
+        yield
+    finally:
+        deactivate(token)
+
+
+def tenant_for_host(host):
+    host = host.split(':')[0].lower()
+    for slug, tenant in settings.TENANTS.items():
+        if host in tenant['hosts']:
+            return slug
+    return None
+
+
+class WrongTenant(Exception):
+    """The token names no school, or not the one this host serves."""
+
+
+def tenant_for_token(token, host_tenant):
+    """The tenant a validated token acts for on a host serving `host_tenant`; raises WrongTenant."""
+    if 'tenant' not in token:
+        raise WrongTenant('Token does not name a school; log in again.')
+    claim = token['tenant']
+    if claim is not None and claim not in settings.TENANTS:
+        raise WrongTenant('Token was issued for an unknown school.')
+    if host_tenant is not None and claim != host_tenant:
+        raise WrongTenant('Token was issued for a different school.')
+    return claim
+
+
+def make_cache_key(key, key_prefix, version):
+    """CACHES KEY_FUNCTION that keeps each tenant's cached data apart."""
+    tenant = _current_tenant.get()
+    if tenant is not None:
+        key = f'{tenant}:{key}'
+    return default_key_func(key, key_prefix, version)
+
+
+class TenantRouter:
+    """Route every model to the current tenant's alias; defer to the next router otherwise."""
+
+    def db_for_read(self, model, **hints):
+        tenant = _current_tenant.get()
+        return tenant_alias(tenant) if tenant is not None else None
+
+    def db_for_write(self, model, **hints):
+        tenant = _current_tenant.get()
+        return tenant_alias(tenant) if tenant is not None else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        tenant_aliases = {tenant['alias'] for tenant in settings.TENANTS.values()}
+        if obj1._state.db in tenant_aliases or obj2._state.db in tenant_aliases:
+            return obj1._state.db == obj2._state.db
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Tenant databases get the full schema
+        if any(tenant['alias'] == db for tenant in settings.TENANTS.values()):
+            return True
+        return None
+
+
+class TenantTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Stamp the tenant the user logged in to (null for ``default``) into the token."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        if settings.TENANTS:
+            token['tenant'] = _current_tenant.get()
+        return token
+
+
+class TenantTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh only on the school the token was issued for, and look the user up there."""
+
+    def validate(self, attrs):
+        if not settings.TENANTS:
+            return super().validate(attrs)
+        try:
+            tenant = tenant_for_token(RefreshToken(attrs['refresh']), _current_tenant.get())
+        except WrongTenant as exc:
+            raise PermissionDenied(str(exc))
+        with use_tenant(tenant):
+            return super().validate(attrs)
@@ -1,3 +1,1452 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import closing, contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, connection, connections, transaction
+from django.db.utils import load_backend
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import (
+    archive, backups, dashboard, dedup, dumps, events, legacy, metrics, profiles, promotion, receipts, reconcile, reminders, slow_queries,
+    tasks, tenancy,
+)
+from .models import (
+    AdminUser, ArchivedAttendance, Attendance, ChangeLog, ClassRoom, FeeStructure, Grade, LegacyIdMap, Payment,
+    PaymentReceipt, ReminderLog, Student,
+)
+
+
+def run_concurrently(count, fn):
+    """Run fn(i) in `count` threads released at the same moment; returns their results in order."""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(i):
+        try:
+            barrier.wait()
+            results[i] = fn(i)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+@contextmanager
+def extra_database(alias):
+    """A migrated SQLite file opened as database `alias` for the length of the block."""
+    settings_dict = {**connections['default'].settings_dict, 'NAME': os.path.join(tempfile.mkdtemp(), f'{alias}.sqlite3')}
+    connections[alias] = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, alias)
+    try:
+        call_command('migrate', database=alias, verbosity=0)
+        yield connections[alias]
+    finally:
+        connections[alias].close()
+        del connections[alias]
+
+@override_settings(THROTTLE_ENABLED=False)
+class PaymentConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        receipts.reset_blocks()
+        self.user = User.objects.create_user('cashier', password='x', is_staff=True)
+        classroom = ClassRoom.objects.create(name='5', section='A')
+        student = Student.objects.create(
+            first_name='Asha', last_name='Rao', date_of_birth=date(2014, 5, 1), roll_number='1', classroom=classroom,
+        )
+        self.payment = Payment.objects.create(
+            student=student, fee_type='tuition', total_fee=Decimal('10000'), balance=Decimal('10000'),
+            payment_date=date(2026, 4, 1),
+        )
+        self.url = f'/api/payments/{self.payment.pk}/'
+
+    def client_for(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client
+
+    def test_parallel_apply_payment_loses_no_installment(self):
+        writers = 20
+
+        def pay(i):
+            return self.client_for().post(f'{self.url}apply_payment/', {'amount': '100.00'}, format='json').status_code
+
+        statuses = run_concurrently(writers, pay)
+
+        self.assertEqual(statuses, [200] * writers)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.total_paid, Decimal('2000'))
+        self.assertEqual(self.payment.balance, Decimal('8000'))
+        self.assertEqual(self.payment.version, 1 + writers)
+
+    def test_parallel_updates_of_same_version_conflict(self):
+        writers = 10
+
+        def update(i):
+            response = self.client_for().patch(
+                self.url, {'total_paid': str(100 * (i + 1))}, format='json', HTTP_IF_MATCH='"1"',
+            )
+            return response.status_code
+
+        statuses = run_concurrently(writers, update)
+
+        self.assertEqual(statuses.count(200), 1)
+        self.assertEqual(statuses.count(409), writers - 1)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.version, 2)
+        self.assertEqual(self.payment.balance, self.payment.total_fee - self.payment.total_paid)
+
+    def test_update_requires_version(self):
+        client = self.client_for()
+        self.assertEqual(client.patch(self.url, {'notes': 'x'}, format='json').status_code, 428)
+
+        response = client.patch(self.url, {'notes': 'x'}, format='json', HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"2"')
+
+        stale = client.patch(self.url, {'notes': 'y'}, format='json', HTTP_IF_MATCH='"1"')
+        self.assertEqual(stale.status_code, 409)
+        self.assertEqual(stale.data['current']['notes'], 'x')
+
+    def test_apply_payment_rejects_overpayment(self):
+        response = self.client_for().post(f'{self.url}apply_payment/', {'amount': '10000.01'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.total_paid, 0)
+
+
+@override_settings(THROTTLE_ENABLED=False, RECEIPT_BLOCK_SIZE=10, RECEIPT_PREFIX='R')
+class ReceiptSequenceTests(TransactionTestCase):
+    def setUp(self):
+        receipts.reset_blocks()
+
+    def test_parallel_issue_never_repeats_a_number(self):
+        threads, per_thread = 8, 250
+
+        def issue_many(i):
+            return [receipts.issue(date(2026, 6, 1)) for _ in range(per_thread)]
+
+        batches = run_concurrently(threads, issue_many)
+
+        numbers = [number for batch in batches for number in batch]
+        self.assertEqual(len(numbers), threads * per_thread)
+        self.assertEqual(len(set(numbers)), len(numbers))
+        for batch in batches:
+            self.assertEqual(batch, sorted(batch))
+        self.assertTrue(numbers[0].startswith('R-2026-27-'))
+
+    def test_numbers_drawn_in_a_transaction_roll_back_with_it(self):
+        with transaction.atomic():
+            first = receipts.next_number(2026)
+        try:
+            with transaction.atomic():
+                receipts.next_number(2026)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        with transaction.atomic():
+            self.assertEqual(receipts.next_number(2026), first + 1)
+
+    def test_receipt_numbers_are_unique_in_the_database(self):
+        user = User.objects.create_user('cashier', password='x')
+        classroom = ClassRoom.objects.create(name='5', section='A')
+        student = Student.objects.create(
+            first_name='Asha', last_name='Rao', date_of_birth=date(2014, 5, 1), roll_number='1', classroom=classroom,
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        payload = {'student': student.pk, 'fee_type': 'tuition', 'total_fee': '1000', 'total_paid': '400', 'payment_date': '2026-06-01'}
+        first = client.post('/api/payments/', payload, format='json').data['receipt_number']
+        second = client.post('/api/payments/', payload, format='json').data['receipt_number']
+        self.assertNotEqual(first, second)
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Payment.objects.filter(receipt_number=second).update(receipt_number=first)
+
+
+    def test_a_rolled_back_payment_leaves_no_gap_with_blocks_of_one(self):
+        classroom = ClassRoom.objects.create(name='5', section='A')
+        student = Student.objects.create(
+            first_name='Asha', last_name='Rao', date_of_birth=date(2014, 5, 1), roll_number='1', classroom=classroom,
+        )
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('cashier', password='x'))
+        payload = {'student': student.pk, 'fee_type': 'tuition', 'total_fee': '1000', 'total_paid': '400', 'payment_date': '2026-06-01'}
+
+        with override_settings(RECEIPT_BLOCK_SIZE=1):
+            first = client.post('/api/payments/', payload, format='json').data['receipt_number']
+            # The receipt number is drawn, then the write fails and rolls back
+            with mock.patch('core.views.PaymentViewSet._keep_receipt', side_effect=DatabaseError('disk full')), \
+                    self.assertRaises(DatabaseError):
+                client.post('/api/payments/', payload, format='json')
+            second = client.post('/api/payments/', payload, format='json').data['receipt_number']
+
+        self.assertEqual((first, second), ('R-2026-27-000001', 'R-2026-27-000002'))
+        self.assertEqual(Payment.objects.count(), 2)
+
+@override_settings(THROTTLE_ENABLED=False, RECEIPT_BLOCK_SIZE=10, RECEIPT_PREFIX='R')
+class InstallmentReceiptTests(TransactionTestCase):
+    def setUp(self):
+        receipts.reset_blocks()
+        classroom = ClassRoom.objects.create(name='5', section='A')
+        self.student = Student.objects.create(
+            first_name='Asha', last_name='Rao', date_of_birth=date(2014, 5, 1), roll_number='1', classroom=classroom,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('cashier', password='x'))
+
+    def create(self, **fields):
+        payload = {'student': self.student.pk, 'fee_type': 'tuition', 'total_fee': '1000', 'total_paid': '400',
+                   'payment_date': '2026-06-01', 'payment_method': 'bank_transfer', **fields}
+        return self.client.post('/api/payments/', payload, format='json').data
+
+    def test_refused_writes_spend_no_receipt_number(self):
+        payment = self.create()
+        url = f'/api/payments/{payment["id"]}/'
+        self.assertEqual(payment['receipt_number'], 'R-2026-27-000001')
+
+        stale = self.client.patch(url, {'total_paid': '600'}, format='json', HTTP_IF_MATCH='"9"')
+        self.assertEqual(stale.status_code, 409)
+        too_much = self.client.post(f'{url}apply_payment/', {'amount': '700', 'payment_date': '2026-06-05'}, format='json')
+        self.assertEqual(too_much.status_code, 400)
+
+        applied = self.client.post(f'{url}apply_payment/', {'amount': '100', 'payment_date': '2026-06-05'}, format='json')
+        self.assertEqual(applied.data['receipt_number'], 'R-2026-27-000002')
+        updated = self.client.patch(url, {'total_paid': '700'}, format='json', HTTP_IF_MATCH=f'"{applied.data["version"]}"')
+        self.assertEqual(updated.data['receipt_number'], 'R-2026-27-000003')
+
+        self.assertEqual(
+            list(PaymentReceipt.objects.filter(payment_id=payment['id']).values_list('receipt_number', 'amount')),
+            [('R-2026-27-000001', Decimal('400')), ('R-2026-27-000002', Decimal('100')),
+             ('R-2026-27-000003', Decimal('200'))],
+        )
+
+    def test_reconcile_matches_earlier_installments(self):
+        payment = self.create()
+        self.client.post(f'/api/payments/{payment["id"]}/apply_payment/', {'amount': '300', 'payment_date': '2026-06-20'},
+                         format='json')
+        statement = io.StringIO(
+            'Date,Narration,Credit\n'
+            '2026-06-02,NEFT R-2026-27-000001 ASHA,400.00\n'
+            '2026-06-20,SCHOOL FEES,300.00\n'
+        )
+
+        report = reconcile.reconcile(reconcile.read_statement(statement))
+
+        self.assertEqual(
+            [(row['receipt_number'], row['by']) for row in report['matched']],
+            [('R-2026-27-000001', 'receipt'), ('R-2026-27-000002', 'amount_date')],
+        )
+        self.assertEqual(report['unmatched_payments'], [])
+
+
+# Two schools on the test database: routing is the same, only the claim checks differ
+TWO_SCHOOLS = {
+    'greenwood': {'hosts': ['greenwood.test'], 'alias': 'default'},
+    'oakridge': {'hosts': ['oakridge.test'], 'alias': 'default'},
+}
+
+
+@override_settings(THROTTLE_ENABLED=False, TENANTS=TWO_SCHOOLS, TENANT_REQUIRED=False)
+class TenantTokenTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('teacher', password='x')
+
+    def access(self, **claims):
+        refresh = RefreshToken.for_user(self.user)
+        for name, value in claims.items():
+            refresh[name] = value
+        return str(refresh.access_token)
+
+    def get(self, host, token):
+        return APIClient().get('/api/classrooms/', HTTP_HOST=host, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_token_is_accepted_on_its_own_school(self):
+        self.assertEqual(self.get('greenwood.test', self.access(tenant='greenwood')).status_code, 200)
+
+    def test_token_from_another_school_is_refused(self):
+        self.assertEqual(self.get('oakridge.test', self.access(tenant='greenwood')).status_code, 403)
+
+    def test_token_without_claim_is_refused_on_a_school_host(self):
+        self.assertEqual(self.get('greenwood.test', self.access()).status_code, 403)
+
+    def test_default_database_token_is_refused_on_a_school_host(self):
+        token = self.access(tenant=None)
+        self.assertEqual(self.get('api.test', token).status_code, 200)
+        self.assertEqual(self.get('greenwood.test', token).status_code, 403)
+
+    def test_issued_tokens_name_the_school(self):
+        client = APIClient()
+        response = client.post('/api/auth/token/', {'username': 'teacher', 'password': 'x'}, HTTP_HOST='greenwood.test')
+        self.assertEqual(RefreshToken(response.data['refresh'])['tenant'], 'greenwood')
+        self.assertEqual(self.get('greenwood.test', response.data['access']).status_code, 200)
+        self.assertEqual(self.get('oakridge.test', response.data['access']).status_code, 403)
+        refreshed = client.post('/api/auth/token/refresh/', {'refresh': response.data['refresh']}, HTTP_HOST='oakridge.test')
+        self.assertEqual(refreshed.status_code, 403)
+
+    @override_settings(CORS_ALLOW_ALL_ORIGINS=False, CORS_ALLOWED_ORIGINS=['https://app.test'], TENANT_REQUIRED=True)
+    def test_refusals_carry_cors_headers(self):
+        client = APIClient(HTTP_ORIGIN='https://app.test')
+        wrong_school = client.get('/api/classrooms/', HTTP_HOST='oakridge.test',
+                                  HTTP_AUTHORIZATION=f'Bearer {self.access(tenant="greenwood")}')
+        unknown = client.get('/api/classrooms/', HTTP_HOST='elsewhere.test')
+
+        self.assertEqual((wrong_school.status_code, unknown.status_code), (403, 404))
+        for response in (wrong_school, unknown):
+            self.assertEqual(response['Access-Control-Allow-Origin'], 'https://app.test')
+
+
+@override_settings(THROTTLE_ENABLED=False, TENANTS=TWO_SCHOOLS, TENANT_REQUIRED=False)
+class EventStreamAuthTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('teacher', password='x')
+
+    def ticket(self, host):
+        refresh = RefreshToken.for_user(self.user)
+        refresh['tenant'] = 'greenwood'
+        response = APIClient().post('/api/events/ticket/', HTTP_HOST=host,
+                                    HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.assertEqual(response.status_code, 200)
+        return response.data['ticket']
+
+    def authenticate(self, host, **extra):
+        request = RequestFactory().get('/api/events/', HTTP_HOST=host, **extra)
+        return async_to_sync(events._authenticate)(request)
+
+    def test_ticket_opens_the_stream_of_its_own_school_only(self):
+        ticket = self.ticket('greenwood.test')
+        self.assertEqual(self.authenticate('greenwood.test', QUERY_STRING=f'ticket={ticket}'), (self.user, 'greenwood'))
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate('oakridge.test', QUERY_STRING=f'ticket={ticket}')
+
+    @override_settings(EVENTS_TICKET_SECONDS=-1)
+    def test_expired_ticket_is_refused(self):
+        ticket = self.ticket('greenwood.test')
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate('greenwood.test', QUERY_STRING=f'ticket={ticket}')
+
+    def test_access_token_is_not_a_ticket(self):
+        refresh = RefreshToken.for_user(self.user)
+        refresh['tenant'] = 'greenwood'
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate('greenwood.test', QUERY_STRING=f'ticket={refresh.access_token}')
+
+    def test_header_token_needs_the_host_school(self):
+        unclaimed = RefreshToken.for_user(self.user).access_token
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate('greenwood.test', HTTP_AUTHORIZATION=f'Bearer {unclaimed}')
+
+
+@override_settings(THROTTLE_ENABLED=False)
+class ExportJobTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('office', password='x', is_staff=True))
+
+    def queue(self, payload):
+        return self.client.post('/api/jobs/', {'kind': 'export_csv', 'payload': payload}, format='json')
+
+    def test_filters_are_limited_to_own_columns(self):
+        self.assertEqual(self.queue({'model': 'Payment', 'filters': {'payment_date__gte': '2026-04-01'}}).status_code, 201)
+        for filters in ({'student__first_name': 'Asha'}, {'notes__regex': '.*'}, {'nope': 1}, ['balance']):
+            response = self.queue({'model': 'Payment', 'filters': filters})
+            self.assertEqual(response.status_code, 400, filters)
+        self.assertEqual(self.queue({'model': 'Job'}).status_code, 400)
+
+    def test_export_files_are_kept_per_database(self):
+        path = tasks.export_path(7)
+        self.assertEqual(os.path.basename(os.path.dirname(path)), 'default')
+        with override_settings(TENANTS={'greenwood': {'hosts': [], 'alias': 'tenant_greenwood'}}), tenancy.use_tenant('greenwood'):
+            self.assertNotEqual(os.path.dirname(tasks.export_path(7)), os.path.dirname(path))
+
+
+@override_settings(THROTTLE_ENABLED=False, ACADEMIC_YEAR_START_MONTH=4)
+class ArchiveTests(TestCase):
+    def setUp(self):
+        classroom = ClassRoom.objects.create(name='5', section='A')
+        self.student = Student.objects.create(
+            first_name='Asha', last_name='Rao', date_of_birth=date(2014, 5, 1), roll_number='1', classroom=classroom,
+        )
+        self.marks = [Attendance.objects.create(student=self.student, date=date(2020, 6, day)) for day in (1, 2, 3)]
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('teacher', password='x'))
+
+    def test_rows_whose_id_is_taken_stay_in_the_hot_table(self):
+        taken = self.marks[1]
+        ArchivedAttendance.objects.create(id=taken.pk, student=self.student, date=date(2019, 6, 1), academic_year=2019)
+
+        report = archive.archive_year(2020, batch_size=2)
+
+        self.assertEqual(report['moved']['Attendance'], 2)
+        self.assertEqual(report['skipped'], {'Attendance': [taken.pk]})
+        self.assertEqual(list(Attendance.objects.values_list('pk', flat=True)), [taken.pk])
+        self.assertEqual(ArchivedAttendance.objects.get(pk=taken.pk).date, date(2019, 6, 1))
+        self.assertEqual(ArchivedAttendance.objects.filter(academic_year=2020).count(), 2)
+
+    def test_writes_dated_in_an_archived_year_are_refused(self):
+        archive.archive_year(2020)
+        body = {'student': self.student.pk, 'date': '2020-07-01', 'status': 'present'}
+        self.assertEqual(self.client.post('/api/attendance/', body).status_code, 403)
+        self.assertEqual(self.client.post('/api/attendance/?academic_year=2021', body).status_code, 403)
+        self.assertEqual(self.client.post('/api/attendance/', {**body, 'date': '2021-07-01'}).status_code, 201)
+
+        mark = Attendance.objects.get(date=date(2021, 7, 1))
+        response = self.client.patch(f'/api/attendance/{mark.pk}/', {'date': '2020-07-02'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_installments_dated_in_an_archived_year_are_refused(self):
+        archive.archive_year(2020)
+        payment = Payment.objects.create(student=self.student, fee_type='tuition', total_fee=Decimal('1000'),
+                                         balance=Decimal('1000'), payment_date=date(2021, 6, 1))
+        url = f'/api/payments/{payment.pk}/apply_payment/'
+
+        self.assertEqual(self.client.post(url, {'amount': '100', 'payment_date': '2020-12-01'}).status_code, 403)
+        self.assertEqual(self.client.post(url, {'amount': '100'}).status_code, 200)
+
+    def test_tenant_year_is_archived_on_the_tenant_database(self):
+        schools = {'oakridge': {'hosts': ['oakridge.test'], 'alias': 'tenant_oakridge'}}
+        with override_settings(TENANTS=schools), extra_database('tenant_oakridge') as school, \
+                tenancy.use_tenant('oakridge'):
+            classroom = ClassRoom.objects.create(name='5', section='A')
+            student = Student.objects.create(first_name='Ravi', last_name='Kumar', date_of_birth=date(2014, 5, 1),
+                                             roll_number='1', classroom=classroom)
+            for day in (date(2020, 6, 1), date(2020, 6, 2), date(2021, 6, 1)):
+                Attendance.objects.create(student=student, date=day)
+            statements = []
+
+            def watch(execute, sql, params, many, context):
+                if sql != 'BEGIN':
+                    statements.append(context['connection'].in_atomic_block)
+                return execute(sql, params, many, context)
+
+            with school.execute_wrapper(watch):
+                moved, _ = archive.archive_model_year(Attendance, 2020)
+            report = archive.archive_year(2020)
+
+            # Selecting, copying and deleting a batch all happen in one transaction on the tenant's database
+            self.assertEqual(moved, 2)
+            self.assertTrue(statements and all(statements))
+            self.assertEqual(report['hot_tables']['Attendance']['rows'], 1)
+            self.assertEqual(ArchivedAttendance.objects.count(), 2)
+        # The default database's own rows for that year are untouched
+        self.assertEqual(Attendance.objects.count(), 3)
+        self.assertFalse(ArchivedAttendance.objects.exists())
+
+
+def throttle_rates(**rates):
+    """Settings overrides for tests that need the real throttle with the given rates."""
+    return override_settings(
+        THROTTLE_ENABLED=True,
+        THROTTLE_DB=os.path.join(tempfile.mkdtemp(), 'throttle.sqlite3'),
+        REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates},
+    )
+
+
+class BatchThrottleTests(TestCase):
+    def setUp(self):
+        ClassRoom.objects.create(name='5', section='A')
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('office', password='x', is_staff=True))
+
+    def batch(self, *operations):
+        return self.client.post('/api/batch/', {'operations': list(operations)}, format='json')
+
+    def test_operations_spend_their_own_scope(self):
+        with throttle_rates(list='2/min', bulk='100/min'):
+            listing = {'method': 'GET', 'path': 'classrooms/'}
+            self.assertEqual(self.batch(listing, listing).status_code, 200)
+            self.assertEqual(self.client.get('/api/classrooms/').status_code, 429)
+
+    def test_batch_is_refused_when_any_scope_is_empty(self):
+        with throttle_rates(export='2/min', bulk='4/min'):
+            job = {'method': 'POST', 'path': 'jobs/', 'body': {'kind': 'export_csv', 'payload': {'model': 'Student'}}}
+            listing = {'method': 'GET', 'path': 'classrooms/'}
+            self.assertEqual(self.batch(job, job).status_code, 200)
+            self.assertEqual(self.batch(listing, job).status_code, 429)
+            # The refused batch took nothing from the bulk bucket
+            self.assertEqual(self.batch(listing, listing).status_code, 200)
+            self.assertEqual(self.batch(listing).status_code, 429)
+
+
+@override_settings(THROTTLE_ENABLED=False, BATCH_MAX_OPERATIONS=5)
+class BatchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('office', password='x', is_staff=True))
+
+    def batch(self, *operations, client=None):
+        return (client or self.client).post('/api/batch/', {'operations': list(operations)}, format='json')
+
+    def student(self, first_name, roll, classroom):
+        return {'method': 'POST', 'path': 'students/', 'body': {
+            'first_name': first_name, 'last_name': 'Rao', 'date_of_birth': '2014-05-01', 'roll_number': roll,
+            'classroom': classroom,
+        }}
+
+    def test_references_resolve_to_created_objects(self):
+        response = self.batch(
+            {'id': 'cls', 'method': 'POST', 'path': 'classrooms/', 'body': {'name': '5', 'section': 'B'}},
+            self.student('Asha', '1', '$cls.id'),
+            self.student('Ravi', '2', '$0.id'),
+            {'method': 'GET', 'path': 'students/$1.id/'},
+        )
+
+        self.assertEqual(response.status_code, 200, response.data)
+        classroom, first, second, fetched = (result['body'] for result in response.data['results'])
+        self.assertEqual([result['status'] for result in response.data['results']], [201, 201, 201, 200])
+        self.assertIs(type(first['classroom']), int)
+        self.assertEqual((first['classroom'], second['classroom']), (classroom['id'], classroom['id']))
+        self.assertEqual(fetched['id'], first['id'])
+        self.assertEqual(Student.objects.filter(classroom_id=classroom['id']).count(), 2)
+
+    def test_a_failed_operation_rolls_back_earlier_creates(self):
+        response = self.batch(
+            {'id': 'cls', 'method': 'POST', 'path': 'classrooms/', 'body': {'name': '5', 'section': 'B'}},
+            self.student('Asha', '1', '$cls.id'),
+            # Same roll number in the same class
+            self.student('Ravi', '1', '$cls.id'),
+        )
+
+        self.assertEqual((response.status_code, response.data['failed_index']), (400, 2))
+        self.assertEqual([result['status'] for result in response.data['results']], [201, 201, 400])
+        self.assertFalse(ClassRoom.objects.exists())
+        self.assertFalse(Student.objects.exists())
+
+    def test_errors_are_reported_against_their_operation(self):
+        teacher = APIClient()
+        teacher.force_authenticate(User.objects.create_user('teacher', password='x'))
+        listing = {'method': 'GET', 'path': 'classrooms/'}
+
+        forbidden = self.batch(listing, {'method': 'POST', 'path': 'classrooms/', 'body': {'name': '5', 'section': 'B'}},
+                               client=teacher)
+        invalid = self.batch(listing, listing, {'method': 'POST', 'path': 'students/', 'body': {'first_name': 'Asha'}})
+
+        self.assertEqual((forbidden.data['failed_index'], forbidden.data['results'][1]['status']), (1, 403))
+        self.assertEqual((invalid.data['failed_index'], invalid.data['results'][2]['status']), (2, 400))
+        self.assertIn('last_name', invalid.data['results'][2]['body'])
+
+    def test_nested_and_oversized_batches_are_refused(self):
+        nested = self.batch({'method': 'POST', 'path': 'batch/', 'body': {'operations': []}})
+        oversized = self.batch(*[{'method': 'GET', 'path': 'classrooms/'}] * 6)
+
+        self.assertEqual((nested.status_code, nested.data['failed_index']), (400, 0))
+        self.assertIn('cannot be nested', nested.data['detail'])
+        self.assertEqual(oversized.status_code, 400)
+        self.assertIn('At most 5 operations', oversized.data['detail'])
+
+
+@override_settings(METRICS_TOKEN='scrape-me', METRICS_ALLOWED_IPS=['127.0.0.1'])
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.enterContext(override_settings(METRICS_DIR=self.directory))
+
+    def get(self, **extra):
+        return self.client.get('/metrics', **extra).status_code
+
+    def test_only_direct_local_requests_or_the_token_get_in(self):
+        self.assertEqual(self.get(REMOTE_ADDR='127.0.0.1'), 200)
+        self.assertEqual(self.get(REMOTE_ADDR='10.0.0.5'), 403)
+        # Behind the proxy every request comes from its address
+        self.assertEqual(self.get(REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR='203.0.113.9'), 403)
+        self.assertEqual(self.get(REMOTE_ADDR='10.0.0.5', HTTP_X_FORWARDED_FOR='203.0.113.9',
+                                  HTTP_AUTHORIZATION='Bearer scrape-me'), 200)
+        self.assertEqual(self.get(REMOTE_ADDR='10.0.0.5', HTTP_AUTHORIZATION='Bearer guess'), 403)
+
+    def test_dead_workers_are_folded_into_the_retired_totals(self):
+        finished = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+        dead = int(finished.stdout)
+        labels = [['action', 'list'], ['status', '200'], ['viewset', 'StudentViewSet']]
+        for _ in range(2):
+            with open(os.path.join(self.directory, f'worker-{dead}.json'), 'w') as fh:
+                json.dump({'pid': dead, 'started': 0, 'histograms': [],
+                           'counters': [['core_http_requests_total', labels, 3],
+                                        ['core_worker_busy_seconds_total', [['pid', str(dead)]], 1.5]]}, fh)
+            counters, _, _ = metrics.collect()
+
+        self.assertEqual(os.listdir(self.directory).count(f'worker-{dead}.json'), 0)
+        self.assertEqual(counters[('core_http_requests_total', tuple(map(tuple, labels)))], 6)
+        self.assertNotIn(('core_worker_busy_seconds_total', (('pid', str(dead)),)), counters)
+
+
+@override_settings(THROTTLE_ENABLED=False, CHANGES_SETTLE_SECONDS=10)
+class LateCommitTests(TestCase):
+    """A transaction that commits a lower change-log id after a higher one is visible."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('teacher', password='x'))
+        ClassRoom.objects.create(name='1', section='A')
+        ChangeLog.objects.update(created_at=timezone.now() - timedelta(minutes=1))
+        self.settled = ChangeLog.objects.get().pk
+        self.late = ClassRoom.objects.create(name='2', section='A')
+        ClassRoom.objects.create(name='3', section='A')
+        # Not committed yet as far as readers are concerned
+        self.late_entry = ChangeLog.objects.get(model='classroom', object_id=self.late.pk)
+        ChangeLog.objects.filter(pk=self.late_entry.pk).delete()
+
+    def test_sync_token_stays_behind_recent_entries(self):
+        response = self.client.get('/api/classrooms/changes/', {'since': 0})
+        self.assertEqual(response.data['token'], self.settled)
+        self.assertEqual(self.client.get('/api/classrooms/')['X-Change-Token'], str(self.settled))
+
+        self.late_entry.save(force_insert=True)
+        response = self.client.get('/api/classrooms/changes/', {'since': response.data['token']})
+        self.assertIn(self.late.pk, [row['id'] for row in response.data['results']])
+
+    def test_event_feed_picks_up_late_entries(self):
+        student = Student.objects.create(first_name='Asha', last_name='Rao', date_of_birth=date(2014, 5, 1),
+                                         roll_number='1', classroom=self.late)
+        student_entry = ChangeLog.objects.get(model='student')
+        passed = ChangeLog.objects.create(model='student', object_id=student.pk, action='save')
+        ChangeLog.objects.filter(pk=student_entry.pk).delete()
+
+        feed = events.Feed('default')
+        feed.floor, feed.seen = self.settled, {passed.pk: time.monotonic()}
+        self.assertEqual(events._late_entries('default', feed.floor, passed.pk, feed.seen), [])
+        student_entry.save(force_insert=True)
+        late = events._late_entries('default', feed.floor, passed.pk, feed.seen)
+        self.assertEqual([entry['id'] for entry in late], [student_entry.pk])
+
+        with override_settings(CHANGES_SETTLE_SECONDS=0):
+            feed._settle(time.monotonic())
+        self.assertEqual((feed.floor, feed.seen), (passed.pk, {}))
+
+
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'slow.jsonl')
+
+    def run_query(self, sql):
+        # Every query counts as slow, on this connection only
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=0.000001, SLOW_QUERY_LOG=self.path), \
+                connection.execute_wrapper(slow_queries.SlowQueryLogger(connection)), connection.cursor() as cursor:
+            cursor.execute(sql)
+
+    def entries(self):
+        with open(self.path) as fh:
+            return [json.loads(line) for line in fh]
+
+    def test_only_successful_queries_are_explained(self):
+        with self.assertRaises(DatabaseError):
+            self.run_query('SELECT * FROM core_no_such_table')
+        self.run_query('SELECT id FROM core_classroom')
+
+        failed, succeeded = self.entries()
+        self.assertEqual((failed['failed'], failed['plan']), (True, None))
+        self.assertFalse(succeeded['failed'])
+        self.assertTrue(succeeded['plan'])
+
+
+LEGACY_DUMP = """-- MySQL dump 10.13
+CREATE TABLE `students` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `roll_number` varchar(20) NOT NULL,
+  `first_name` varchar(50) NOT NULL,
+  `last_name` varchar(50) NOT NULL,
+  `father_name` varchar(100) DEFAULT NULL,
+  `date_of_birth` date NOT NULL,
+  `gender` enum('male','female','other') NOT NULL,
+  `email` varchar(100) DEFAULT NULL,
+  `phone` varchar(15) DEFAULT NULL,
+  `address` text,
+  `classroom_id` int DEFAULT NULL,
+  `admission_date` date NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `roll_number` (`roll_number`),
+  KEY `idx_student_classroom` (`classroom_id`)
+);
+INSERT INTO `students` VALUES (1,'7','Asha','O\\'Brien',NULL,'2014-05-01','female',NULL,NULL,'12, Hill Rd; \\nBlock (B)',1,'2020-04-01'),(2,'8','Ravi','Kumar','Mohan','2013-02-11','male','ravi@example.com',NULL,NULL,2,'2020-04-01'),(3,'9','Noor','Khan',NULL,'2014-01-01','female',NULL,NULL,NULL,NULL,'2020-04-01');
+INSERT INTO `users` (`id`, `username`, `email`, `password`, `first_name`, `last_name`, `role`, `status`) VALUES (1,'head','head@example.com','$2y$10$92IXUNpkjO0rOQ5byMi.Ye4oKoEa3Ro9llC/.og/at2.uheWG/igi','Head','Teacher','admin','active');
+INSERT INTO `classrooms` (`id`, `name`, `section`, `capacity`) VALUES (1,'5','A',30),(2,'6','A',30);
+INSERT INTO `fee_structure` (`id`, `classroom_id`, `fee_type`, `amount`, `frequency`, `academic_year`) VALUES (1,1,'Tuition Fee',5000.00,'yearly','2024-25'),(2,1,'Tuition (late)',100.00,'monthly','2024-25'),(3,2,'Transport Fee',2000.00,'monthly','2024-25');
+INSERT INTO `payments` (`id`, `student_id`, `fee_structure_id`, `total_fee`, `total_paid`, `payment_date`, `due_date`, `payment_method`, `receipt_number`, `notes`) VALUES (1,1,1,5000.00,2000.00,'2024-06-01','2024-06-10','cheque','RC-1',NULL),(2,2,3,2000.00,2000.00,'2024-06-02','2024-06-10','card','RC-1','paid in full'),(3,3,1,5000.00,0.00,'2024-06-03','2024-06-10','cash',NULL,NULL);
+"""
+
+
+class _Interrupted:
+    """Reads like the wrapped source, but fails after `stop` rows of one table."""
+
+    def __init__(self, reader, table, stop):
+        self.reader, self.table, self.stop = reader, table, stop
+
+    def rows(self, table, after=0):
+        for index, row in enumerate(self.reader.rows(table, after)):
+            if table == self.table and index == self.stop:
+                raise OSError('connection lost')
+            yield row
+
+
+class LegacyImportTests(TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'school.sql.gz')
+        with gzip.open(self.path, 'wt', encoding='utf-8') as fh:
+            fh.write(LEGACY_DUMP)
+
+    def test_import_maps_the_legacy_schema(self):
+        report = legacy.import_legacy(legacy.DumpSource(self.path))
+
+        self.assertEqual(report['classrooms']['created'], 2)
+        self.assertEqual((report['students']['created'], report['students']['skipped']), (2, 1))
+        self.assertEqual((report['fee_structure']['created'], report['fee_structure']['matched']), (2, 1))
+        self.assertEqual((report['payments']['created'], report['payments']['skipped']), (2, 1))
+
+        asha = Student.objects.get(first_name='Asha')
+        self.assertEqual((asha.last_name, asha.address), ("O'Brien", '12, Hill Rd; \nBlock (B)'))
+        self.assertEqual(FeeStructure.objects.get(classroom=asha.classroom).frequency, 'annually')
+        first, second = Payment.objects.order_by('payment_date')
+        self.assertEqual((first.fee_type, first.payment_method, first.balance, first.receipt_number),
+                         ('tuition', 'check', Decimal('3000'), 'RC-1'))
+        self.assertEqual((second.fee_type, second.payment_method, second.receipt_number), ('other', 'credit_card', 'RC-1-2'))
+        head = AdminUser.objects.get(username='head')
+        self.assertEqual(head.role, 'admin')
+        self.assertTrue(head.django_user.password.startswith('bcrypt$$2b$10$'))
+
+    def test_interrupted_import_resumes_without_duplicates(self):
+        with self.assertRaises(OSError):
+            legacy.import_legacy(_Interrupted(legacy.DumpSource(self.path), 'payments', 1), chunk_size=1)
+        self.assertEqual(Payment.objects.count(), 1)
+
+        report = legacy.import_legacy(legacy.DumpSource(self.path), chunk_size=1)
+
+        self.assertEqual(report['students']['already_imported'], 2)
+        self.assertEqual((report['payments']['created'], report['payments']['already_imported']), (1, 1))
+        self.assertEqual(Payment.objects.count(), 2)
+        self.assertEqual(Student.objects.count(), 2)
+        self.assertEqual(LegacyIdMap.objects.filter(table='payments').count(), 2)
+
+
+class DumpRestoreTests(TestCase):
+    def setUp(self):
+        classroom = ClassRoom.objects.create(name='5', section='A')
+        self.student = Student.objects.create(
+            first_name='Asha', last_name='Rao', date_of_birth=date(2014, 5, 1), roll_number='1', classroom=classroom,
+        )
+        self.payment = Payment.objects.create(
+            student=self.student, fee_type='tuition', total_fee=Decimal('10000.50'), total_paid=Decimal('2500'),
+            balance=Decimal('7500.50'), payment_date=date(2026, 4, 1), receipt_number='RCP-1',
+        )
+        self.directory = os.path.join(tempfile.mkdtemp(), 'dump')
+        dumps.dump(self.directory)
+
+    def rows(self):
+        return (
+            list(Student.objects.order_by('pk').values()),
+            list(Payment.objects.order_by('pk').values()),
+            list(ClassRoom.objects.order_by('pk').values()),
+        )
+
+    def test_restore_brings_back_exactly_what_was_dumped(self):
+        before = self.rows()
+        Student.objects.filter(pk=self.student.pk).update(first_name='Changed')
+        Payment.objects.create(student=self.student, fee_type='other', payment_date=date(2026, 5, 1))
+
+        counts = dumps.restore(self.directory, replace=True)
+
+        self.assertEqual(self.rows(), before)
+        self.assertEqual((counts['core.Student'], counts['core.Payment']), (1, 1))
+        self.assertEqual(list(ChangeLog.objects.values_list('model', flat=True)), ['restore'])
+
+    def test_restore_refuses_a_non_empty_database(self):
+        with self.assertRaisesMessage(dumps.DumpError, 'Not empty'):
+            dumps.restore(self.directory)
+
+    def test_corrupt_file_rolls_the_restore_back(self):
+        entry = next(entry for entry in dumps.read_manifest(self.directory)['models'] if entry['model'] == 'core.payment')
+        path = os.path.join(self.directory, entry['file'])
+        with gzip.open(path, 'rb') as fh:
+            content = fh.read()
+        with gzip.open(path, 'wb') as fh:
+            fh.write(content.replace(b'7500.50', b'0.00'))
+        Student.objects.filter(pk=self.student.pk).update(first_name='Kept')
+
+        with self.assertRaisesMessage(dumps.DumpError, 'does not match its checksum'):
+            dumps.verify(self.directory)
+        with self.assertRaisesMessage(dumps.DumpError, 'does not match its checksum'):
+            dumps.restore(self.directory, replace=True)
+
+        self.assertEqual(Student.objects.get().first_name, 'Kept')
+        self.assertEqual(Payment.objects.get().balance, Decimal('7500.50'))
+
+
+@override_settings(THROTTLE_ENABLED=False)
+class PromotionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('office', password='x', is_staff=True))
+        self.five, self.six, self.seven = (ClassRoom.objects.create(name=name, section='A') for name in ('5', '6', '7'))
+        for roll, first, classroom in (('1', 'Asha', self.five), ('2', 'Ravi', self.five), ('1', 'Noor', self.six)):
+            Student.objects.create(first_name=first, last_name='Rao', date_of_birth=date(2014, 5, 1), roll_number=roll,
+                                   classroom=classroom)
+
+    def promote(self, plan, dry_run=False):
+        return self.client.post('/api/students/promote/', {'plan': plan, 'dry_run': dry_run}, format='json')
+
+    def placement(self):
+        return dict(Student.objects.values_list('first_name', 'classroom__name'))
+
+    def test_chained_classes_empty_before_they_fill(self):
+        plan = [{'source': self.five.pk, 'target': self.six.pk}, {'source': self.six.pk, 'target': self.seven.pk}]
+
+        response = self.promote(plan)
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.placement(), {'Asha': '6', 'Ravi': '6', 'Noor': '7'})
+        self.assertEqual(ChangeLog.objects.filter(model='student').count(), 3 + 3)
+
+    def test_cycle_is_refused(self):
+        plan = [{'source': self.five.pk, 'target': self.six.pk}, {'source': self.six.pk, 'target': self.five.pk}]
+
+        with self.assertRaisesMessage(promotion.PlanError, 'form a cycle'):
+            promotion.promote(plan, dry_run=True)
+        response = self.promote(plan)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.placement(), {'Asha': '5', 'Ravi': '5', 'Noor': '6'})
+
+    def test_collisions_are_reported_and_block_the_apply(self):
+        plan = [{'source': self.five.pk, 'target': self.six.pk}]
+        clash = [{'classroom': self.six.pk, 'roll_number': '1', 'students': 2}]
+
+        dry = self.promote(plan, dry_run=True)
+        applied = self.promote(plan)
+
+        self.assertEqual((dry.status_code, dry.data['collisions']), (200, clash))
+        self.assertEqual((applied.status_code, applied.data['collisions']), (409, clash))
+        self.assertEqual(self.placement(), {'Asha': '5', 'Ravi': '5', 'Noor': '6'})
+
+    def test_renumbered_target_gets_fresh_roll_numbers_in_name_order(self):
+        Student.objects.filter(first_name='Noor').update(last_name='Ahmed')
+        plan = [{'source': self.five.pk, 'target': self.six.pk, 'renumber': True}]
+
+        response = self.promote(plan)
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['collisions'], [])
+        self.assertEqual(
+            list(Student.objects.filter(classroom=self.six).order_by('roll_number').values_list('first_name', 'roll_number')),
+            [('Noor', '1'), ('Asha', '2'), ('Ravi', '3')],
+        )
+
+
+class ReconcileTests(TestCase):
+    def setUp(self):
+        classroom = ClassRoom.objects.create(name='5', section='A')
+        self.payments = {}
+        for roll, (first, last, amount, day, method, receipt) in enumerate((
+            ('Asha', 'Rao', '1500', 1, 'bank_transfer', 'R-2026-27-000101'),
+            ('Ravi', 'Kumar', '2000', 3, 'online', 'R-2026-27-000102'),
+            ('Meera', 'Iyer', '2500', 5, 'bank_transfer', ''),
+            ('Ravi', 'Kumar', '2500', 6, 'check', ''),
+            ('Noor', 'Khan', '700', 4, 'bank_transfer', 'R-2026-27-000105'),
+            ('Asha', 'Rao', '900', 2, 'cash', ''),
+        ), 1):
+            student, _ = Student.objects.get_or_create(
+                first_name=first, last_name=last, classroom=classroom,
+                defaults={'date_of_birth': date(2014, 5, 1), 'roll_number': str(roll)},
+            )
+            self.payments[roll] = Payment.objects.create(
+                student=student, fee_type='tuition', amount=Decimal(amount), total_fee=Decimal(amount),
+                total_paid=Decimal(amount), payment_date=date(2026, 6, day), payment_method=method,
+                receipt_number=receipt,
+            ).pk
+
+    def test_each_pass(self):
+        statement = io.StringIO(
+            'Txn Date,Narration,Debit,Credit\n'
+            '01/06/2026,NEFT R-2026-27-000101,,"1,500.00"\n'
+            '01/06/2026,NEFT R-2026-27-000101,,"1,500.00"\n'
+            '04/06/2026,TRANSFER,,2000.00\n'
+            '05/06/2026,FEES MEERA IYERR,,2500.00\n'
+            '05/06/2026,SCHOOL FEES,,2500.00\n'
+            '04/06/2026,ATM WITHDRAWAL,500.00,\n'
+            '04/06/2026,TRANSFER,,2000.00\n'
+            '06/06/2026,CASH DEPOSIT,,900.00\n'
+        )
+        payments = self.payments
+
+        report = reconcile.reconcile(reconcile.read_statement(statement))
+
+        self.assertEqual(
+            [(row['line'], row['payment'], row['by']) for row in report['matched']],
+            [(2, payments[1], 'receipt'), (4, payments[2], 'amount_date'), (5, payments[3], 'fuzzy')],
+        )
+        self.assertEqual(
+            [(row['line'], row['reason'], row['of']) for row in report['duplicates']],
+            [(3, 'payment_already_matched', 2), (8, 'repeats_line', 4)],
+        )
+        self.assertEqual(
+            [(row['line'], row['candidates']) for row in report['unmatched_lines']],
+            [(6, [payments[3], payments[4]]), (9, [])],
+        )
+        # Cash never reaches the bank, so the 900 in cash is not missing from the statement
+        self.assertCountEqual([row['payment'] for row in report['unmatched_payments']], [payments[4], payments[5]])
+        self.assertEqual(report['summary']['lines'], 7)
+
+    def test_unreadable_statements(self):
+        with self.assertRaisesMessage(reconcile.StatementError, 'No credit column'):
+            reconcile.read_statement(io.StringIO('Date,Narration\n2026-06-01,FEES\n'))
+        with self.assertRaisesMessage(reconcile.StatementError, "Line 2: cannot read the date 'June 1st'"):
+            reconcile.read_statement(io.StringIO('Date,Narration,Credit\nJune 1st,FEES,10\n'))
+
+
+@override_settings(THROTTLE_ENABLED=False, DUPLICATE_STUDENT_MIN_SCORE=0.8)
+class DuplicateStudentTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('office', password='x'))
+        self.five = ClassRoom.objects.create(name='5', section='A')
+        six = ClassRoom.objects.create(name='6', section='A')
+
+        def student(first, last, born, roll, classroom, **fields):
+            return Student.objects.create(first_name=first, last_name=last, date_of_birth=born, roll_number=roll,
+                                          classroom=classroom, **fields).pk
+
+        self.asha = student('Asha', 'Rao', date(2014, 5, 1), '1', self.five, father_name='Mohan Rao',
+                            contact_phone='+91 98450 12345')
+        # Names swapped, day and month swapped, phone written differently
+        self.swapped = student('RAO', 'asha', date(2014, 1, 5), '7', six, contact_phone='098450-12345')
+        # Misspelt, found through the father's name
+        self.misspelt = student('Ashaa', 'Rao', date(2014, 5, 1), '2', six, father_name='Mohan  Rao')
+        # Same name, another child: shares no key with the others, so it is never compared
+        self.namesake = student('Asha', 'Rao', date(2015, 9, 9), '3', self.five)
+        student('Ravi', 'Kumar', date(2014, 5, 1), '4', self.five)
+
+    def test_scan_compares_only_students_that_share_a_key(self):
+        report = dedup.find_duplicates()
+
+        self.assertEqual((report['students'], report['compared']), (5, 2))
+        [group] = report['groups']
+        self.assertEqual([row['id'] for row in group['students']], sorted([self.asha, self.swapped, self.misspelt]))
+        self.assertEqual(
+            {tuple(pair['students']): pair['reasons'] for pair in group['pairs']},
+            {(self.asha, self.swapped): ['same name', 'similar date of birth', 'same contact phone'],
+             (self.asha, self.misspelt): ['similar name', 'same date of birth', 'same father name']},
+        )
+
+    def test_scan_reports_progress(self):
+        calls = []
+        with mock.patch.object(dedup, 'PROGRESS_EVERY', 2):
+            report = dedup.find_duplicates(progress=lambda *args: calls.append(args))
+
+        self.assertEqual([call for call in calls if call[0] == 'students'],
+                         [('students', 2, None), ('students', 4, None), ('students', 5, 5)])
+        blocks = [call for call in calls if call[0] == 'blocks']
+        self.assertEqual(blocks[-1], ('blocks', report['blocks'], report['blocks']))
+        self.assertEqual([done for _, done, _ in blocks], sorted({*range(2, report['blocks'] + 1, 2), report['blocks']}))
+
+    def test_create_refuses_a_likely_duplicate(self):
+        payload = {'first_name': 'asha', 'last_name': 'RAO', 'date_of_birth': '2014-05-01', 'roll_number': '9',
+                   'classroom': self.five.pk}
+
+        refused = self.client.post('/api/students/', payload, format='json')
+        checked = self.client.post('/api/students/check_duplicates/', payload, format='json')
+        saved = self.client.post('/api/students/', {**payload, 'allow_duplicate': True}, format='json')
+
+        self.assertEqual(refused.status_code, 409)
+        self.assertEqual(refused.data['duplicates'][0], {
+            'id': self.asha, 'first_name': 'Asha', 'last_name': 'Rao', 'date_of_birth': '2014-05-01', 'roll_number': '1',
+            'classroom': self.five.pk, 'score': 1.0, 'reasons': ['same name', 'same date of birth'],
+        })
+        self.assertNotIn(self.namesake, [row['id'] for row in refused.data['duplicates']])
+        self.assertEqual(checked.data['duplicates'], refused.data['duplicates'])
+        self.assertEqual(saved.status_code, 201)
+
+    def test_one_mistyped_date_part_alone_is_not_enough(self):
+        payload = {'first_name': 'Asha', 'last_name': 'Rao', 'date_of_birth': '2014-05-02', 'roll_number': '9',
+                   'classroom': self.five.pk}
+
+        self.assertEqual(self.client.post('/api/students/', payload, format='json').status_code, 201)
+
+
+@override_settings(THROTTLE_ENABLED=False)
+class StudentProfileTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('teacher', password='x'))
+        classroom = ClassRoom.objects.create(name='5', section='A')
+        self.student, self.other = (
+            Student.objects.create(first_name=first, last_name='Rao', date_of_birth=date(2014, 5, 1), roll_number=roll,
+                                   classroom=classroom)
+            for first, roll in (('Asha', '1'), ('Ravi', '2'))
+        )
+        self.url = f'/api/students/{self.student.pk}/profile/'
+
+    def add_history(self, days, start=0):
+        today = timezone.localdate()
+        for day in range(start, start + days):
+            Attendance.objects.create(student=self.student, date=today - timedelta(days=day + 1),
+                                      status='late' if day % 4 else 'present')
+            Grade.objects.create(student=self.student, subject=f'Subject {day}', term=f'Term {day % 2 + 1}',
+                                 score=Decimal('70'))
+            Payment.objects.create(student=self.student, fee_type='tuition', total_fee=Decimal('1000'),
+                                   balance=Decimal('250'), payment_date=today, due_date=today - timedelta(days=day))
+
+    def test_query_count_does_not_grow_with_history(self):
+        self.add_history(3)
+        with self.assertNumQueries(6):
+            small = profiles.build(self.student.pk, timezone.localdate())
+        self.add_history(25, start=3)
+        with self.assertNumQueries(6):
+            large = profiles.build(self.student.pk, timezone.localdate())
+
+        self.assertEqual((small['attendance']['marked'], len(small['fees']['outstanding'])), (3, 3))
+        self.assertEqual(len(large['attendance']['recent']), profiles.RECENT_ATTENDANCE)
+        self.assertEqual([term['term'] for term in large['grades']], ['Term 1', 'Term 2'])
+
+    def test_cached_until_the_student_changes(self):
+        self.add_history(5)
+        with self.assertNumQueries(7):
+            first = self.client.get(self.url)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url).data, first.data)
+
+        Grade.objects.create(student=self.other, subject='Maths', term='Term 1', score=Decimal('90'))
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+        Grade.objects.create(student=self.student, subject='Maths', term='Term 3', score=Decimal('90'))
+        with self.assertNumQueries(7):
+            fresh = self.client.get(self.url)
+        self.assertEqual(fresh.data['grades'][-1]['term'], 'Term 3')
+        self.assertEqual(self.client.get('/api/students/999999/profile/').status_code, 404)
+
+
+@override_settings(THROTTLE_ENABLED=False)
+class FacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('teacher', password='x'))
+        self.five = ClassRoom.objects.create(name='5', section='A')
+        self.six = ClassRoom.objects.create(name='6', section='B')
+        asha, ravi = (
+            Student.objects.create(first_name=first, last_name='Rao', date_of_birth=date(2014, 5, 1), roll_number='1',
+                                   classroom=classroom)
+            for first, classroom in (('Asha', self.five), ('Ravi', self.six))
+        )
+        for student, fee_type, method, day in ((asha, 'tuition', 'cash', date(2026, 9, 10)),
+                                               (asha, 'other', 'online', date(2026, 10, 3)),
+                                               (ravi, 'tuition', 'cash', date(2026, 10, 4))):
+            Payment.objects.create(student=student, fee_type=fee_type, payment_method=method, payment_date=day)
+        for student, status, day in ((asha, 'present', date(2026, 9, 15)), (asha, 'absent', date(2026, 10, 1)),
+                                     (ravi, 'present', date(2026, 10, 2))):
+            Attendance.objects.create(student=student, status=status, date=day)
+
+    def get(self, query):
+        response = self.client.get(f'/api/facets/?{query}')
+        self.assertEqual(response.status_code, 200, response.data)
+        return {name: [(row['value'], row['count']) for row in values] for name, values in response.data.items()}
+
+    def test_a_filter_does_not_narrow_its_own_facet(self):
+        data = self.get('only=fee_type,month,payment_method&fee_type=tuition')
+
+        self.assertEqual(data, {
+            'fee_type': [('other', 1), ('tuition', 2)],
+            'month': [('2026-10', 1), ('2026-09', 1)],
+            'payment_method': [('cash', 2)],
+        })
+
+    def test_month_filters_payments_and_attendance(self):
+        data = self.get(f'only=month,status,fee_type,classroom&month=2026-10&classroom={self.five.pk}')
+
+        self.assertEqual(data, {
+            'month': [('2026-10', 1), ('2026-09', 1)],
+            'status': [('absent', 1)],
+            'fee_type': [('other', 1)],
+            'classroom': [(self.five.pk, 1), (self.six.pk, 1)],
+        })
+
+    def test_bad_parameters(self):
+        self.assertIn('month', self.client.get('/api/facets/?month=2026-13').data)
+        self.assertIn('only', self.client.get('/api/facets/?only=colour').data)
+        self.assertIn('classroom', self.client.get('/api/facets/?classroom=five').data)
+
+
+class _FailingBackend(EmailBackend):
+    """The locmem backend, refusing to go on after `limit` messages."""
+
+    def __init__(self, limit, **kwargs):
+        super().__init__(**kwargs)
+        self.limit = limit
+
+    def send_messages(self, messages):
+        if len(mail.outbox) >= self.limit:
+            raise ConnectionError('SMTP server went away')
+        return super().send_messages(messages)
+
+
+class FeeReminderTests(TestCase):
+    today = date(2026, 10, 19)
+
+    def setUp(self):
+        classroom = ClassRoom.objects.create(name='5', section='A')
+        self.emails = []
+        for roll, first in enumerate(('Asha', 'Ravi', 'Noor', 'Meera', 'Kabir', 'Zoya'), 1):
+            email = '' if first == 'Kabir' else f'{first.lower()}@example.com'
+            student = Student.objects.create(
+                first_name=first, last_name='Rao', date_of_birth=date(2014, 5, 1), roll_number=str(roll),
+                classroom=classroom, contact_email=email,
+            )
+            for due in (date(2026, 9, 1), date(2026, 10, 1)):
+                Payment.objects.create(student=student, fee_type='tuition', total_fee=Decimal('500'),
+                                       balance=Decimal('500'), payment_date=due, due_date=due)
+            if email:
+                self.emails.append(email)
+        # Paid up, or not due yet: no reminder
+        paid = Student.objects.create(first_name='Ira', last_name='Das', date_of_birth=date(2014, 5, 1), roll_number='9',
+                                      classroom=classroom, contact_email='ira@example.com')
+        Payment.objects.create(student=paid, fee_type='tuition', total_fee=Decimal('500'), total_paid=Decimal('500'),
+                               payment_date=date(2026, 9, 1), due_date=date(2026, 9, 1))
+        Payment.objects.create(student=paid, fee_type='other', total_fee=Decimal('50'), balance=Decimal('50'),
+                               payment_date=date(2026, 10, 1), due_date=date(2026, 11, 1))
+
+    def send(self, **kwargs):
+        return reminders.send_reminders(today=self.today, batch_size=2, rate=0, **kwargs)
+
+    def test_one_message_per_student_per_period(self):
+        report = self.send()
+        again = self.send()
+
+        self.assertEqual((report['eligible'], report['sent']), (5, 5))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), sorted(self.emails))
+        self.assertIn('₹1000.00 overdue', mail.outbox[0].subject)
+        self.assertEqual(set(ReminderLog.objects.values_list('period', 'payments')), {('2026-10', 2)})
+        self.assertEqual((again['eligible'], again['sent']), (0, 0))
+        self.assertEqual(len(mail.outbox), 5)
+        # A new period starts over
+        self.assertEqual(self.send(period='2026-11')['sent'], 5)
+
+    def test_failed_send_keeps_the_log_and_the_next_run_resumes(self):
+        with self.assertRaises(ConnectionError):
+            reminders.send_reminders(today=self.today, batch_size=3, rate=0, connection=_FailingBackend(limit=2))
+
+        # The page's first two messages went out before the third failed
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(sorted(ReminderLog.objects.values_list('email', flat=True)),
+                         sorted(message.to[0] for message in mail.outbox))
+        report = self.send()
+
+        self.assertEqual((report['eligible'], report['sent']), (3, 3))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), sorted(self.emails))
+
+    def test_sends_are_paced(self):
+        clock = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            clock[0] += seconds
+
+        with mock.patch.object(reminders.time, 'monotonic', lambda: clock[0]), \
+                mock.patch.object(reminders.time, 'sleep', sleep):
+            reminders.send_reminders(today=self.today, batch_size=2, rate=30)
+
+        self.assertEqual(sleeps, [2.0] * 4)
+
+
+class SqliteBackupTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, 'school.sqlite3')
+        with closing(sqlite3.connect(self.source)) as db, db:
+            db.execute('CREATE TABLE marks (id INTEGER PRIMARY KEY, note TEXT)')
+            db.executemany('INSERT INTO marks (note) VALUES (?)', [('x' * 200,)] * 2000)
+        self.enterContext(mock.patch.dict(settings.DATABASES, {
+            'school': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': self.source},
+        }))
+        self.snapshots = os.path.join(self.directory, 'snapshots')
+
+    def marks(self, path):
+        with closing(sqlite3.connect(path)) as db:
+            return db.execute('SELECT COUNT(*) FROM marks').fetchone()[0]
+
+    def test_snapshot_is_a_complete_checked_copy(self):
+        report = backups.backup('school', self.snapshots, pages=8, pause=0, keep=3)
+
+        self.assertGreater(report['steps'], 1)
+        self.assertFalse(report['finished_in_one_step'])
+        self.assertEqual(self.marks(report['file']), 2000)
+        with closing(sqlite3.connect(report['file'])) as db:
+            self.assertEqual(db.execute('PRAGMA integrity_check').fetchall(), [('ok',)])
+        self.assertEqual(os.listdir(self.snapshots), [os.path.basename(report['file'])])
+
+    def test_rotation_keeps_the_newest(self):
+        files = [backups.backup('school', self.snapshots, pages=-1, pause=0, keep=3)['file'] for _ in range(5)]
+
+        self.assertEqual(len(set(files)), 5)
+        self.assertEqual(sorted(os.listdir(self.snapshots)), [os.path.basename(path) for path in files[-3:]])
+
+    def test_busy_database_is_finished_in_one_step(self):
+        writer = sqlite3.connect(self.source)
+        self.addCleanup(writer.close)
+
+        def write_instead_of_sleeping(seconds):
+            # Every write between steps makes SQLite start the copy over
+            with writer:
+                writer.execute('INSERT INTO marks (note) VALUES (?)', ('late',))
+
+        with mock.patch.object(backups.time, 'sleep', write_instead_of_sleeping):
+            report = backups.backup('school', self.snapshots, pages=8, pause=0.01, keep=3)
+
+        self.assertTrue(report['finished_in_one_step'])
+        self.assertGreater(report['restarts'], backups.MAX_RESTARTS)
+        self.assertEqual(self.marks(report['file']), self.marks(self.source))
+
+
+@override_settings(THROTTLE_ENABLED=False)
+class DashboardSummaryTests(TestCase):
+    today = date(2026, 10, 19)
+
+    def setUp(self):
+        cache.clear()
+        self.classroom = ClassRoom.objects.create(name='5', section='A')
+        ClassRoom.objects.create(name='6', section='A')
+        self.students = [
+            Student.objects.create(first_name=first, last_name='Rao', date_of_birth=date(2014, 5, 1), roll_number=str(roll),
+                                   classroom=self.classroom)
+            for roll, first in enumerate(('Asha', 'Ravi', 'Noor'), 1)
+        ]
+
+    def pay(self, student, paid, balance, day, due=None):
+        return Payment.objects.create(student=student, fee_type='tuition', total_fee=Decimal(paid) + Decimal(balance),
+                                      total_paid=Decimal(paid), balance=Decimal(balance), payment_date=day, due_date=due)
+
+    def fixture(self):
+        asha, ravi, noor = self.students
+        self.pay(asha, '1000', '0', date(2026, 10, 2))
+        self.pay(ravi, '500', '300', date(2026, 10, 19), due=date(2026, 10, 10))
+        self.pay(noor, '200', '800', date(2026, 9, 20), due=date(2026, 9, 30))
+        # Last month's payment doesn't count towards this month
+        self.pay(asha, '50', '0', date(2026, 9, 30))
+        for student, status in zip(self.students, ('present', 'late', 'absent')):
+            Attendance.objects.create(student=student, date=self.today, status=status)
+        Attendance.objects.create(student=asha, date=self.today - timedelta(days=1), status='absent')
+
+    def test_figures(self):
+        self.fixture()
+
+        data = dashboard.summary(self.today)
+
+        self.assertEqual((data['students_total'], data['classrooms']), (3, 2))
+        self.assertEqual(data['payments_this_month'], {'count': 2, 'total': '1500.00'})
+        self.assertEqual((data['overdue']['count'], data['overdue']['amount']), (2, '1100.00'))
+        self.assertEqual([row['balance'] for row in data['overdue']['payments']], ['800.00', '300.00'])
+        self.assertEqual(data['attendance_today'], {'marked': 3, 'present': 2, 'rate': 66.7})
+        self.assertEqual(len(data['latest_payments']), 4)
+
+    def test_query_count_is_fixed(self):
+        with self.assertNumQueries(6):
+            dashboard.summary(self.today)
+        self.fixture()
+        for day in range(1, 19):
+            self.pay(self.students[day % 3], '10', '5', date(2026, 10, day), due=date(2026, 10, day))
+        with self.assertNumQueries(6):
+            dashboard.summary(self.today)
+
+    def test_a_write_refreshes_the_cached_summary(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('teacher', password='x'))
+        first = client.get('/api/dashboard/summary/').data
+        with self.assertNumQueries(1):
+            self.assertEqual(client.get('/api/dashboard/summary/').data, first)
+
+        self.pay(self.students[0], '250', '0', timezone.localdate())
+
+        fresh = client.get('/api/dashboard/summary/').data
+        self.assertEqual(fresh['payments_this_month']['count'], first['payments_this_month']['count'] + 1)
+        self.assertEqual(fresh['latest_payments'][0]['total_paid'], '250.00')
+
+
+@override_settings(THROTTLE_ENABLED=False, DATABASE_REPLICA_PIN_SECONDS=7)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.enterContext(extra_database('replica1'))
+        self.enterContext(override_settings(DATABASE_REPLICAS=['replica1']))
+        ClassRoom.objects.create(name='5', section='A')
+        # The replica is a separate file that has not caught up yet
+        ClassRoom.objects.using('replica1').create(name='5', section='A (replica)')
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('office', password='x', is_staff=True))
+
+    def sections(self, client=None, **headers):
+        return sorted(row['section'] for row in (client or self.client).get('/api/classrooms/', **headers).data)
+
+    def test_reads_go_to_the_replica_until_a_write_pins_the_client(self):
+        self.assertEqual(self.sections(), ['A (replica)'])
+
+        response = self.client.post('/api/classrooms/', {'name': '6', 'section': 'A'}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.cookies['db_pin']['max-age'], 7)
+        self.assertEqual(response['X-DB-Pin'], '7')
+        # The cookie comes back with the next request, which then reads the primary
+        self.assertEqual(self.sections(), ['A', 'A'])
+
+        # Once it expires, reads go back to the replica
+        del self.client.cookies['db_pin']
+        self.assertEqual(self.sections(), ['A (replica)'])
+
+    def test_header_pins_clients_that_do_not_send_the_cookie(self):
+        self.assertEqual(self.sections(HTTP_X_DB_PIN='1'), ['A'])
+
+    def test_failed_write_does_not_pin(self):
+        response = self.client.post('/api/classrooms/', {'name': ''}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('db_pin', response.cookies)
+        self.assertEqual(self.sections(), ['A (replica)'])
+
+
+@override_settings(THROTTLE_ENABLED=False, PERFORMANCE_SAMPLE_RATE=1.0)
+class ServerTimingTests(TestCase):
+    def test_sampled_request_gets_a_header_and_a_log_line(self):
+        classroom = ClassRoom.objects.create(name='5', section='A')
+        for roll in ('1', '2'):
+            Student.objects.create(first_name=f'Asha {roll}', last_name='Rao', date_of_birth=date(2014, 5, 1),
+                                   roll_number=roll, classroom=classroom)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('teacher', password='x'))
+
+        with CaptureQueriesContext(connection) as queries, self.assertLogs('core.performance', 'INFO') as logs:
+            response = client.get('/api/students/')
+
+        self.assertEqual(response.status_code, 200)
+        timing = dict(entry.split(';', 1) for entry in response['Server-Timing'].split(', '))
+        self.assertEqual(list(timing), ['db', 'serialize', 'render', 'app', 'total'])
+        self.assertRegex(timing['db'], rf'^dur=\d+\.\d\d;desc="{len(queries)} queries"$')
+        self.assertRegex(timing['app'], r'^dur=\d+\.\d\d$')
+        [record] = logs.records
+        self.assertEqual(
+            (record.method, record.path, record.status, record.viewset, record.action, record.db_queries),
+            ('GET', '/api/students/', 200, 'StudentViewSet', 'list', len(queries)),
+        )
+        self.assertGreaterEqual(record.total_ms, record.db_ms)
+
+
+@override_settings(ADMIN_EXACT_COUNT_LIMIT=3)
+class LargeTableAdminTests(TestCase):
+    url = '/admin/core/student/'
+
+    def setUp(self):
+        classroom = ClassRoom.objects.create(name='5', section='A')
+        for roll, first in enumerate(('Asha', 'Ravi', 'Noor', 'Meera', 'Kabir'), 1):
+            Student.objects.create(first_name=first, last_name='Rao', date_of_birth=date(2014, 5, 1),
+                                   roll_number=str(roll), classroom=classroom)
+        self.classroom = classroom
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+
+    def changelist(self, query=''):
+        with mock.patch('core.admin.estimated_row_count', return_value=1200) as estimate, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'{self.url}{query}')
+        self.assertEqual(response.status_code, 200)
+        counts = [q['sql'] for q in queries if 'COUNT(' in q['sql'] and 'core_student' in q['sql']]
+        return response, estimate, counts
+
+    def test_unfiltered_list_uses_the_estimate(self):
+        response, estimate, counts = self.changelist()
+
+        estimate.assert_called_once_with(Student, 'default')
+        self.assertEqual(counts, [])
+        self.assertContains(response, '1200 students')
+
+    def test_filtered_lists_count_exactly(self):
+        for query in ('?q=Asha', f'?classroom__id__exact={self.classroom.pk}'):
+            response, estimate, counts = self.changelist(query)
+
+            estimate.assert_not_called()
+            self.assertEqual(len(counts), 1)
+            self.assertContains(response, '1 student' if query == '?q=Asha' else '5 students')
+
+
+class GenerateSchoolTests(TestCase):
+    options = {'classrooms': 2, 'students_per_class': 3, 'days': 14, 'start_date': date(2024, 1, 1), 'seed': 7}
+
+    def generate(self, **options):
+        call_command('generate_school', **{**self.options, **options}, stdout=io.StringIO())
+
+    def snapshot(self):
+        by_student = ('student__classroom__name', 'student__classroom__section', 'student__roll_number')
+        return {
+            'students': list(Student.objects.order_by('classroom__name', 'classroom__section', 'roll_number').values_list(
+                'classroom__name', 'classroom__section', 'roll_number', 'first_name', 'last_name', 'date_of_birth',
+                'contact_phone')),
+            'attendance': list(Attendance.objects.order_by(*by_student, 'date').values_list('date', 'status')),
+            'grades': list(Grade.objects.order_by(*by_student, 'subject', 'term').values_list('subject', 'term', 'score')),
+            'payments': list(Payment.objects.order_by(*by_student, 'due_date').values_list(
+                'amount', 'balance', 'payment_date', 'payment_method')),
+        }
+
+    def test_small_school_has_the_expected_rows(self):
+        self.generate()
+
+        self.assertEqual(ClassRoom.objects.count(), 2)
+        self.assertEqual(FeeStructure.objects.count(), 2 * 3)
+        self.assertEqual(Student.objects.count(), 2 * 3)
+        # 2024-01-01 is a Monday: 14 days hold 10 school days
+        self.assertEqual(Attendance.objects.count(), 6 * 10)
+        self.assertEqual(Grade.objects.count(), 6 * 6 * 3)
+        self.assertEqual(Payment.objects.count(), 6)
+
+    def test_the_same_seed_generates_the_same_school(self):
+        self.generate()
+        first = self.snapshot()
+        self.generate(clear=True)
+        self.assertEqual(self.snapshot(), first)
+
+        self.generate(clear=True, seed=8)
+        self.assertNotEqual(self.snapshot(), first)
+
+
+@override_settings(ALLOWED_HOSTS=['localhost'])
+class BenchmarkEndpointsTests(TestCase):
+    def setUp(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        classroom = ClassRoom.objects.create(name='5', section='A')
+        Student.objects.create(first_name='Asha', last_name='Rao', date_of_birth=date(2014, 5, 1),
+                               roll_number='1', classroom=classroom)
+
+    def test_one_iteration_report(self):
+        out = io.StringIO()
+        call_command('benchmark_endpoints', iterations=1, warmup=0, only=['student', 'dashboard'], stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(set(report), {'generated_at', 'django', 'database', 'iterations', 'changes_since', 'row_counts', 'routes'})
+        self.assertEqual(report['iterations'], 1)
+        self.assertEqual(report['row_counts']['Student'], 1)
+        self.assertIn('student-list', report['routes'])
+        self.assertIn('student-detail', report['routes'])
+        self.assertTrue(any(name.startswith('dashboard') for name in report['routes']))
+        for name, route in report['routes'].items():
+            self.assertEqual(route['status'], [200], name)
+            self.assertEqual(set(route), {'url', 'status', 'latency_ms', 'queries', 'response_bytes'})
+            self.assertEqual(set(route['latency_ms']), {'min', 'p50', 'p90', 'p95', 'p99', 'max', 'mean'})
+            self.assertGreater(route['queries'], 0)
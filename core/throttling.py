@@ -0,0 +1,151 @@
+"""
+Cost-aware token-bucket throttling shared by every worker on a host.
+
+Each request draws from a bucket keyed by user (or client IP) and endpoint class:
+
+    read    retrieve and other cheap GETs
+    list    list scans and change feeds
+    write   single-object writes
+    export  exports, downloads and job runs
+    bulk    batches and other multi-row writes; these cost one token per operation,
+            and each operation also costs one token from its own class
+
+A bucket holds up to N tokens and refills at N per period, from
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] ("N/period"). Buckets live in a small SQLite
+file (THROTTLE_DB) in WAL mode. One check is a single UPSERT on a per-thread
+connection, so all gunicorn workers see the same buckets without a cache server. If
+the store cannot be reached the request is let through rather than failed.
+
+Views can choose a class with ``throttle_scope``, per action with
+``throttle_scope_map = {'download': 'export'}``, and set the cost with
+``throttle_cost(request) -> int``. A view that spends from several buckets at once
+(a batch) gives ``throttle_costs(request) -> {scope: cost}`` instead; the request is
+let through only if every bucket has enough, and nothing is taken otherwise.
+"""
+import logging
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+from . import tenancy
+
+
+logger = logging.getLogger('core.throttling')
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+LIST_ACTIONS = ('list', 'changes')
+
+# Refill the bucket, then take `cost` tokens only if that many are there. No row back means denied.
+TAKE_SQL = """
+INSERT INTO bucket (key, tokens, updated) VALUES (:key, :capacity - :cost, :now)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = MIN(:capacity, tokens + (:now - updated) * :rate) - :cost,
+    updated = :now
+WHERE MIN(:capacity, tokens + (:now - updated) * :rate) >= :cost
+RETURNING tokens
+"""
+
+GIVE_BACK_SQL = 'UPDATE bucket SET tokens = MIN(:capacity, tokens + :cost) WHERE key = :key'
+
+_local = threading.local()
+
+
+def parse_rate(rate):
+    """'120/min' -> (capacity 120, refill 2.0 tokens per second)."""
+    count, period = rate.split('/')
+    count = int(count)
+    return count, count / PERIODS[period.strip()[0]]
+
+
+def _connection():
+    path = settings.THROTTLE_DB
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.path != path:
+        conn = sqlite3.connect(path, timeout=0.05, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # Losing the last few bucket updates in a power cut is harmless
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute('CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+        _local.conn, _local.path = conn, path
+    return conn
+
+
+def take(key, cost, capacity, rate):
+    """Take `cost` tokens from a bucket; returns 0 if allowed, else seconds until it would be."""
+    if cost > capacity:
+        cost = capacity
+    now = time.time()
+    conn = _connection()
+    params = {'key': key, 'cost': cost, 'capacity': capacity, 'rate': rate, 'now': now}
+    if conn.execute(TAKE_SQL, params).fetchone() is not None:
+        return 0
+    row = conn.execute('SELECT tokens, updated FROM bucket WHERE key = ?', (key,)).fetchone()
+    tokens = min(capacity, row[0] + (now - row[1]) * rate) if row else capacity
+    return max((cost - tokens) / rate, 0.001)
+
+
+def give_back(key, cost, capacity):
+    """Return tokens taken for a request that was refused after all."""
+    _connection().execute(GIVE_BACK_SQL, {'key': key, 'cost': min(cost, capacity), 'capacity': capacity})
+
+
+def scope_for(view, action, method):
+    """The bucket class a view (or view class) uses for an action and HTTP method."""
+    scope_map = getattr(view, 'throttle_scope_map', {})
+    if action in scope_map:
+        return scope_map[action]
+    if getattr(view, 'throttle_scope', None):
+        return view.throttle_scope
+    if method in SAFE_METHODS:
+        return 'list' if action in LIST_ACTIONS else 'read'
+    return 'write'
+
+
+class CostThrottle(BaseThrottle):
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        if not settings.THROTTLE_ENABLED:
+            return True
+        # Operations inside a batch were charged to their own scopes when the batch came in
+        if getattr(request._request, 'batch_operation', False):
+            return True
+
+        if hasattr(view, 'throttle_costs'):
+            costs = view.throttle_costs(request)
+        else:
+            costs = {self.scope_for(request, view): view.throttle_cost(request) if hasattr(view, 'throttle_cost') else 1}
+        rates = settings.REST_FRAMEWORK.get('DEFAULT_THROTTLE_RATES', {})
+
+        taken = []
+        try:
+            for scope, cost in costs.items():
+                if not rates.get(scope):
+                    continue
+                capacity, rate = parse_rate(rates[scope])
+                key = self.key_for(request, scope)
+                wait = take(key, cost, capacity, rate)
+                if wait:
+                    for key, cost, capacity in taken:
+                        give_back(key, cost, capacity)
+                    self.wait_seconds = wait
+                    return False
+                taken.append((key, cost, capacity))
+        except sqlite3.Error:
+            logger.warning('Throttle store %s unavailable; letting the request through', settings.THROTTLE_DB, exc_info=True)
+            return True
+        return True
+
+    def scope_for(self, request, view):
+        return scope_for(view, getattr(view, 'action', None), request.method)
+
+    def key_for(self, request, scope):
+        user = request.user
+        ident = f'user:{user.pk}' if user and user.is_authenticated else f'ip:{self.get_ident(request)}'
+        return f'{tenancy.current_tenant() or "-"}:{ident}:{scope}'
+
+    def wait(self):
+        return self.wait_seconds
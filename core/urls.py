@@ -1,6 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ClassRoomViewSet, StudentViewSet, AttendanceViewSet, GradeViewSet, FeeStructureViewSet, PaymentViewSet, AdminUserViewSet
+from . import events
+from .batch import BatchView
+from .views import ClassRoomViewSet, StudentViewSet, AttendanceViewSet, GradeViewSet, FeeStructureViewSet, PaymentViewSet, AdminUserViewSet, JobViewSet, DashboardViewSet, FacetViewSet
 
 
 router = DefaultRouter()
@@ -11,9 +13,15 @@ router.register(r'grades', GradeViewSet)
 router.register(r'fee-structure', FeeStructureViewSet)
 router.register(r'payments', PaymentViewSet)
 router.register(r'admin-users', AdminUserViewSet)
+router.register(r'jobs', JobViewSet)
+router.register(r'dashboard', DashboardViewSet, basename='dashboard')
+router.register(r'facets', FacetViewSet, basename='facets')
 
 
 urlpatterns = [
+    path('batch/', BatchView.as_view(), name='batch'),
+    path('events/', events.stream, name='events'),
+    path('events/ticket/', events.TicketView.as_view(), name='events-ticket'),
     path('', include(router.urls)),
 ]
 
@@ -1,5 +1,21 @@
-from rest_framework import viewsets, permissions
-from .models import ClassRoom, Student, Attendance, Grade, FeeStructure, Payment, AdminUser
+import hashlib
+import io
+import json
+import os
+from datetime import datetime
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import F
+from django.http import FileResponse, Http404
+from django.utils import timezone
+from rest_framework import mixins, viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, PermissionDenied, ValidationError
+from rest_framework.response import Response
+from . import archive, changes, dashboard, dedup, facets, profiles, promotion, receipts, reconcile
+from .models import ClassRoom, Student, Attendance, Grade, FeeStructure, Payment, PaymentReceipt, AdminUser, Job
+from .tasks import export_path
 from .serializers import (
     ClassRoomSerializer,
     StudentSerializer,
@@ -7,7 +23,12 @@ from .serializers import (
     GradeSerializer,
     FeeStructureSerializer,
     PaymentSerializer,
+    ApplyPaymentSerializer,
+    PromotionSerializer,
+    DuplicateCheckSerializer,
+    ReconcileSerializer,
     AdminUserSerializer,
+    JobSerializer,
 )
 
 
@@ -18,40 +39,388 @@ class IsAdminOrReadOnly(permissions.BasePermission):
         return request.user and request.user.is_staff
 
 
-class ClassRoomViewSet(viewsets.ModelViewSet):
+class Conflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The object was changed by someone else; reload it and try again.'
+    default_code = 'conflict'
+
+
+class PreconditionRequired(APIException):
+    status_code = 428
+    default_detail = 'Send the version you are updating in an If-Match header.'
+    default_code = 'precondition_required'
+
+
+class AcademicYearArchiveMixin:
+    """
+    ``?academic_year=2024`` limits results to that academic year and, once the year
+    has been archived, reads it from the archive table instead of the hot one.
+
+    Writes dated in an archived year are refused (403) with or without the parameter.
+    """
+
+    def check_year_open(self, *days):
+        """PermissionDenied if any of the dates or datetimes falls in an archived academic year."""
+        for day in days:
+            if day is None:
+                continue
+            if isinstance(day, datetime):
+                day = timezone.localtime(day).date() if timezone.is_aware(day) else day.date()
+            year = archive.academic_year_of(day)
+            if archive.is_archived(year):
+                raise PermissionDenied(f'Academic year {archive.academic_year_label(year)} is archived and read-only.')
+
+    def _date_field(self):
+        return archive.ARCHIVES[self.queryset.model][1]
+
+    def perform_create(self, serializer):
+        self.check_year_open(serializer.validated_data.get(self._date_field()))
+        super().perform_create(serializer)
+
+    def perform_update(self, serializer):
+        field = self._date_field()
+        self.check_year_open(getattr(serializer.instance, field), serializer.validated_data.get(field))
+        super().perform_update(serializer)
+
+    def perform_destroy(self, instance):
+        self.check_year_open(getattr(instance, self._date_field()))
+        super().perform_destroy(instance)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        year = self.request.query_params.get('academic_year')
+        if not year:
+            return queryset
+        try:
+            year = int(year)
+        except ValueError:
+            raise ValidationError({'academic_year': 'Expected the starting year, e.g. 2024 for 2024-25.'})
+
+        archive_model, field = archive.ARCHIVES[queryset.model]
+        if archive.is_archived(year):
+            if self.request.method not in permissions.SAFE_METHODS:
+                raise PermissionDenied(f'Academic year {archive.academic_year_label(year)} is archived and read-only.')
+            queryset = archive_model.objects.select_related('student')
+        return queryset.filter(**archive.year_filter(queryset.model, field, year))
+
+
+class ChangeFeedMixin:
+    """
+    Writes commit together with their ChangeLog rows. List responses carry the current
+    sync token in ``X-Change-Token``; ``changes/?since=<token>`` returns what changed after it.
+    """
+
+    def _atomic(self):
+        return transaction.atomic(using=router.db_for_write(self.queryset.model))
+
+    def perform_create(self, serializer):
+        with self._atomic():
+            super().perform_create(serializer)
+
+    def perform_update(self, serializer):
+        with self._atomic():
+            super().perform_update(serializer)
+
+    def perform_destroy(self, instance):
+        with self._atomic():
+            super().perform_destroy(instance)
+
+    def list(self, request, *args, **kwargs):
+        # Read the token before the rows, so a write landing in between is sent again rather than missed
+        token = changes.settled_token()
+        response = super().list(request, *args, **kwargs)
+        response['X-Change-Token'] = str(token)
+        return response
+
+    @action(detail=False)
+    def changes(self, request):
+        try:
+            since = int(request.query_params.get('since', ''))
+            if since < 0:
+                raise ValueError
+        except ValueError:
+            raise ValidationError({'since': 'Expected the token from X-Change-Token or a previous changes response.'})
+        try:
+            saved, deleted, token, more = changes.changes_since(self.queryset.model, since, settings.CHANGES_PAGE_SIZE)
+        except changes.TokenExpired:
+            return Response({'detail': 'Token has expired; reload the full list.'}, status=status.HTTP_410_GONE)
+
+        rows = self.filter_queryset(self.get_queryset()).filter(pk__in=saved)
+        data = self.get_serializer(rows, many=True).data
+        # Rows changed but no longer visible here (archived since) are gone as far as the list is concerned
+        visible = {row['id'] for row in data}
+        deleted += [pk for pk in saved if pk not in visible]
+        return Response({'token': token, 'results': data, 'deleted': deleted, 'more': more})
+
+
+class ClassRoomViewSet(ChangeFeedMixin, viewsets.ModelViewSet):
     queryset = ClassRoom.objects.all()
     serializer_class = ClassRoomSerializer
     permission_classes = [IsAdminOrReadOnly]
 
 
-class StudentViewSet(viewsets.ModelViewSet):
+class StudentViewSet(ChangeFeedMixin, viewsets.ModelViewSet):
+    """
+    Creating a student that looks like one already on file (see core/dedup.py) fails
+    with 409 and the likely matches; send ``allow_duplicate: true`` to save anyway.
+    ``check_duplicates/`` runs the same check without saving.
+
+    ``promote/`` moves whole classes at year end (see core/promotion.py). It is a dry
+    run unless ``dry_run`` is false; roll-number collisions block an apply with 409.
+
+    ``{id}/profile/`` is everything the student page shows in one response (see core/profiles.py).
+    """
     queryset = Student.objects.select_related('classroom').all()
     serializer_class = StudentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope_map = {'promote': 'export'}
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if str(request.data.get('allow_duplicate', '')).lower() not in ('true', '1'):
+            duplicates = dedup.candidates_for(serializer.validated_data)
+            if duplicates:
+                return Response(
+                    {'detail': 'This student looks like one already on file.', 'duplicates': duplicates},
+                    status=status.HTTP_409_CONFLICT,
+                )
+        self.perform_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=self.get_success_headers(serializer.data))
+
+    @action(detail=True)
+    def profile(self, request, pk=None):
+        try:
+            pk = int(pk)
+        except ValueError:
+            raise Http404
+        today = timezone.localdate()
+
+        def build():
+            try:
+                return profiles.build(pk, today)
+            except Student.DoesNotExist:
+                raise Http404
 
+        data = changes.cached(
+            'student_profile', settings.STUDENT_PROFILE_CACHE_SECONDS, build, pk, today, token=profiles.version(pk),
+        )
+        return Response(data)
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'])
+    def check_duplicates(self, request):
+        serializer = DuplicateCheckSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({'duplicates': dedup.candidates_for(serializer.validated_data)})
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated, IsAdminOrReadOnly])
+    def promote(self, request):
+        serializer = PromotionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            diff = promotion.promote(data['plan'], dry_run=data['dry_run'])
+        except promotion.PlanError as exc:
+            if exc.collisions:
+                return Response({'detail': str(exc), 'collisions': exc.collisions}, status=status.HTTP_409_CONFLICT)
+            raise ValidationError({'plan': str(exc)})
+        return Response(diff)
+
+
+class AttendanceViewSet(ChangeFeedMixin, AcademicYearArchiveMixin, viewsets.ModelViewSet):
     queryset = Attendance.objects.select_related('student').all()
     serializer_class = AttendanceSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 
-class GradeViewSet(viewsets.ModelViewSet):
+class GradeViewSet(ChangeFeedMixin, AcademicYearArchiveMixin, viewsets.ModelViewSet):
     queryset = Grade.objects.select_related('student').all()
     serializer_class = GradeSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 
-class FeeStructureViewSet(viewsets.ModelViewSet):
+class FeeStructureViewSet(ChangeFeedMixin, viewsets.ModelViewSet):
     queryset = FeeStructure.objects.select_related('classroom').all()
     serializer_class = FeeStructureSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(ChangeFeedMixin, AcademicYearArchiveMixin, viewsets.ModelViewSet):
+    """
+    Updates are optimistic: the client sends the ``version`` it read as ``If-Match: "3"``
+    (or as ``version`` in the body) and gets 409 with the current row if someone else
+    wrote first. ``apply_payment/`` records an installment without needing a version.
+    ``reconcile/`` matches an uploaded bank statement against payments (see core/reconcile.py).
+    """
     queryset = Payment.objects.select_related('student').all()
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope_map = {'reconcile': 'export'}
+
+    def _expected_version(self, instance):
+        value = self.request.headers.get('If-Match') or self.request.data.get('version')
+        if value is None or value == '':
+            raise PreconditionRequired()
+        value = str(value).strip()
+        if value == '*':
+            return instance.version
+        try:
+            return int(value.removeprefix('W/').strip('"'))
+        except ValueError:
+            raise ValidationError({'version': 'If-Match must be the version number of the payment, e.g. "3".'})
+
+    def _conflict(self, pk):
+        current = Payment.objects.select_related('student').filter(pk=pk).first()
+        if current is None:
+            raise Http404
+        return Conflict({'detail': Conflict.default_detail, 'current': self.get_serializer(current).data})
+
+    def _with_etag(self, response):
+        if isinstance(response.data, dict) and 'version' in response.data:
+            response['ETag'] = f'"{response.data["version"]}"'
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._with_etag(super().retrieve(request, *args, **kwargs))
+
+    def update(self, request, *args, **kwargs):
+        return self._with_etag(super().update(request, *args, **kwargs))
+
+    def _keep_receipt(self, payment, number, amount, day, method):
+        PaymentReceipt.objects.create(
+            payment=payment, receipt_number=number, amount=amount, payment_date=day, payment_method=method,
+        )
+
+    def perform_create(self, serializer):
+        # Every time money comes in the payment gets a fresh receipt, issued once the write can't fail
+        data = serializer.validated_data
+        paid = data.get('total_paid', 0)
+        if paid > 0:
+            self.check_year_open(data['payment_date'])
+            receipts.reserve(data['payment_date'])
+        with self._atomic():
+            if paid > 0:
+                data['receipt_number'] = receipts.issue(data['payment_date'])
+            super().perform_create(serializer)
+            if paid > 0:
+                payment = serializer.instance
+                self._keep_receipt(payment, data['receipt_number'], paid, payment.payment_date, payment.payment_method)
+
+    def perform_update(self, serializer):
+        instance = serializer.instance
+        expected = self._expected_version(instance)
+        data = serializer.validated_data
+        paid = data.get('total_paid', instance.total_paid) - instance.total_paid
+        day = data.get('payment_date') or timezone.localdate()
+        if paid > 0:
+            self.check_year_open(instance.payment_date, day)
+            receipts.reserve(day)
+        with self._atomic():
+            # Claims the row: a concurrent writer holding the same version now matches nothing
+            claimed = Payment.objects.filter(pk=instance.pk, version=expected).update(version=F('version') + 1)
+            if not claimed:
+                raise self._conflict(instance.pk)
+            instance.version = expected + 1
+            if paid > 0:
+                data['receipt_number'] = receipts.issue(day)
+            super().perform_update(serializer)
+            if paid > 0:
+                self._keep_receipt(instance, data['receipt_number'], paid, day, instance.payment_method)
+
+    def perform_destroy(self, instance):
+        if self.request.headers.get('If-Match'):
+            expected = self._expected_version(instance)
+            with self._atomic():
+                if not Payment.objects.filter(pk=instance.pk, version=expected).exists():
+                    raise self._conflict(instance.pk)
+                super().perform_destroy(instance)
+        else:
+            super().perform_destroy(instance)
+
+    @action(detail=True, methods=['post'])
+    def apply_payment(self, request, pk=None):
+        """Add an installment to total_paid and take it off the balance in one UPDATE."""
+        payment = self.get_object()
+        serializer = ApplyPaymentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        amount = data['amount']
+
+        day = data.get('payment_date') or timezone.localdate()
+        self.check_year_open(payment.payment_date, day)
+        receipts.reserve(day)
+
+        fields = {
+            'amount': amount,
+            'total_paid': F('total_paid') + amount,
+            'balance': F('balance') - amount,
+            'payment_date': day,
+            'version': F('version') + 1,
+        }
+        if 'payment_method' in data:
+            fields['payment_method'] = data['payment_method']
+        if 'notes' in data:
+            fields['notes'] = data['notes']
+
+        with self._atomic():
+            applied = Payment.objects.filter(pk=payment.pk, balance__gte=amount).update(**fields)
+            if not applied:
+                raise ValidationError({'amount': 'Amount is more than the outstanding balance.'})
+            # The row is ours until commit, so the receipt is only issued for an installment that went in
+            number = receipts.issue(day)
+            Payment.objects.filter(pk=payment.pk).update(receipt_number=number)
+            payment.refresh_from_db()
+            self._keep_receipt(payment, number, amount, day, payment.payment_method)
+            # A queryset update sends no post_save, so log the change for sync and live events here
+            changes.record_many(Payment, [payment])
+        return self._with_etag(Response(self.get_serializer(payment).data))
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated, IsAdminOrReadOnly])
+    def reconcile(self, request):
+        serializer = ReconcileSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        # Read straight from the upload (a temp file when large) instead of loading it into memory
+        stream = io.TextIOWrapper(data['statement'].file, encoding='utf-8-sig', errors='replace', newline='')
+        try:
+            lines = reconcile.read_statement(stream)
+        except reconcile.StatementError as exc:
+            raise ValidationError({'statement': str(exc)})
+        return Response(reconcile.reconcile(lines, data['window'], data['fuzzy_window'], data['min_score']))
+
+
+class DashboardViewSet(viewsets.ViewSet):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @action(detail=False)
+    def summary(self, request):
+        """Counts, totals and short lists for the dashboard in one request, cached until the next write."""
+        today = timezone.localdate()
+        data = changes.cached(
+            'dashboard_summary', settings.DASHBOARD_CACHE_SECONDS, lambda: dashboard.summary(today), today,
+        )
+        return Response(data)
+
+
+class FacetViewSet(viewsets.ViewSet):
+    """
+    ``GET /api/facets/?only=subject,term&classroom=3`` lists the values each filter dropdown
+    can offer, with counts, under the filters given (see core/facets.py).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def list(self, request):
+        try:
+            names = facets.clean_names(request.query_params.get('only'))
+            filters = facets.clean_filters(request.query_params)
+        except facets.FacetError as exc:
+            raise ValidationError({exc.param: str(exc)})
+        key = json.dumps([sorted(names), filters], sort_keys=True)
+        data = changes.cached(
+            'facets', settings.FACETS_CACHE_SECONDS, lambda: facets.facets(names, filters),
+            hashlib.sha1(key.encode()).hexdigest(),
+        )
+        return Response(data)
 
 
 class AdminUserViewSet(viewsets.ModelViewSet):
@@ -72,3 +441,25 @@ class AdminUserViewSet(viewsets.ModelViewSet):
             instance.django_user.delete()
         instance.delete()
 
+
+class JobViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Queue background jobs (staff only) and poll their status and progress."""
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated, IsAdminOrReadOnly]
+    throttle_scope_map = {'create': 'export', 'download': 'export'}
+
+    def get_queryset(self):
+        if self.request.user.is_superuser:
+            return Job.objects.all()
+        return Job.objects.filter(created_by=self.request.user)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != Job.STATUS_SUCCEEDED or not (job.result or {}).get('file'):
+            raise Http404('This job has no file to download.')
+        path = export_path(job.pk, os.path.splitext(job.result['file'])[1].lstrip('.'))
+        if not os.path.exists(path):
+            raise Http404('The file for this job has been removed.')
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=f'{job.kind}-{job.pk}{os.path.splitext(path)[1]}')
@@ -9,7 +9,12 @@ if [ -n "$DB_HOST" ]; then
   done
 fi
 
-python manage.py migrate --noinput
+# Per-worker metrics files from a previous run would be merged into the new totals
+export METRICS_DIR="${METRICS_DIR:-/tmp/school-metrics}"
+rm -rf "$METRICS_DIR"
+mkdir -p "$METRICS_DIR"
+
+python manage.py migrate_tenants
 python manage.py collectstatic --noinput || true
 
 exec gunicorn server.wsgi:application --bind 0.0.0.0:8000 --workers 3
@@ -11,7 +11,11 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import json
 import os
+import tempfile
+
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,7 +49,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Before TenantMiddleware, so its 403/404 responses carry CORS headers too
     'corsheaders.middleware.CorsMiddleware',
+    'core.middleware.TenantMiddleware',
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -89,6 +98,81 @@ DATABASES = {
 }
 
 
+def _replica_databases(primary):
+    """
+    Replica aliases ('replica1', 'replica2', ...) cloned from the primary settings.
+
+    DB_REPLICA_NAMES is a comma separated list of database names (or SQLite files),
+    DB_REPLICA_HOSTS optionally gives one host per replica. Tests mirror 'default'.
+    """
+    names = [n for n in os.getenv('DB_REPLICA_NAMES', '').split(',') if n]
+    hosts = [h for h in os.getenv('DB_REPLICA_HOSTS', '').split(',') if h]
+    replicas = {}
+    for index, name in enumerate(names, start=1):
+        replicas[f'replica{index}'] = {
+            **primary,
+            'NAME': name,
+            'HOST': hosts[index - 1] if index <= len(hosts) else primary.get('HOST', ''),
+            'TEST': {'MIRROR': 'default'},
+        }
+    return replicas
+
+
+DATABASES.update(_replica_databases(DATABASES['default']))
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias.startswith('replica')]
+
+
+def _tenant_databases(primary):
+    """
+    Load TENANTS_FILE, a JSON object of school slug -> {"hosts": [...], "database": {...}}.
+
+    Each school gets a 'tenant_<slug>' alias whose settings default to the primary's,
+    with persistent connections so every worker keeps a warm connection per school.
+    """
+    path = os.getenv('TENANTS_FILE')
+    if not path:
+        return {}, {}
+    with open(path) as fh:
+        config = json.load(fh)
+    tenants, databases = {}, {}
+    for slug, tenant in config.items():
+        alias = f'tenant_{slug}'
+        databases[alias] = {
+            **primary,
+            'CONN_MAX_AGE': int(os.getenv('TENANT_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            **tenant.get('database', {}),
+        }
+        tenants[slug] = {
+            'alias': alias,
+            'hosts': [h.lower() for h in tenant.get('hosts', [])],
+            'receipt_prefix': tenant.get('receipt_prefix', ''),
+        }
+    return tenants, databases
+
+
+TENANTS, _tenant_dbs = _tenant_databases(DATABASES['default'])
+DATABASES.update(_tenant_dbs)
+# Reject requests that match no school instead of serving them from 'default'
+TENANT_REQUIRED = os.getenv('TENANT_REQUIRED', 'False').lower() == 'true'
+
+DATABASE_ROUTERS = ['core.tenancy.TenantRouter', 'core.db_routers.ReplicaRouter']
+
+# The concurrency tests write from many threads, which an in-memory SQLite test database cannot take
+if DATABASES['default']['ENGINE'].endswith('sqlite3'):
+    DATABASES['default']['TEST'] = {'NAME': os.path.join(tempfile.gettempdir(), 'school-test.sqlite3')}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'KEY_FUNCTION': 'core.tenancy.make_cache_key',
+    }
+}
+# After a write, a client reads from the primary for this many seconds
+DATABASE_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', '5'))
+DATABASE_REPLICA_PIN_COOKIE = 'db_pin'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -107,6 +191,17 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Django's defaults plus plain bcrypt, so accounts imported from the PHP app keep their
+# password_hash() hashes (needs the bcrypt package); they are rehashed on first login
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'django.contrib.auth.hashers.BCryptPasswordHasher',
+]
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -142,11 +237,128 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'core.throttling.CostThrottle',
+    ),
+    # Token buckets per user and endpoint class: burst size / refill period (see core/throttling.py)
+    'DEFAULT_THROTTLE_RATES': {
+        'read': '1200/min',
+        'list': '120/min',
+        'write': '300/min',
+        'export': '10/min',
+        'bulk': '600/min',
+        # Overrides, e.g. THROTTLE_RATES="list=60/min,export=5/min"
+        **dict(item.split('=', 1) for item in os.getenv('THROTTLE_RATES', '').split(',') if '=' in item),
+    },
 }
 
+# Turn request throttling off entirely (benchmarks, local debugging)
+THROTTLE_ENABLED = os.getenv('THROTTLE_ENABLED', 'True').lower() == 'true'
+
+# SQLite file holding the throttle buckets, shared by every worker on the host
+THROTTLE_DB = os.getenv('THROTTLE_DB', os.path.join(tempfile.gettempdir(), 'school-throttle.sqlite3'))
+
+SIMPLE_JWT = {
+    'TOKEN_OBTAIN_SERIALIZER': 'core.tenancy.TenantTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'core.tenancy.TenantTokenRefreshSerializer',
+}
+
+# Fraction of requests (0.0-1.0) that get a Server-Timing header and a core.performance log line
+PERFORMANCE_SAMPLE_RATE = float(os.getenv('PERFORMANCE_SAMPLE_RATE', '0'))
+
+# Prometheus-text /metrics endpoint; each worker writes its counters to METRICS_DIR and
+# the endpoint merges them, so the directory must be shared by all gunicorn workers
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'school-metrics'))
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+# Scrapers send 'Authorization: Bearer <METRICS_TOKEN>'; without it only direct (unproxied) requests from these IPs get in
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [ip for ip in os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip]
+
+# Queries slower than this are logged with their EXPLAIN plan (0 disables); see manage.py advise_indexes
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', '0'))
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', os.path.join(tempfile.gettempdir(), 'school-slow-queries.jsonl'))
+
+# Admin changelists show an estimated count instead of COUNT(*) for unfiltered tables larger than this
+ADMIN_EXACT_COUNT_LIMIT = int(os.getenv('ADMIN_EXACT_COUNT_LIMIT', '10000'))
+
+# Month (1-12) an academic year starts in; 2024 means April 2024 - March 2025 with the default
+ACADEMIC_YEAR_START_MONTH = int(os.getenv('ACADEMIC_YEAR_START_MONTH', '4'))
+
+# Background jobs (manage.py run_jobs): a running job whose worker has been silent this long is requeued
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', '900'))
+JOB_RETRY_BACKOFF_SECONDS = int(os.getenv('JOB_RETRY_BACKOFF_SECONDS', '30'))
+# Day of the month generated monthly fees fall due
+FEE_DUE_DAY = int(os.getenv('FEE_DUE_DAY', '10'))
+
+# Outgoing email. Use django.core.mail.backends.console.EmailBackend to print messages,
+# or django.core.mail.backends.filebased.EmailBackend to write them under EMAIL_FILE_PATH
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '25'))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'False').lower() == 'true'
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', os.path.join(tempfile.gettempdir(), 'school-emails'))
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'office@localhost')
+
+# Fee reminders (send_fee_reminders job): students rendered per page, and the most emails per minute (0 = no limit)
+REMINDER_BATCH_SIZE = int(os.getenv('REMINDER_BATCH_SIZE', '200'))
+REMINDER_RATE_PER_MINUTE = int(os.getenv('REMINDER_RATE_PER_MINUTE', '120'))
+
+# New students this similar (0-1) to an existing one are refused as likely duplicates (see core/dedup.py)
+DUPLICATE_STUDENT_MIN_SCORE = float(os.getenv('DUPLICATE_STUDENT_MIN_SCORE', '0.8'))
+
+# Largest number of operations accepted by POST /api/batch/
+BATCH_MAX_OPERATIONS = int(os.getenv('BATCH_MAX_OPERATIONS', '50'))
+
+# Most change-log entries returned by one /changes/ request
+CHANGES_PAGE_SIZE = int(os.getenv('CHANGES_PAGE_SIZE', '1000'))
+
+# Longest a write transaction is expected to stay open: sync tokens and the event feed re-read
+# entries this recent, so one that commits after a higher id is still picked up
+CHANGES_SETTLE_SECONDS = float(os.getenv('CHANGES_SETTLE_SECONDS', '10'))
+
+# Change-log entries older than this are removed by prune_changes; clients with older tokens reload
+CHANGE_LOG_RETENTION_DAYS = int(os.getenv('CHANGE_LOG_RETENTION_DAYS', '30'))
+
+# Live event stream (/api/events/, ASGI only): change-log poll interval, keep-alive comment
+# interval, how long one connection stays open, and the reconnect delay sent to browsers
+EVENTS_POLL_SECONDS = float(os.getenv('EVENTS_POLL_SECONDS', '1'))
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv('EVENTS_KEEPALIVE_SECONDS', '15'))
+EVENTS_MAX_SECONDS = float(os.getenv('EVENTS_MAX_SECONDS', '300'))
+EVENTS_RETRY_MS = int(os.getenv('EVENTS_RETRY_MS', '3000'))
+# Lifetime of the ticket that opens the event stream (it travels in the URL, so keep it short)
+EVENTS_TICKET_SECONDS = int(os.getenv('EVENTS_TICKET_SECONDS', '30'))
+
+# Receipt numbers look like R-2026-27-000123. 1 keeps the sequence gapless; a larger
+# block lets each worker reserve that many at a time, at the cost of gaps (see core/receipts.py)
+RECEIPT_PREFIX = os.getenv('RECEIPT_PREFIX', 'R')
+RECEIPT_BLOCK_SIZE = int(os.getenv('RECEIPT_BLOCK_SIZE', '1'))
+
+# Upper bound on how stale the cached dashboard summary can be; writes invalidate it sooner
+DASHBOARD_CACHE_SECONDS = int(os.getenv('DASHBOARD_CACHE_SECONDS', '30'))
+
+# Upper bound on how long a student profile is cached; writes touching the student invalidate it sooner
+STUDENT_PROFILE_CACHE_SECONDS = int(os.getenv('STUDENT_PROFILE_CACHE_SECONDS', '300'))
+
+# Upper bound on how long filter facets are cached; writes invalidate them sooner
+FACETS_CACHE_SECONDS = int(os.getenv('FACETS_CACHE_SECONDS', '300'))
+
+# SQLite snapshots (manage.py backup_db): where they go, how many to keep, pages copied per
+# locked step and the pause between steps; BACKUP_INTERVAL_HOURS > 0 lets run_jobs repeat them
+BACKUP_DIR = os.getenv('BACKUP_DIR', BASE_DIR / 'backups')
+BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', '7'))
+BACKUP_PAGES_PER_STEP = int(os.getenv('BACKUP_PAGES_PER_STEP', '256'))
+BACKUP_STEP_PAUSE = float(os.getenv('BACKUP_STEP_PAUSE', '0.05'))
+BACKUP_INTERVAL_HOURS = float(os.getenv('BACKUP_INTERVAL_HOURS', '0'))
+
 # CORS settings (allow all in dev)
 CORS_ALLOW_ALL_ORIGINS = DEBUG or os.getenv('CORS_ALLOW_ALL', 'False').lower() == 'true'
 CORS_ALLOWED_ORIGINS = [o for o in os.getenv('CORS_ALLOWED_ORIGINS', '').split(',') if o]
+CORS_EXPOSE_HEADERS = ['X-Change-Token', 'X-DB-Pin']
+# X-DB-Pin keeps a client on the primary after a write (see ReplicaRoutingMiddleware)
+CORS_ALLOW_HEADERS = (*default_headers, 'x-db-pin')
 
 # CSRF trusted origins for cookie-based setups in prod (not required for JWT)
 CSRF_TRUSTED_ORIGINS = [o for o in os.getenv('CSRF_TRUSTED_ORIGINS', '').split(',') if o]
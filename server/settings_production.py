@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 from .settings import *
+from .settings import _replica_databases, _tenant_databases
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = False
@@ -34,6 +35,10 @@ DATABASES = {
         'PORT': os.environ.get('DB_PORT', '5432'),
     }
 }
+DATABASES.update(_replica_databases(DATABASES['default']))
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias.startswith('replica')]
+TENANTS, _tenant_dbs = _tenant_databases(DATABASES['default'])
+DATABASES.update(_tenant_dbs)
 
 # Static files configuration
 STATIC_URL = '/static/'
@@ -4,7 +4,15 @@ const api = axios.create({
   baseURL: '/api',
 });
 
+// After a write the server answers with X-DB-Pin: <seconds>. Sending it back until then keeps
+// reads on the primary, so they see the write even when the API is on another origin and the
+// db_pin cookie isn't sent.
+let pinnedUntil = 0;
+
 api.interceptors.request.use((config) => {
+  if (Date.now() < pinnedUntil) {
+    config.headers['X-DB-Pin'] = '1';
+  }
   const token = localStorage.getItem('accessToken');
   if (token) {
     config.headers.Authorization = `Bearer ${token}`;
@@ -17,6 +25,8 @@ api.interceptors.request.use((config) => {
 
 api.interceptors.response.use(
   (response) => {
+    const pin = Number(response.headers['x-db-pin']);
+    if (pin > 0) pinnedUntil = Date.now() + pin * 1000;
     console.log('API Response success:', response.config.url, response.status);
     return response;
   },
@@ -26,4 +36,33 @@ api.interceptors.response.use(
   }
 );
 
+// Delta sync: a list response carries X-Change-Token; `${path}changes/?since=<token>` returns
+// rows changed after it plus ids deleted. 410 means the token expired and the list must be reloaded.
+export async function loadList(path) {
+  const res = await api.get(path);
+  return { rows: res.data, token: res.headers['x-change-token'] };
+}
+
+export async function syncList(path, rows, token) {
+  if (token == null) return loadList(path);
+  try {
+    for (;;) {
+      const { data } = await api.get(`${path}changes/`, { params: { since: token } });
+      const changed = new Map(data.results.map((row) => [row.id, row]));
+      const deleted = new Set(data.deleted);
+      const kept = rows.filter((row) => !deleted.has(row.id)).map((row) => {
+        const updated = changed.get(row.id);
+        changed.delete(row.id);
+        return updated || row;
+      });
+      rows = [...changed.values(), ...kept];
+      token = data.token;
+      if (!data.more) return { rows, token };
+    }
+  } catch (err) {
+    if (err.response?.status === 410) return loadList(path);
+    throw err;
+  }
+}
+
 export default api;
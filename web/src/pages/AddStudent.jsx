@@ -22,6 +22,7 @@ export default function AddStudent() {
   });
   const [saving, setSaving] = useState(false);
   const [message, setMessage] = useState(null);
+  const [duplicates, setDuplicates] = useState(null);
   
   // Bulk upload states
   const [importing, setImporting] = useState(false);
@@ -248,28 +249,41 @@ export default function AddStudent() {
     return created.data.id;
   };
 
-  const handleSubmit = async (e) => {
-    e.preventDefault();
+  const handleSubmit = async (e, allowDuplicate = false) => {
+    e?.preventDefault();
     setSaving(true);
     setMessage(null);
+    setDuplicates(null);
     try {
-      const classroomId = await ensureClassroomId(form.classroom, form.section);
-      const classroomNumericId = Number(classroomId);
+      // One batch so a missing classroom and the student are created together or not at all
+      const existingId = idForClassNameAndSection(form.classroom, form.section);
+      const operations = [];
+      if (!existingId) {
+        operations.push({ id: 'classroom', method: 'POST', path: 'classrooms/', body: { name: String(form.classroom), section: form.section } });
+      }
       const payload = { 
         first_name: form.first_name,
         last_name: form.last_name,
         date_of_birth: formatDateForAPI(form.date_of_birth), // Convert DD-MM-YYYY to YYYY-MM-DD for API
         admission_date: formatDateForAPI(form.admission_date), // Convert DD-MM-YYYY to YYYY-MM-DD for API
         roll_number: form.roll_number,
-        classroom: classroomNumericId,
+        classroom: existingId ? Number(existingId) : '$classroom.id',
         father_name: form.father_name || '',
         contact_email: form.contact_email || '',
         contact_phone: form.contact_phone || '',
         address: form.address || '',
+        ...(allowDuplicate ? { allow_duplicate: true } : {}),
       };
-      await api.post('students/', payload);
+      operations.push({ method: 'POST', path: 'students/', body: payload });
+      await api.post('batch/', { operations });
       navigate('/students');
     } catch (err) {
+      // The server found students this one probably repeats; let the user look before saving anyway
+      const failed = err?.response?.data?.results?.[err.response.data.failed_index];
+      if (failed?.status === 409 && failed.body?.duplicates) {
+        setDuplicates(failed.body.duplicates);
+        return;
+      }
       const apiMsg = err?.response?.data ? JSON.stringify(err.response.data) : err?.message || 'Unknown error';
       setMessage({ type: 'error', text: `Failed to create student: ${apiMsg}` });
     } finally {
@@ -393,7 +407,10 @@ export default function AddStudent() {
             created++;
           } catch (err) {
             failed++;
-            const errorMsg = err?.response?.data ? JSON.stringify(err.response.data) : err?.message || 'Unknown error';
+            const found = err?.response?.status === 409 ? err.response.data.duplicates : null;
+            const errorMsg = found
+              ? `probably already entered as ${found.map(d => `${d.first_name} ${d.last_name} (roll ${d.roll_number})`).join(', ')}`
+              : err?.response?.data ? JSON.stringify(err.response.data) : err?.message || 'Unknown error';
             errors.push(`Row ${index + 2}: ${errorMsg}`);
           }
         }
@@ -470,6 +487,24 @@ export default function AddStudent() {
         </div>
       )}
 
+      {duplicates && (
+        <div className="bg-yellow-50 border border-yellow-200 rounded-lg p-4">
+          <h3 className="font-semibold text-yellow-800 mb-2">This student may already exist</h3>
+          <ul className="text-sm text-yellow-800 space-y-1 mb-3">
+            {duplicates.map(d => (
+              <li key={d.id}>
+                {d.first_name} {d.last_name}, born {formatDateForDisplay(d.date_of_birth)}, roll {d.roll_number}
+                {' '}({Math.round(d.score * 100)}% match: {d.reasons.join(', ')})
+              </li>
+            ))}
+          </ul>
+          <div className="flex gap-2">
+            <button type="button" className="btn-warning" disabled={saving} onClick={() => handleSubmit(null, true)}>Save anyway</button>
+            <button type="button" className="btn-secondary" onClick={() => setDuplicates(null)}>Cancel</button>
+          </div>
+        </div>
+      )}
+
       {/* Import Result */}
       {importResult && (
         <div className="bg-blue-50 border border-blue-200 rounded-lg p-4">
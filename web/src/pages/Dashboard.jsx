@@ -17,31 +17,84 @@ const formatDateForDisplay = (dateStr) => {
 };
 
 export default function Dashboard() {
-  const [overduePayments, setOverduePayments] = useState([]);
+  const [summary, setSummary] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
-    const loadOverduePayments = async () => {
+    const loadSummary = async () => {
       try {
-        const response = await api.get('payments/');
-        const overdue = response.data.filter(payment => payment.is_overdue);
-        setOverduePayments(overdue);
+        const { data } = await api.get('dashboard/summary/');
+        setSummary(data);
       } catch (error) {
-        console.error('Failed to load overdue payments:', error);
+        console.error('Failed to load dashboard summary:', error);
       } finally {
         setLoading(false);
       }
     };
 
-    loadOverduePayments();
+    loadSummary();
+
+    // Live updates: the summary is cached server-side until the next write, so refetching is cheap.
+    // The stream is opened with a short-lived ticket; once it has expired the browser's own reconnect
+    // is refused, so fetch a new ticket and carry on from the last event seen.
+    let events = null, lastId = null, retry = null, closed = false;
+    const onEvent = (e) => { if (e.lastEventId) lastId = e.lastEventId; loadSummary(); };
+    const connect = async () => {
+      try {
+        const { data } = await api.post('events/ticket/');
+        if (closed) return;
+        const since = lastId ? `&since=${encodeURIComponent(lastId)}` : '';
+        events = new EventSource(`/api/events/?models=payment,attendance&ticket=${encodeURIComponent(data.ticket)}${since}`);
+        events.addEventListener('payment', onEvent);
+        events.addEventListener('attendance', onEvent);
+        events.addEventListener('reset', loadSummary);
+        events.onerror = () => {
+          if (events.readyState === EventSource.CLOSED && !closed) retry = setTimeout(connect, 3000);
+        };
+      } catch (error) {
+        if (!closed) retry = setTimeout(connect, 30000);
+      }
+    };
+    connect();
+    return () => { closed = true; clearTimeout(retry); if (events) events.close(); };
   }, []);
 
+  const overdue = summary?.overdue;
+  const overduePayments = overdue?.payments || [];
+
   return (
     <div className="space-y-8">
       <div className="flex items-center justify-between">
         <h1>Dashboard</h1>
       </div>
 
+      {summary && (
+        <div className="grid grid-cols-2 md:grid-cols-4 gap-4">
+          <div className="card"><div className="card-body">
+            <p className="text-sm text-gray-600">Students on file</p>
+            <p className="text-2xl font-bold text-gray-900">{summary.students_total}</p>
+            <p className="text-xs text-gray-500">{summary.classrooms} classes</p>
+          </div></div>
+          <div className="card"><div className="card-body">
+            <p className="text-sm text-gray-600">Collected this month</p>
+            <p className="text-2xl font-bold text-gray-900">₹{summary.payments_this_month.total}</p>
+            <p className="text-xs text-gray-500">{summary.payments_this_month.count} payments</p>
+          </div></div>
+          <div className="card"><div className="card-body">
+            <p className="text-sm text-gray-600">Overdue</p>
+            <p className="text-2xl font-bold text-red-600">₹{summary.overdue.amount}</p>
+            <p className="text-xs text-gray-500">{summary.overdue.count} payments</p>
+          </div></div>
+          <div className="card"><div className="card-body">
+            <p className="text-sm text-gray-600">Attendance today</p>
+            <p className="text-2xl font-bold text-gray-900">
+              {summary.attendance_today.rate === null ? '—' : `${summary.attendance_today.rate}%`}
+            </p>
+            <p className="text-xs text-gray-500">{summary.attendance_today.present} of {summary.attendance_today.marked} marked</p>
+          </div></div>
+        </div>
+      )}
+
       {/* Overdue Payments Alert */}
       {overduePayments.length > 0 && (
         <div className="card border-2 border-red-200 bg-red-50">
@@ -54,7 +107,7 @@ export default function Dashboard() {
                     Overdue Payments Alert
                   </h3>
                   <p className="text-sm text-red-700">
-                    {overduePayments.length} payment{overduePayments.length > 1 ? 's' : ''} {overduePayments.length > 1 ? 'are' : 'is'} overdue
+                    {overdue.count} payment{overdue.count > 1 ? 's' : ''} {overdue.count > 1 ? 'are' : 'is'} overdue
                   </p>
                 </div>
               </div>
@@ -79,9 +132,9 @@ export default function Dashboard() {
                   </div>
                 </div>
               ))}
-              {overduePayments.length > 3 && (
+              {overdue.count > 3 && (
                 <p className="text-sm text-red-600 text-center">
-                  +{overduePayments.length - 3} more overdue payments
+                  +{overdue.count - 3} more overdue payments
                 </p>
               )}
             </div>
@@ -8,7 +8,7 @@ export default function Fees() {
   const [message, setMessage] = useState(null);
   const [editingPayment, setEditingPayment] = useState(null);
   const [students, setStudents] = useState([]);
-  const [classrooms, setClassrooms] = useState([]);
+  const [facets, setFacets] = useState({});
   const [selectedClass, setSelectedClass] = useState('');
   const [selectedSection, setSelectedSection] = useState('A');
   const [filteredStudents, setFilteredStudents] = useState([]);
@@ -46,14 +46,8 @@ export default function Fees() {
     return dateStr;
   };
 
-  // Get unique classes (without duplicates)
-  const uniqueClasses = classrooms.reduce((acc, classroom) => {
-    const existingClass = acc.find(c => c.name === classroom.name && c.section === classroom.section);
-    if (!existingClass) {
-      acc.push(classroom);
-    }
-    return acc;
-  }, []);
+  // Classes and sections that have students, from the facets endpoint (one row per class/section)
+  const uniqueClasses = (facets.classroom || []).map(c => ({ id: c.value, name: c.name, section: c.section }));
 
   // Payment form
   const [paymentForm, setPaymentForm] = useState({
@@ -121,15 +115,15 @@ export default function Fees() {
   const loadData = async () => {
     try {
       setLoading(true);
-      const [paymentsRes, studentsRes, classroomsRes] = await Promise.all([
+      const [paymentsRes, studentsRes, facetsRes] = await Promise.all([
         api.get('payments/'),
         api.get('students/'),
-        api.get('classrooms/')
+        api.get('facets/', { params: { only: 'classroom,section' } })
       ]);
       
       setPayments(paymentsRes.data || []);
       setStudents(studentsRes.data || []);
-      setClassrooms(classroomsRes.data || []);
+      setFacets(facetsRes.data || {});
       
       console.log('Loaded payments:', paymentsRes.data);
       console.log('Total payments in table:', (paymentsRes.data || []).length);
@@ -313,7 +307,10 @@ export default function Fees() {
       };
       
       console.log('Updating payment:', editingPayment.id, paymentData);
-      const response = await api.put(`payments/${editingPayment.id}/`, paymentData);
+      // If-Match makes the server refuse the save if someone else changed this payment meanwhile
+      const response = await api.put(`payments/${editingPayment.id}/`, paymentData, {
+        headers: { 'If-Match': `"${editingPayment.version}"` },
+      });
       console.log('Update response:', response.data);
       
       setEditingPayment(null);
@@ -344,6 +341,12 @@ export default function Fees() {
       
     } catch (error) {
       console.error('Update payment error:', error);
+      if (error?.response?.status === 409) {
+        handleEditPayment(error.response.data.current);
+        await loadData();
+        setMessage({ type: 'error', text: 'Someone else updated this payment. Review the latest values and save again.' });
+        return;
+      }
       const errorMsg = error?.response?.data ? JSON.stringify(error.response.data) : 'Failed to update payment';
       setMessage({ type: 'error', text: `Update failed: ${errorMsg}` });
     } finally {
@@ -507,9 +510,9 @@ export default function Fees() {
                   className="form-input"
                 >
                   <option value="">All Sections</option>
-                  <option value="A">A</option>
-                  <option value="B">B</option>
-                  <option value="C">C</option>
+                  {(facets.section || []).filter(s => s.value).map(s => (
+                    <option key={s.value} value={s.value}>{s.value} ({s.count})</option>
+                  ))}
                 </select>
               </div>
 
@@ -740,9 +743,9 @@ export default function Fees() {
                   type="text"
                   name="receipt_number"
                   value={paymentForm.receipt_number}
-                  onChange={(e) => setPaymentForm({...paymentForm, receipt_number: e.target.value})}
+                  readOnly
                   className="form-input"
-                  placeholder="Optional"
+                  placeholder="Issued when a payment is received"
                   data-lpignore="true"
                   data-form-type="other"
                   autocomplete="off"
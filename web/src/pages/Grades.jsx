@@ -1,5 +1,5 @@
-import { useEffect, useMemo, useState } from 'react';
-import api from '../api/client.js';
+import { useEffect, useMemo, useRef, useState } from 'react';
+import api, { loadList, syncList } from '../api/client.js';
 import Papa from 'papaparse';
 import { 
   BookOpen, 
@@ -23,6 +23,7 @@ import {
 
 export default function Grades() {
   const [grades, setGrades] = useState([]);
+  const gradesToken = useRef(null);
   const [students, setStudents] = useState([]);
 
   // Create form
@@ -36,6 +37,7 @@ export default function Grades() {
   const [filterStudentId, setFilterStudentId] = useState('');
   const [filterSubject, setFilterSubject] = useState('');
   const [filterTerm, setFilterTerm] = useState('');
+  const [facets, setFacets] = useState({ subject: [], term: [] });
 
   // Edit state
   const [editId, setEditId] = useState(null);
@@ -50,15 +52,21 @@ export default function Grades() {
   const [importResult, setImportResult] = useState(null);
 
   useEffect(() => {
-    api.get('/grades/').then(r => setGrades(r.data));
+    loadList('/grades/').then(({ rows, token }) => { gradesToken.current = token; setGrades(rows); });
     api.get('/students/').then(r => setStudents(r.data));
   }, []);
 
+  // Dropdown options with counts under the other filters; refetched as grades change (cached server-side)
+  useEffect(() => {
+    const params = { only: 'subject,term', student: filterStudentId, subject: filterSubject, term: filterTerm };
+    api.get('/facets/', { params }).then(r => setFacets(r.data));
+  }, [filterStudentId, filterSubject, filterTerm, grades]);
+
   const filteredGrades = useMemo(() => {
     return grades.filter(g => {
       const matchesStudent = filterStudentId ? String(g.student) === String(filterStudentId) : true;
-      const matchesSubject = filterSubject ? g.subject.toLowerCase().includes(filterSubject.toLowerCase()) : true;
-      const matchesTerm = filterTerm ? g.term.toLowerCase().includes(filterTerm.toLowerCase()) : true;
+      const matchesSubject = filterSubject ? g.subject === filterSubject : true;
+      const matchesTerm = filterTerm ? g.term === filterTerm : true;
       return matchesStudent && matchesSubject && matchesTerm;
     });
   }, [grades, filterStudentId, filterSubject, filterTerm]);
@@ -161,8 +169,9 @@ export default function Grades() {
             failed++;
           }
         }
-        const refreshed = await api.get('/grades/');
-        setGrades(refreshed.data);
+        const { rows: synced, token } = await syncList('/grades/', grades, gradesToken.current);
+        gradesToken.current = token;
+        setGrades(synced);
         setImportResult({ created, failed, total: rows.length });
         setImporting(false);
         e.target.value = '';
@@ -325,21 +334,29 @@ export default function Grades() {
           </div>
           <div>
             <label className="block text-sm font-medium text-gray-700 mb-1">Filter by Subject</label>
-            <input 
-              placeholder="Filter by subject" 
+            <select 
               className="w-full px-3 py-2 border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-blue-500 focus:border-blue-500" 
               value={filterSubject} 
               onChange={e=>setFilterSubject(e.target.value)} 
-            />
+            >
+              <option value="">All Subjects</option>
+              {facets.subject.map(f => (
+                <option key={f.value} value={f.value}>{f.value} ({f.count})</option>
+              ))}
+            </select>
           </div>
           <div>
             <label className="block text-sm font-medium text-gray-700 mb-1">Filter by Term</label>
-            <input 
-              placeholder="Filter by term" 
+            <select 
               className="w-full px-3 py-2 border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-blue-500 focus:border-blue-500" 
               value={filterTerm} 
               onChange={e=>setFilterTerm(e.target.value)} 
-            />
+            >
+              <option value="">All Terms</option>
+              {facets.term.map(f => (
+                <option key={f.value} value={f.value}>{f.value} ({f.count})</option>
+              ))}
+            </select>
           </div>
           <div className="flex items-end">
             <div className="text-sm text-gray-500">
@@ -1,6 +1,6 @@
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { Link } from 'react-router-dom';
-import api from '../api/client.js';
+import api, { loadList, syncList } from '../api/client.js';
 import Papa from 'papaparse';
 import { 
   Users, 
@@ -20,6 +20,7 @@ import {
 
 export default function Students() {
   const [students, setStudents] = useState([]);
+  const studentsToken = useRef(null);
   const [classrooms, setClassrooms] = useState([]);
 
   const [importing, setImporting] = useState(false);
@@ -99,7 +100,7 @@ export default function Students() {
   };
 
   useEffect(() => {
-    api.get('/students/').then(r => setStudents(r.data));
+    loadList('/students/').then(({ rows, token }) => { studentsToken.current = token; setStudents(rows); });
     api.get('/classrooms/').then(r => setClassrooms(r.data));
     
     // Test date picker functionality
@@ -109,6 +110,13 @@ export default function Students() {
     console.log('=== End Debug Info ===');
   }, []);
 
+  // Pull only what changed since the last load instead of the whole roster
+  const refreshStudents = async () => {
+    const { rows, token } = await syncList('/students/', students, studentsToken.current);
+    studentsToken.current = token;
+    setStudents(rows);
+  };
+
   const findOrCreateClassroom = async (name, section) => {
     name = String(name || '').trim();
     section = String(section || '').trim();
@@ -131,7 +139,7 @@ export default function Students() {
       skipEmptyLines: true,
       complete: async (results) => {
         const rows = results.data;
-        let created = 0, failed = 0;
+        let created = 0, failed = 0, duplicates = 0;
         for (const row of rows) {
           try {
             const classroomName = row.class || row.class_name || row.Class || row.ClassName || '';
@@ -148,12 +156,12 @@ export default function Students() {
             await api.post('/students/', payload);
             created++;
           } catch (err) {
-            failed++;
+            if (err?.response?.status === 409) duplicates++;
+            else failed++;
           }
         }
-        const refreshed = await api.get('/students/');
-        setStudents(refreshed.data);
-        setImportResult({ created, failed, total: rows.length });
+        await refreshStudents();
+        setImportResult({ created, failed, duplicates, total: rows.length });
         setImporting(false);
         e.target.value = '';
       },
@@ -232,8 +240,7 @@ export default function Students() {
       await api.put(`/students/${editingStudent.id}/`, payload);
       
       // Refresh students list
-      const refreshed = await api.get('/students/');
-      setStudents(refreshed.data);
+      await refreshStudents();
       
       setEditingStudent(null);
       setMessage({ type: 'success', text: 'Student updated successfully!' });
@@ -258,8 +265,7 @@ export default function Students() {
       await api.delete(`/students/${studentId}/`);
       
       // Refresh students list
-      const refreshed = await api.get('/students/');
-      setStudents(refreshed.data);
+      await refreshStudents();
       
       setMessage({ type: 'success', text: 'Student deleted successfully!' });
       
@@ -335,6 +341,7 @@ export default function Students() {
         <div className="bg-blue-50 border border-blue-200 rounded-lg p-4">
           <div className="text-sm text-blue-700">
             Imported {importResult.created}/{importResult.total} students. Failed: {importResult.failed}
+            {importResult.duplicates > 0 && <>. Skipped {importResult.duplicates} that already exist (add them from Add Student to save anyway)</>}
           </div>
         </div>
       )}